@@ -0,0 +1,51 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Run the scripts from the repository root, e.g.::
+
+    python benchmarks/bench_nearest_car.py
+"""
+
+import os
+import statistics
+import sys
+import time
+
+# Add the repository root to the path so cab_booking imports without installing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CITY_CENTER = (12.9716, 77.5946)
+CAR_TYPES = ('economy', 'premium', 'suv')
+
+
+def random_location(rng, center=CITY_CENTER, spread_deg=0.25):
+    """A random {latitude, longitude} dict within spread_deg of center"""
+    return {
+        'latitude': center[0] + rng.uniform(-spread_deg, spread_deg),
+        'longitude': center[1] + rng.uniform(-spread_deg, spread_deg),
+    }
+
+
+def measure(fn, repeat=5):
+    """Run fn repeat times and return the per-run timings in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    return {
+        'best_s': min(timings),
+        'median_s': statistics.median(timings),
+    }
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(row[i])) for row in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,97 @@
+"""
+Synthetic fleet, passengers and booking history for the benchmarks.
+
+build_fleet(scale) returns services holding scale bookings, with one
+car and driver per 10 bookings and one passenger per 5, all placed
+around CITY_CENTER. Most bookings have been through the whole
+lifecycle and completed (so they sit in the booking archive); the rest
+are left requested, accepted or in progress, as in a live system. The
+same scale and seed always produce the same fleet.
+"""
+
+import collections
+import random
+
+from _common import CAR_TYPES, random_location
+
+from cab_booking.services import create_services
+
+Fleet = collections.namedtuple('Fleet', ['services', 'passenger_ids', 'driver_ids', 'car_ids', 'booking_ids'])
+
+# Share of the generated bookings left in each open status
+OPEN_SHARES = (('REQUESTED', 0.05), ('ACCEPTED', 0.03), ('IN_PROGRESS', 0.02))
+
+
+def build_fleet(scale, seed=0, **service_options):
+    """
+    Services populated with a fleet, passengers and scale bookings
+    
+    Args:
+        scale (int): Number of bookings to generate
+        seed (int): Random seed
+        **service_options: Passed on to create_services
+    
+    Returns:
+        Fleet: The services and the IDs of everything generated
+    """
+    rng = random.Random(seed)
+    services = create_services(**service_options)
+    
+    car_ids, driver_ids = [], []
+    for i in range(max(100, scale // 10)):
+        car = services.car_service.create_car({
+            'model': 'Model', 'make': 'Make', 'year': 2020 + i % 5,
+            'license_plate': f'KA-{i:07d}', 'capacity': 4, 'car_type': CAR_TYPES[i % len(CAR_TYPES)],
+        })
+        services.car_service.update_location(car.car_id, random_location(rng))
+        driver = services.driver_service.create_driver({
+            'name': f'Driver {i}', 'phone': f'9{i:09d}', 'license_number': f'DL-{i:07d}',
+        })
+        services.driver_service.assign_car(driver.driver_id, car)
+        car_ids.append(car.car_id)
+        driver_ids.append(driver.driver_id)
+    
+    passenger_ids = [
+        services.passenger_service.create_passenger({
+            'name': f'Rider {i}', 'phone': f'8{i:09d}', 'email': f'rider{i}@example.com',
+        }).passenger_id
+        for i in range(max(100, scale // 5))
+    ]
+    
+    open_counts = {status: int(scale * share) for status, share in OPEN_SHARES}
+    completed = scale - sum(open_counts.values())
+    booking_ids = [create_trip(services, rng, passenger_ids, driver_ids[i % len(driver_ids)], 'COMPLETED')
+                   for i in range(completed)]
+    
+    # Open trips keep their driver busy, so each takes the next free one
+    drivers = iter(driver_ids)
+    for status, count in open_counts.items():
+        for _ in range(count):
+            driver_id = next(drivers, None) if status != 'REQUESTED' else None
+            if status != 'REQUESTED' and driver_id is None:
+                status = 'REQUESTED'  # more open trips than drivers
+            booking_ids.append(create_trip(services, rng, passenger_ids, driver_id, status))
+    return Fleet(services, passenger_ids, driver_ids, car_ids, booking_ids)
+
+
+def create_trip(services, rng, passenger_ids, driver_id, status):
+    """Create a booking for a random passenger and take it as far as status; returns its ID"""
+    booking_service = services.booking_service
+    booking = booking_service.create_booking({
+        'passenger_id': rng.choice(passenger_ids),
+        'from_location': random_location(rng),
+        'to_location': random_location(rng),
+    })
+    if status == 'REQUESTED':
+        return booking.booking_id
+    booking_service.assign_driver(booking.booking_id, driver_id)
+    if status == 'ACCEPTED':
+        return booking.booking_id
+    booking_service.start_trip(booking.booking_id)
+    if status == 'IN_PROGRESS':
+        return booking.booking_id
+    booking_service.complete_trip(booking.booking_id, {
+        'actual_distance_km': round(rng.uniform(1, 25), 1),
+        'actual_duration_minutes': rng.randint(5, 60),
+    })
+    return booking.booking_id
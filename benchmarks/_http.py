@@ -0,0 +1,125 @@
+"""
+Minimal asyncio HTTP/1.1 client for the load benchmarks.
+
+Keeps one keep-alive connection per simulated client and only supports
+what the Cab Booking API needs: JSON or raw request bodies, and
+Content-Length or chunked responses.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+class HTTPConnection:
+    """A single persistent HTTP/1.1 connection"""
+    
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+    
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+    
+    async def request(self, method, path, body=None, headers=None):
+        """
+        Send a request and return (status, headers, body bytes)
+        
+        A bytes body is sent as is (pass its Content-Type in headers);
+        anything else is sent as JSON.
+        """
+        if self.writer is None:
+            await self.connect()
+        if body is None or isinstance(body, bytes):
+            payload = body or b''
+        else:
+            payload = json.dumps(body).encode('utf-8')
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                 f'Content-Length: {len(payload)}']
+        if body is not None and not isinstance(body, bytes):
+            lines.append('Content-Type: application/json')
+        for key, value in (headers or {}).items():
+            lines.append(f'{key}: {value}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await self.writer.drain()
+        
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+        
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = b''
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                content += await self.reader.readexactly(size)
+                await self.reader.readline()
+        else:
+            content = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+        
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, content
+    
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.reader = self.writer = None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def start_server(command, port):
+    """Start a server subprocess from the repository root and wait for it"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    process = subprocess.Popen([sys.executable, '-c', command], cwd=root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,86 @@
+"""
+Concurrent-connection throughput and tail latency: ASGI vs. WSGI app.
+
+Starts each app in its own server process (uvicorn for
+cab_booking.app.asgi, Werkzeug's threaded server for the Flask app,
+as run.py/wsgi.py serve it), opens N keep-alive connections and has
+each one poll GET /api/bookings/<id> for a fixed duration. Requires
+uvicorn (pip install uvicorn).
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from _common import print_table
+from _http import HTTPConnection, free_port, percentile, start_server
+
+SERVERS = {
+    'wsgi (werkzeug threaded)': (
+        "from cab_booking.app import create_app; "
+        "create_app().run(host='127.0.0.1', port={port}, threaded=True)"
+    ),
+    'asgi (uvicorn)': (
+        "import uvicorn; "
+        "uvicorn.run('cab_booking.app.asgi:app', host='127.0.0.1', port={port}, log_level='warning')"
+    ),
+}
+
+
+async def client(port, duration, latencies):
+    connection = HTTPConnection('127.0.0.1', port)
+    _, _, body = await connection.request('POST', '/api/passengers', {'name': 'Load', 'phone': '1', 'email': 'l@x'})
+    passenger_id = json.loads(body)['passenger_id']
+    _, _, body = await connection.request('POST', '/api/bookings', {
+        'passenger_id': passenger_id, 'from_location': 'A', 'to_location': 'B',
+        'estimated_distance_km': 5, 'estimated_duration_minutes': 12,
+    })
+    path = f"/api/bookings/{json.loads(body)['booking_id']}"
+    
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        status, _, _ = await connection.request('GET', path)
+        latencies.append(time.perf_counter() - start)
+        assert status == 200, status
+    await connection.close()
+
+
+async def load(port, connections, duration):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, duration, latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 16, 64, 256])
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+    
+    rows = []
+    for name, command in SERVERS.items():
+        port = free_port()
+        server = start_server(command.format(port=port), port)
+        try:
+            for connections in args.connections:
+                rate, latencies = asyncio.run(load(port, connections, args.duration))
+                rows.append((
+                    name, connections, f'{rate:,.0f}',
+                    f'{percentile(latencies, 0.50) * 1e3:.1f}',
+                    f'{percentile(latencies, 0.99) * 1e3:.1f}',
+                    f'{latencies[-1] * 1e3:.1f}',
+                ))
+        finally:
+            server.terminate()
+            server.wait()
+    
+    print_table(('server', 'connections', 'req/s', 'p50 ms', 'p99 ms', 'max ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Terminal-booking storage: live Booking objects vs. the columnar BookingArchive.
+
+Reports traced memory per booking and the time of an aggregate scan
+(total revenue) over each representation.
+"""
+
+import argparse
+import random
+import tracemalloc
+
+from _common import measure, print_table, random_location, summarize
+
+from cab_booking.models import Booking, Car, Driver, Fare, Passenger
+from cab_booking.services.booking_archive import BookingArchive
+
+
+def make_bookings(count, seed):
+    rng = random.Random(seed)
+    passengers = [Passenger(f'PASS-{i:08d}', 'Name', '555', 'a@b.c') for i in range(max(count // 10, 1))]
+    drivers = []
+    for i in range(max(count // 20, 1)):
+        driver = Driver(f'DRIV-{i:08d}', 'Name', '555', 'a@b.c', 'LIC')
+        driver.assign_car(Car(f'CAR-{i:08d}', 'Prius', 'Toyota', 2020, 'ABC', 4, 'economy'))
+        drivers.append(driver)
+    # Pickups and drop-offs come from a limited set of popular places
+    places = [random_location(rng) for _ in range(500)]
+    return passengers, drivers, places, rng
+
+
+def build_live(count, passengers, drivers, places, rng):
+    bookings = {}
+    for i in range(count):
+        booking = Booking(f'BOOK-{i:08d}', passengers[i % len(passengers)], rng.choice(places), rng.choice(places))
+        booking.set_estimated_trip_details(rng.uniform(1, 30), rng.randint(5, 60))
+        booking.assign_driver(drivers[i % len(drivers)])
+        booking.start_trip()
+        booking.complete_trip(booking.estimated_distance_km, booking.estimated_duration_minutes)
+        booking.calculate_fare()
+        bookings[booking.booking_id] = booking
+    return bookings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+    
+    passengers, drivers, places, rng = make_bookings(args.bookings, args.seed)
+    
+    tracemalloc.start()
+    live = build_live(args.bookings, passengers, drivers, places, rng)
+    live_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    tracemalloc.start()
+    archive = BookingArchive()
+    for booking in live.values():
+        archive.add(booking)
+    archive_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    live_scan = summarize(measure(lambda: sum(b.fare.total_amount for b in live.values()), repeat=5))
+    archive_scan = summarize(measure(lambda: sum(archive.total_amount), repeat=5))
+    assert abs(sum(b.fare.total_amount for b in live.values()) - sum(archive.total_amount)) < 1e-6
+    
+    print_table(('storage', 'bytes/booking', 'revenue scan ms'), [
+        ('live Booking + Fare objects', f'{live_bytes / args.bookings:.0f}', f"{live_scan['best_s'] * 1e3:.1f}"),
+        ('BookingArchive', f'{archive_bytes / args.bookings:.0f}', f"{archive_scan['best_s'] * 1e3:.1f}"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
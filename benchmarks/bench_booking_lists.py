@@ -0,0 +1,92 @@
+"""
+Booking lists: one driver's history, listed whole vs. paged and streamed.
+
+A driver with N completed trips (archived, as in the default in-memory
+setup) is listed three ways: BookingService.get_driver_bookings, which
+builds the whole list, then encoding it as one JSON body (the only
+option before the list endpoints); the streamed body of GET
+/api/drivers/<id>/bookings for the whole history; and single pages of
+that endpoint at increasing cursor depths. Reports time per request,
+and peak traced memory (tracemalloc) in a second, traced run.
+"""
+
+import argparse
+import functools
+import time
+import tracemalloc
+
+from _common import print_table
+
+from cab_booking.app.listing import stream_bookings
+from cab_booking.app.serialization import booking_payload, encode
+from cab_booking.services import create_services
+
+
+def driver_with_history(trips):
+    services = create_services()
+    passenger = services.passenger_service.create_passenger({'name': 'Rider'})
+    car = services.car_service.create_car({'license_plate': 'KA-01-0001', 'car_type': 'economy'})
+    driver = services.driver_service.create_driver({'name': 'Driver', 'license_number': 'DL-1'})
+    services.driver_service.assign_car(driver.driver_id, car)
+    booking_ids = []
+    for _ in range(trips):
+        booking = services.booking_service.create_booking({
+            'passenger_id': passenger.passenger_id, 'from_location': 'A', 'to_location': 'B',
+        })
+        services.booking_service.assign_driver(booking.booking_id, driver.driver_id)
+        services.booking_service.start_trip(booking.booking_id)
+        services.booking_service.complete_trip(booking.booking_id, {'actual_distance_km': 5})
+        booking_ids.append(booking.booking_id)
+    return services.booking_service, driver.driver_id, booking_ids
+
+
+def traced(fn):
+    """Run fn twice; returns (seconds untraced, peak traced bytes)"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trips', type=int, default=50000)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+    
+    booking_service, driver_id, booking_ids = driver_with_history(args.trips)
+    fetch_page = functools.partial(booking_service.page_driver_bookings, driver_id)
+    
+    def whole_list():
+        bookings = booking_service.get_driver_bookings(driver_id)
+        encode([booking_payload(booking) for booking in bookings])
+    
+    def whole_stream():
+        for _ in stream_bookings(fetch_page, limit=len(booking_ids)):
+            pass
+    
+    rows = []
+    for name, fn in (('get_driver_bookings + encode', whole_list), ('streamed, whole history', whole_stream)):
+        elapsed, peak = traced(fn)
+        rows.append((name, f'{len(booking_ids):,}', f'{elapsed * 1e3:,.1f}', f'{peak / 2 ** 20:,.1f}'))
+    
+    for depth in (0, len(booking_ids) // 2, len(booking_ids) - args.limit - 1):
+        cursor = booking_ids[depth - 1] if depth else None
+        
+        def page():
+            for _ in stream_bookings(fetch_page, cursor=cursor, limit=args.limit):
+                pass
+        elapsed, peak = traced(page)
+        rows.append((f'one page at booking {depth:,}', args.limit, f'{elapsed * 1e3:,.2f}',
+                     f'{peak / 2 ** 20:,.2f}'))
+    
+    print(f'driver with {args.trips:,} completed trips')
+    print_table(('request', 'bookings', 'ms', 'peak MiB'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Bulk ingest: records/s for per-item POSTs vs. the bulk endpoints.
+
+Onboards N cars into each server three ways over keep-alive
+connections: one POST /api/cars per car (from C concurrent
+connections), one POST /api/cars/bulk with a JSON array, and the same
+with an NDJSON body. Requires uvicorn for the ASGI rows
+(pip install uvicorn).
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from _common import CAR_TYPES, print_table
+from _http import HTTPConnection, free_port, start_server
+
+SERVERS = {
+    'wsgi (werkzeug threaded)': (
+        "from cab_booking.app import create_app; "
+        "create_app().run(host='127.0.0.1', port={port}, threaded=True)"
+    ),
+    'asgi (uvicorn)': (
+        "import uvicorn; "
+        "uvicorn.run('cab_booking.app.asgi:app', host='127.0.0.1', port={port}, log_level='warning')"
+    ),
+}
+
+
+def car_records(count, offset):
+    return [{
+        'make': 'Maruti', 'model': 'Dzire', 'year': 2022,
+        'license_plate': f'KA-01-{offset + i:06d}', 'capacity': 4,
+        'car_type': CAR_TYPES[i % len(CAR_TYPES)],
+    } for i in range(count)]
+
+
+async def per_item(port, records, connections):
+    queue = list(reversed(records))
+    
+    async def worker():
+        connection = HTTPConnection('127.0.0.1', port)
+        while queue:
+            status, _, _ = await connection.request('POST', '/api/cars', queue.pop())
+            assert status == 201, status
+        await connection.close()
+    
+    await asyncio.gather(*(worker() for _ in range(connections)))
+
+
+async def bulk(port, records, ndjson):
+    if ndjson:
+        body = b''.join(json.dumps(record).encode('utf-8') + b'\n' for record in records)
+        headers = {'Content-Type': 'application/x-ndjson'}
+    else:
+        body = json.dumps(records).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+    connection = HTTPConnection('127.0.0.1', port)
+    status, _, content = await connection.request('POST', '/api/cars/bulk', body, headers)
+    await connection.close()
+    assert status == 200, status
+    if ndjson:
+        results = [json.loads(line) for line in content.splitlines()]
+    else:
+        results = json.loads(content)
+    assert len(results) == len(records) and all('car_id' in result for result in results)
+
+
+def timed(coroutine):
+    start = time.perf_counter()
+    asyncio.run(coroutine)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=5000)
+    parser.add_argument('--connections', type=int, default=8)
+    args = parser.parse_args()
+    
+    rows = []
+    for name, command in SERVERS.items():
+        port = free_port()
+        server = start_server(command.format(port=port), port)
+        try:
+            n = args.records
+            baseline = timed(per_item(port, car_records(n, 0), args.connections))
+            rows.append((name, f'per-item x{args.connections} conns', f'{n / baseline:,.0f}', '1.0x'))
+            for label, ndjson, offset in (('bulk JSON array', False, n), ('bulk NDJSON', True, 2 * n)):
+                elapsed = timed(bulk(port, car_records(n, offset), ndjson))
+                rows.append((name, label, f'{n / elapsed:,.0f}', f'{baseline / elapsed:.1f}x'))
+        finally:
+            server.terminate()
+            server.wait()
+    
+    print(f'{args.records:,} cars per run')
+    print_table(('server', 'method', 'records/s', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
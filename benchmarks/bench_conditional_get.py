@@ -0,0 +1,123 @@
+"""
+Conditional GET: polling unchanged bookings with and without ETags.
+
+B in-progress bookings are polled with GET /api/bookings/<id> from C
+keep-alive connections, first plainly and then with If-None-Match set
+to the ETag of the previous response, as a driver or passenger app
+would. Reports polls/s, response body bytes per poll and server CPU
+time per poll (read from /proc, so Linux only). Requires uvicorn for
+the ASGI rows (pip install uvicorn).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from _common import print_table
+from _http import HTTPConnection, free_port, start_server
+
+SERVERS = {
+    'wsgi (werkzeug threaded)': (
+        "from cab_booking.app import create_app; "
+        "create_app().run(host='127.0.0.1', port={port}, threaded=True)"
+    ),
+    'asgi (uvicorn)': (
+        "import uvicorn; "
+        "uvicorn.run('cab_booking.app.asgi:app', host='127.0.0.1', port={port}, log_level='warning')"
+    ),
+}
+
+
+def server_cpu_seconds(pid):
+    """User plus system CPU time of a process, or None where /proc is unavailable"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def setup(port, count):
+    connection = HTTPConnection('127.0.0.1', port)
+    booking_ids = []
+    for i in range(count):
+        _, _, body = await connection.request('POST', '/api/passengers', {'name': f'Rider {i}'})
+        passenger_id = json.loads(body)['passenger_id']
+        _, _, body = await connection.request('POST', '/api/drivers', {'name': f'Driver {i}', 'license_number': f'DL-{i}'})
+        driver_id = json.loads(body)['driver_id']
+        _, _, body = await connection.request('POST', '/api/bookings', {
+            'passenger_id': passenger_id, 'from_location': 'A', 'to_location': 'B',
+            'estimated_distance_km': 5, 'estimated_duration_minutes': 15,
+        })
+        booking_id = json.loads(body)['booking_id']
+        await connection.request('POST', f'/api/bookings/{booking_id}/assign-driver', {'driver_id': driver_id})
+        await connection.request('PUT', f'/api/bookings/{booking_id}/start')
+        booking_ids.append(booking_id)
+    await connection.close()
+    return booking_ids
+
+
+async def poll(port, booking_ids, connections, polls, conditional):
+    etags = {}
+    counts = {'bytes': 0, 'not_modified': 0}
+    remaining = [polls]
+    
+    async def worker(offset):
+        connection = HTTPConnection('127.0.0.1', port)
+        i = offset
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            booking_id = booking_ids[i % len(booking_ids)]
+            i += 1
+            headers = {'If-None-Match': etags[booking_id]} if conditional and booking_id in etags else None
+            status, response_headers, body = await connection.request('GET', f'/api/bookings/{booking_id}',
+                                                                       headers=headers)
+            assert status in (200, 304), status
+            counts['bytes'] += len(body)
+            if status == 304:
+                counts['not_modified'] += 1
+            if 'etag' in response_headers:
+                etags[booking_id] = response_headers['etag']
+        await connection.close()
+    
+    await asyncio.gather(*(worker(n) for n in range(connections)))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=200)
+    parser.add_argument('--polls', type=int, default=20000)
+    parser.add_argument('--connections', type=int, default=8)
+    args = parser.parse_args()
+    
+    rows = []
+    for name, command in SERVERS.items():
+        port = free_port()
+        server = start_server(command.format(port=port), port)
+        try:
+            booking_ids = asyncio.run(setup(port, args.bookings))
+            for conditional in (False, True):
+                cpu_before = server_cpu_seconds(server.pid)
+                start = time.perf_counter()
+                counts = asyncio.run(poll(port, booking_ids, args.connections, args.polls, conditional))
+                elapsed = time.perf_counter() - start
+                cpu_after = server_cpu_seconds(server.pid)
+                cpu = (f'{(cpu_after - cpu_before) / args.polls * 1e6:.0f}'
+                       if cpu_before is not None and cpu_after is not None else '-')
+                rows.append((name, 'If-None-Match' if conditional else 'plain',
+                             f'{args.polls / elapsed:,.0f}', f"{counts['bytes'] / args.polls:.0f}",
+                             f"{counts['not_modified'] / args.polls:.0%}", cpu))
+        finally:
+            server.terminate()
+            server.wait()
+    
+    print(f'{args.bookings} in-progress bookings, {args.polls:,} polls over {args.connections} connections')
+    print_table(('server', 'polls', 'polls/s', 'body bytes/poll', '304s', 'server CPU us/poll'), rows)
+
+
+if __name__ == '__main__':
+    main()
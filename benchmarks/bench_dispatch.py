@@ -0,0 +1,104 @@
+"""
+Batch dispatch throughput: BookingService.dispatch_batch vs. greedy matching.
+
+Greedy matching is the one-booking-at-a-time approach: each REQUESTED
+booking in turn takes the nearest driver that is still free.
+"""
+
+import argparse
+import random
+import time
+
+from _common import measure, print_table, random_location
+
+from cab_booking.services import BookingService, CarService, DriverService, PassengerService
+from cab_booking.utils import GridIndex, get_coordinates
+
+
+def build_world(size, seed):
+    rng = random.Random(seed)
+    passenger_service = PassengerService()
+    driver_service = DriverService()
+    car_service = CarService()
+    booking_service = BookingService(passenger_service, driver_service, car_service)
+    
+    for i in range(size):
+        car = car_service.create_car({'model': 'Prius', 'make': 'Toyota', 'car_type': 'economy'})
+        car_service.update_location(car.car_id, random_location(rng))
+        driver = driver_service.create_driver({'name': f'Driver {i}'})
+        driver_service.assign_car(driver.driver_id, car)
+    
+    for i in range(size):
+        passenger = passenger_service.create_passenger({'name': f'Passenger {i}'})
+        booking_service.create_booking({
+            'passenger_id': passenger.passenger_id,
+            'from_location': random_location(rng),
+            'to_location': random_location(rng),
+        })
+    return booking_service
+
+
+def greedy_dispatch(booking_service, radius_km, max_candidates):
+    grid = GridIndex()
+    for driver in booking_service.driver_service.drivers.values():
+        grid.insert(driver.driver_id, *get_coordinates(driver.assigned_car.current_location))
+    
+    assignments = {}
+    total_km = 0.0
+    for booking_id in booking_service.requested_bookings:
+        lat, lon = get_coordinates(booking_service.bookings[booking_id].from_location)
+        nearest = grid.nearest(lat, lon, k=1, radius_km=radius_km)
+        if nearest:
+            distance, driver_id = nearest[0]
+            grid.remove(driver_id)
+            assignments[booking_id] = driver_id
+            total_km += distance
+    return assignments, total_km
+
+
+def pickup_km(booking_service, assignments):
+    from cab_booking.utils import haversine_km
+    total = 0.0
+    for booking_id, driver_id in assignments.items():
+        booking = booking_service.bookings[booking_id]
+        car = booking_service.driver_service.drivers[driver_id].assigned_car
+        total += haversine_km(*get_coordinates(booking.from_location), *get_coordinates(car.current_location))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--radius-km', type=float, default=5.0)
+    parser.add_argument('--candidates', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    rows = []
+    for size in args.sizes:
+        greedy_world = build_world(size, args.seed)
+        greedy_s = measure(lambda: greedy_dispatch(greedy_world, args.radius_km, args.candidates), repeat=1)[0]
+        greedy, greedy_km = greedy_dispatch(greedy_world, args.radius_km, args.candidates)
+        
+        world = build_world(size, args.seed)
+        start = time.perf_counter()
+        assignments = world.dispatch_batch(radius_km=args.radius_km, max_candidates=args.candidates)
+        batch_s = time.perf_counter() - start
+        batch_km = pickup_km(world, assignments)
+        
+        rows.append((
+            f'{size}x{size}',
+            'greedy', len(greedy), f'{greedy_km / max(len(greedy), 1):.3f}',
+            f'{greedy_s:.3f}', f'{len(greedy) / greedy_s:,.0f}',
+        ))
+        rows.append((
+            f'{size}x{size}',
+            'dispatch_batch', len(assignments), f'{batch_km / max(len(assignments), 1):.3f}',
+            f'{batch_s:.3f}', f'{len(assignments) / batch_s:,.0f}',
+        ))
+    
+    print_table(('batch', 'method', 'assigned', 'mean pickup km', 'seconds', 'assignments/s'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Driver ratings: leaderboard queries from the rating index vs. a scan.
+
+N drivers in a few cities and car types receive R ratings each through
+DriverService.update_rating, which also maintains the sliding-window
+RatingIndex. Reports the cost of those updates, then top-10 available
+drivers per city and car type and "rated below 2" queries, answered
+from the index and by scanning every driver as was needed before. The
+last table runs dispatch_batch with and without rating_weight_km and
+compares pickup distance with the ratings of the drivers picked.
+"""
+
+import argparse
+import heapq
+import random
+import statistics
+import time
+
+from _common import CAR_TYPES, print_table
+
+from cab_booking.services import create_services
+from cab_booking.utils import get_coordinates, haversine_km
+
+CITIES = ((12.9716, 77.5946), (19.0760, 72.8777), (28.6139, 77.2090), (13.0827, 80.2707))
+
+
+def city_location(rng, city, spread_deg=0.1):
+    return {'latitude': city[0] + rng.uniform(-spread_deg, spread_deg),
+            'longitude': city[1] + rng.uniform(-spread_deg, spread_deg)}
+
+
+def build(drivers, seed):
+    rng = random.Random(seed)
+    services = create_services()
+    driver_ids = []
+    for i in range(drivers):
+        car = services.car_service.create_car({'license_plate': f'KA-{i:06d}',
+                                               'car_type': CAR_TYPES[i % len(CAR_TYPES)]})
+        services.car_service.update_location(car.car_id, city_location(rng, CITIES[i % len(CITIES)]))
+        driver = services.driver_service.create_driver({'name': f'Driver {i}', 'license_number': f'DL-{i}'})
+        services.driver_service.assign_car(driver.driver_id, car)
+        driver_ids.append(driver.driver_id)
+    return services, driver_ids
+
+
+def scan_top(driver_service, k, city, car_type):
+    """Top-k available drivers by rating, scanning every driver"""
+    region = driver_service.ratings.region({'latitude': city[0], 'longitude': city[1]})
+    matches = (
+        (driver.rating, driver.driver_id) for driver in driver_service.drivers.values()
+        if driver.is_available and driver.total_ratings and driver.assigned_car.car_type == car_type
+        and driver_service.ratings.region(driver.assigned_car.current_location) == region
+    )
+    return heapq.nlargest(k, matches)
+
+
+def scan_below(driver_service, threshold):
+    return sorted((driver.rating, driver.driver_id) for driver in driver_service.drivers.values()
+                  if driver.total_ratings and driver.rating < threshold)
+
+
+def per_query_us(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def dispatch_row(drivers, weight, seed):
+    services, driver_ids = build(drivers, seed)
+    rng = random.Random(seed + 1)
+    for driver_id in driver_ids:
+        quality = rng.uniform(2.5, 5)
+        for _ in range(10):
+            services.driver_service.update_rating(driver_id, min(5, max(1, round(rng.gauss(quality, 0.7)))))
+    passenger = services.passenger_service.create_passenger({'name': 'Rider'})
+    for i in range(drivers // 2):
+        services.booking_service.create_booking({
+            'passenger_id': passenger.passenger_id,
+            'from_location': city_location(rng, CITIES[i % len(CITIES)]),
+        })
+    assigned = services.booking_service.dispatch_batch(rating_weight_km=weight)
+    distances, ratings = [], []
+    for booking_id, driver_id in assigned.items():
+        booking = services.booking_service.get_booking(booking_id)
+        car = services.driver_service.get_driver(driver_id).assigned_car
+        distances.append(haversine_km(*get_coordinates(booking.from_location),
+                                      *get_coordinates(car.current_location)))
+        ratings.append(services.driver_service.ratings.score(driver_id))
+    return (f'{weight:g}', f'{len(assigned):,}', f'{statistics.mean(distances):.2f}',
+            f'{statistics.mean(ratings):.2f}', f'{sum(r < 3 for r in ratings) / len(ratings):.0%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--drivers', type=int, default=100000)
+    parser.add_argument('--ratings', type=int, default=10)
+    parser.add_argument('--dispatch-drivers', type=int, default=4000)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+    
+    services, driver_ids = build(args.drivers, args.seed)
+    driver_service = services.driver_service
+    rng = random.Random(args.seed)
+    ratings = [(rng.choice(driver_ids), rng.randint(1, 5)) for _ in range(args.drivers * args.ratings)]
+    start = time.perf_counter()
+    for driver_id, rating in ratings:
+        driver_service.update_rating(driver_id, rating)
+    update_us = (time.perf_counter() - start) / len(ratings) * 1e6
+    for driver_id in rng.sample(driver_ids, len(driver_ids) // 3):
+        driver_service.update_availability(driver_id, False)
+    
+    def index_top(k, city, car_type):
+        location = {'latitude': city[0], 'longitude': city[1]}
+        return driver_service.top_rated_drivers(k, location, car_type, available_only=True)
+    
+    top_queries = [(10, city, car_type) for city in CITIES for car_type in CAR_TYPES]
+    below_queries = [(2.0,)] * 5
+    rows = [
+        ('update_rating (with index)', f'{update_us:.1f}', '-', '-'),
+        ('top 10 available per city and car type', f'{per_query_us(index_top, top_queries):,.1f}',
+         f'{per_query_us(lambda k, city, car_type: scan_top(driver_service, k, city, car_type), top_queries):,.1f}',
+         '10 drivers'),
+        ('rated below 2', f'{per_query_us(driver_service.drivers_rated_below, below_queries):,.1f}',
+         f'{per_query_us(lambda threshold: scan_below(driver_service, threshold), below_queries):,.1f}',
+         f'{len(driver_service.drivers_rated_below(2.0)):,} drivers'),
+    ]
+    print(f'{args.drivers:,} drivers, {len(ratings):,} ratings')
+    print_table(('operation', 'index us', 'full scan us', 'result'), rows)
+    
+    print()
+    print(f'dispatch_batch, {args.dispatch_drivers:,} drivers, {args.dispatch_drivers // 2:,} bookings')
+    print_table(('rating_weight_km', 'assigned', 'mean pickup km', 'mean driver rating', 'drivers under 3'),
+                [dispatch_row(args.dispatch_drivers, weight, args.seed) for weight in (0, 0.5, 1, 2)])
+
+
+if __name__ == '__main__':
+    main()
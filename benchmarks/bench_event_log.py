@@ -0,0 +1,90 @@
+"""
+Event log: group-commit write throughput and recovery time.
+
+Write throughput is measured with 1..N threads updating car
+availability through a logged CarService; fsyncs/event shows how many
+writers share each commit. Recovery time is measured after histories of
+increasing length over the same fleet, showing it tracks the size of
+the state rather than the length of the history.
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from _common import print_table
+
+from cab_booking.services import create_services
+from cab_booking.storage import open_logged_repositories
+
+
+def write_throughput(threads, events, fleet):
+    with tempfile.TemporaryDirectory() as directory:
+        repositories = open_logged_repositories(directory)
+        car_service = create_services(repositories).car_service
+        ids = [car_service.create_car({'car_type': 'economy'}).car_id for _ in range(fleet)]
+        log = repositories['car'].log
+        fsyncs_before = log.fsync_count
+        
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(events // threads):
+                car_service.update_availability(rng.choice(ids), rng.random() < 0.5)
+        
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        fsyncs = log.fsync_count - fsyncs_before
+        log.close()
+    return events / elapsed, fsyncs / events
+
+
+def recovery_time(history, fleet, segment_size):
+    with tempfile.TemporaryDirectory() as directory:
+        repositories = open_logged_repositories(directory, segment_size=segment_size, sync=False)
+        car_service = create_services(repositories).car_service
+        ids = [car_service.create_car({'car_type': 'economy'}).car_id for _ in range(fleet)]
+        rng = random.Random(history)
+        for _ in range(history):
+            car_service.update_location(rng.choice(ids), {'latitude': rng.random(), 'longitude': rng.random()})
+        repositories['car'].log.close()
+        
+        start = time.perf_counter()
+        repositories = open_logged_repositories(directory, segment_size=segment_size)
+        create_services(repositories)
+        elapsed = time.perf_counter() - start
+        assert len(repositories['car']) == fleet
+        repositories['car'].log.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--events', type=int, default=4000)
+    parser.add_argument('--fleet', type=int, default=5000)
+    parser.add_argument('--histories', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('--segment-size', type=int, default=20000)
+    args = parser.parse_args()
+    
+    rows = []
+    for threads in args.threads:
+        rate, fsyncs_per_event = write_throughput(threads, args.events, args.fleet)
+        rows.append((threads, f'{rate:,.0f}', f'{fsyncs_per_event:.3f}'))
+    print_table(('threads', 'durable writes/s', 'fsyncs/event'), rows)
+    print()
+    
+    rows = [(f'{history:,}', f'{recovery_time(history, args.fleet, args.segment_size) * 1e3:.0f}')
+            for history in args.histories]
+    print(f'recovery of {args.fleet:,} cars, segment size {args.segment_size:,}')
+    print_table(('history events', 'recovery ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
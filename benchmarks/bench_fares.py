@@ -0,0 +1,66 @@
+"""
+Bulk fare computation: Fare.calculate_fares vs. per-object calculate_fare.
+"""
+
+import argparse
+import random
+
+from _common import measure, print_table, summarize
+
+from cab_booking.models import Fare
+from cab_booking.models import fare as fare_module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trips', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+    
+    if fare_module.numpy is None:
+        print('numpy is not installed; calculate_fares uses the pure-Python fallback')
+    
+    rows = []
+    for size in args.trips:
+        rng = random.Random(args.seed)
+        base = [rng.choice((40, 50, 60)) for _ in range(size)]
+        distance = [round(rng.uniform(0.5, 40), 2) for _ in range(size)]
+        minutes = [rng.randint(3, 90) for _ in range(size)]
+        surge = [rng.choice((1.0, 1.0, 1.25, 1.5, 2.0)) for _ in range(size)]
+        discount = [rng.choice((0, 0, 0, 10, 15)) for _ in range(size)]
+        
+        fares = []
+        for i in range(size):
+            fare = Fare(f'BOOK-{i:08d}', base[i], distance[i], minutes[i])
+            fare.surge_multiplier = surge[i]
+            fare.discount = discount[i]
+            fares.append(fare)
+        
+        expected = [fare.calculate_fare() for fare in fares]
+        actual = Fare.calculate_fares(base, distance, minutes, surge, discount)
+        assert list(actual) == expected, 'bulk totals differ from Fare.calculate_fare'
+        
+        per_object = summarize(measure(lambda: [fare.calculate_fare() for fare in fares], repeat=3))
+        bulk = summarize(measure(lambda: Fare.calculate_fares(base, distance, minutes, surge, discount), repeat=3))
+        row = [
+            f'{size:,}',
+            f"{per_object['best_s'] * 1e3:.1f}",
+            f"{bulk['best_s'] * 1e3:.1f}",
+            f"{per_object['best_s'] / bulk['best_s']:.1f}x",
+        ]
+        
+        # Columns that are already arrays (e.g. loaded from a columnar store)
+        # skip the list conversion that dominates the call above
+        if fare_module.numpy is not None:
+            columns = [fare_module.numpy.asarray(c, dtype='float64') for c in (base, distance, minutes, surge, discount)]
+            arrays = summarize(measure(lambda: Fare.calculate_fares(*columns), repeat=3))
+            row += [f"{arrays['best_s'] * 1e3:.1f}", f"{per_object['best_s'] / arrays['best_s']:.1f}x"]
+        else:
+            row += ['-', '-']
+        rows.append(row)
+    
+    print_table(('trips', 'per-object ms', 'from lists ms', 'speedup', 'from arrays ms', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+End-to-end HTTP load test: booking lifecycles against a running app.
+
+Starts the Flask app (the app cab_booking.wsgi serves, on Werkzeug's
+threaded server) or the ASGI app (uvicorn) locally, or targets a server
+already listening at --target, then replays trips. Each trip creates a
+passenger (or reuses one of its own with --reuse-passengers), creates
+a booking between two points, assigns a free driver, and then either
+cancels (--cancel-share of trips) or starts and completes the trip. GET
+requests for the booking, passenger and driver are mixed in between
+(--gets per trip).
+
+With --rate, trips arrive as a Poisson process at that many per second
+and wait in a queue for one of --concurrency connections, so a server
+that can't keep up shows growing "start lag" rather than a quietly
+lower load. Without it each connection runs trips back to back. Drivers
+(--drivers, created up front through the bulk endpoint) are handed out
+from a pool and returned when their trip ends.
+
+Reports throughput and p50/p95/p99/max latency per endpoint, and can
+save them as JSON. Runs entirely offline against 127.0.0.1.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+
+from _common import print_table, random_location
+from _http import HTTPConnection, free_port, percentile, start_server
+
+SERVERS = {
+    'wsgi': (
+        "from cab_booking.app import create_app; "
+        "create_app().run(host='127.0.0.1', port={port}, threaded=True)"
+    ),
+    'asgi': (
+        "import uvicorn; "
+        "uvicorn.run('cab_booking.app.asgi:app', host='127.0.0.1', port={port}, log_level='warning')"
+    ),
+}
+
+
+class Recorder:
+    """Latencies and failures per endpoint"""
+    
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.start_lag = []
+        self.trips = collections.Counter()
+    
+    async def call(self, connection, name, method, path, body=None, expect=(200, 201)):
+        """Send a request and record it under name; returns the decoded JSON body or None"""
+        start = time.perf_counter()
+        status, _, content = await connection.request(method, path, body)
+        self.latencies[name].append(time.perf_counter() - start)
+        if status not in expect:
+            self.errors[name] += 1
+            return None
+        return json.loads(content) if content else None
+
+
+class LoadTest:
+    def __init__(self, host, port, args):
+        self.host = host
+        self.port = port
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.recorder = Recorder()
+        self.drivers = asyncio.Queue()
+    
+    async def create_drivers(self):
+        connection = HTTPConnection(self.host, self.port)
+        records = [{'name': f'Load Driver {i}', 'phone': f'9{i:09d}', 'license_number': f'LD-{i:07d}'}
+                   for i in range(self.args.drivers)]
+        status, _, content = await connection.request('POST', '/api/drivers/bulk', records)
+        await connection.close()
+        if status != 200:
+            raise RuntimeError(f'Creating drivers failed with status {status}')
+        for result in json.loads(content):
+            if 'driver_id' in result:
+                self.drivers.put_nowait(result['driver_id'])
+    
+    async def trip(self, connection, passengers):
+        args, rng, record = self.args, self.rng, self.recorder.call
+        
+        passenger_id = None
+        if passengers and rng.random() < args.reuse_passengers:
+            passenger_id = rng.choice(passengers)
+        else:
+            n = rng.randrange(10 ** 9)
+            created = await record(connection, 'POST /api/passengers', 'POST', '/api/passengers', {
+                'name': f'Rider {n}', 'phone': f'8{n:09d}', 'email': f'rider{n}@example.com',
+            })
+            if created is None:
+                return
+            passenger_id = created['passenger_id']
+            passengers.append(passenger_id)
+        
+        created = await record(connection, 'POST /api/bookings', 'POST', '/api/bookings', {
+            'passenger_id': passenger_id,
+            'from_location': random_location(rng),
+            'to_location': random_location(rng),
+        })
+        if created is None:
+            return
+        booking_path = f"/api/bookings/{created['booking_id']}"
+        
+        driver_id = await self.drivers.get()
+        try:
+            gets = [
+                ('GET /api/bookings/<id>', booking_path),
+                ('GET /api/passengers/<id>', f'/api/passengers/{passenger_id}'),
+                ('GET /api/drivers/<id>', f'/api/drivers/{driver_id}'),
+            ]
+            steps = ['assign', 'cancel'] if rng.random() < args.cancel_share else ['assign', 'start', 'complete']
+            # Spread the GETs over the gaps between lifecycle steps
+            slots = [rng.randrange(len(steps)) for _ in range(args.gets)]
+            
+            for index, step in enumerate(steps):
+                if step == 'assign':
+                    result = await record(connection, 'POST /api/bookings/<id>/assign-driver', 'POST',
+                                          f'{booking_path}/assign-driver', {'driver_id': driver_id})
+                elif step == 'start':
+                    result = await record(connection, 'PUT /api/bookings/<id>/start', 'PUT',
+                                          f'{booking_path}/start', {})
+                elif step == 'complete':
+                    result = await record(connection, 'PUT /api/bookings/<id>/complete', 'PUT',
+                                          f'{booking_path}/complete', {
+                                              'actual_distance_km': round(rng.uniform(1, 25), 1),
+                                              'actual_duration_minutes': rng.randint(5, 60),
+                                          })
+                else:
+                    result = await record(connection, 'PUT /api/bookings/<id>/cancel', 'PUT',
+                                          f'{booking_path}/cancel', {'reason': 'load test'})
+                if result is None:
+                    return
+                for _ in range(slots.count(index)):
+                    name, path = rng.choice(gets)
+                    await record(connection, name, 'GET', path, expect=(200, 304))
+            self.recorder.trips['cancelled' if 'cancel' in steps else 'completed'] += 1
+        finally:
+            self.drivers.put_nowait(driver_id)
+    
+    async def closed_loop(self, deadline):
+        connection = HTTPConnection(self.host, self.port)
+        passengers = []
+        while time.perf_counter() < deadline:
+            await self.trip(connection, passengers)
+        await connection.close()
+    
+    async def open_loop_worker(self, queue):
+        connection = HTTPConnection(self.host, self.port)
+        passengers = []
+        while True:
+            due = await queue.get()
+            if due is None:
+                break
+            self.recorder.start_lag.append(max(0.0, time.perf_counter() - due))
+            await self.trip(connection, passengers)
+        await connection.close()
+    
+    async def run(self):
+        await self.create_drivers()
+        args = self.args
+        start = time.perf_counter()
+        deadline = start + args.duration
+        if not args.rate:
+            await asyncio.gather(*(self.closed_loop(deadline) for _ in range(args.concurrency)))
+        else:
+            queue = asyncio.Queue()
+            workers = [asyncio.ensure_future(self.open_loop_worker(queue)) for _ in range(args.concurrency)]
+            due = start
+            while True:
+                due += self.rng.expovariate(args.rate)
+                if due >= deadline:
+                    break
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                queue.put_nowait(due)
+            for _ in workers:
+                queue.put_nowait(None)
+            await asyncio.gather(*workers)
+        return time.perf_counter() - start
+
+
+def report(recorder, elapsed):
+    """Per-endpoint rows and a JSON-ready summary"""
+    rows, endpoints = [], {}
+    total = 0
+    for name in sorted(recorder.latencies):
+        latencies = sorted(recorder.latencies[name])
+        total += len(latencies)
+        summary = {
+            'requests': len(latencies),
+            'errors': recorder.errors[name],
+            'per_s': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1e3,
+            'p95_ms': percentile(latencies, 0.95) * 1e3,
+            'p99_ms': percentile(latencies, 0.99) * 1e3,
+            'max_ms': latencies[-1] * 1e3,
+        }
+        endpoints[name] = summary
+        rows.append((name, f"{summary['requests']:,}", summary['errors'], f"{summary['per_s']:,.1f}",
+                     *(f"{summary[key]:,.1f}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'))))
+    lag = sorted(recorder.start_lag)
+    return rows, {
+        'elapsed_s': elapsed,
+        'requests': total,
+        'requests_per_s': total / elapsed,
+        'trips': dict(recorder.trips),
+        'trips_per_s': sum(recorder.trips.values()) / elapsed,
+        'start_lag_p99_ms': percentile(lag, 0.99) * 1e3 if lag else None,
+        'endpoints': endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=sorted(SERVERS), default='wsgi', help='app to start locally')
+    parser.add_argument('--target', help='host:port of a server already running; nothing is started')
+    parser.add_argument('--concurrency', type=int, default=16, help='connections')
+    parser.add_argument('--rate', type=float, default=0, help='trips per second; 0 runs closed-loop')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--drivers', type=int, default=500)
+    parser.add_argument('--cancel-share', type=float, default=0.1)
+    parser.add_argument('--gets', type=int, default=3, help='GET requests per trip')
+    parser.add_argument('--reuse-passengers', type=float, default=0.5,
+                        help="share of trips booked by one of the connection's earlier passengers")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+    
+    server = None
+    if args.target:
+        host, _, port = args.target.rpartition(':')
+        host, port = host or '127.0.0.1', int(port)
+    else:
+        host, port = '127.0.0.1', free_port()
+        server = start_server(SERVERS[args.server].format(port=port), port)
+    try:
+        test = LoadTest(host, port, args)
+        elapsed = asyncio.run(test.run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    
+    rows, summary = report(test.recorder, elapsed)
+    target = args.target or f'{args.server} app'
+    load = f'{args.rate:g} trips/s offered' if args.rate else 'closed loop'
+    print(f'{target}, {args.concurrency} connections, {load}, {elapsed:.1f} s')
+    print_table(('endpoint', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'), rows)
+    print(f"\n{summary['requests_per_s']:,.1f} req/s, {summary['trips_per_s']:,.1f} trips/s "
+          f"({summary['trips'].get('completed', 0):,} completed, {summary['trips'].get('cancelled', 0):,} cancelled)")
+    if summary['start_lag_p99_ms'] is not None:
+        print(f"p99 start lag behind the arrival schedule: {summary['start_lag_p99_ms']:,.1f} ms")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'target': target, 'concurrency': args.concurrency, 'rate': args.rate, **summary}, f, indent=2)
+        print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Lock striping: service throughput under many concurrent writers.
+
+Each thread runs whole booking lifecycles (create, assign, start,
+complete) for its own passenger and driver while moving its car, so
+threads only share lock stripes, never entities. Comparing one stripe
+(a single global lock per service) with the default 64 shows how much
+the locks themselves serialize work; with the event-log backend a
+writer waits for its fsync while holding its stripe, so striping is
+what lets group commit batch writes from many threads.
+
+Before timing anything, a race check has every thread try to assign
+the same driver at once and verifies exactly one succeeds.
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from _common import CAR_TYPES, print_table, random_location
+
+from cab_booking.services import create_services
+from cab_booking.storage import open_logged_repositories
+
+
+def race_check(threads, stripes):
+    services = create_services(lock_stripes=stripes)
+    passenger = services.passenger_service.create_passenger({'name': 'Racer'})
+    driver = services.driver_service.create_driver({'name': 'Contested'})
+    bookings = [services.booking_service.create_booking({'passenger_id': passenger.passenger_id})
+                for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+    winners = []
+    
+    def worker(booking):
+        barrier.wait()
+        try:
+            services.booking_service.assign_driver(booking.booking_id, driver.driver_id)
+            winners.append(booking.booking_id)
+        except ValueError:
+            pass
+    
+    run_threads(worker, bookings)
+    assert len(winners) == 1, f'{len(winners)} bookings got the same driver'
+
+
+def run_threads(worker, args):
+    workers = [threading.Thread(target=worker, args=(arg,)) for arg in args]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def throughput(services, threads, trips):
+    rng = random.Random(threads)
+    actors = []
+    for i in range(threads):
+        passenger = services.passenger_service.create_passenger({'name': f'Passenger {i}'})
+        driver = services.driver_service.create_driver({'name': f'Driver {i}'})
+        car = services.car_service.create_car({'car_type': CAR_TYPES[i % len(CAR_TYPES)]})
+        services.driver_service.assign_car(driver.driver_id, car)
+        actors.append((passenger.passenger_id, driver.driver_id, car.car_id, random.Random(rng.random())))
+    
+    def worker(actor):
+        passenger_id, driver_id, car_id, thread_rng = actor
+        booking_service = services.booking_service
+        for _ in range(trips):
+            services.car_service.update_location(car_id, random_location(thread_rng))
+            booking = booking_service.create_booking({
+                'passenger_id': passenger_id,
+                'from_location': random_location(thread_rng),
+                'to_location': random_location(thread_rng),
+            })
+            booking_service.assign_driver(booking.booking_id, driver_id)
+            booking_service.start_trip(booking.booking_id)
+            booking_service.complete_trip(booking.booking_id, {'actual_distance_km': 5})
+    
+    elapsed = run_threads(worker, actors)
+    # Five service writes per trip
+    return threads * trips * 5 / elapsed
+
+
+def in_memory(threads, trips, stripes):
+    return throughput(create_services(lock_stripes=stripes), threads, trips)
+
+
+def event_logged(threads, trips, stripes):
+    with tempfile.TemporaryDirectory() as directory:
+        repositories = open_logged_repositories(directory)
+        try:
+            return throughput(create_services(repositories, lock_stripes=stripes), threads, trips)
+        finally:
+            repositories['car'].log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, nargs='+', default=[32, 64])
+    parser.add_argument('--trips', type=int, default=50)
+    parser.add_argument('--durable-trips', type=int, default=10)
+    parser.add_argument('--stripes', type=int, nargs='+', default=[1, 64])
+    args = parser.parse_args()
+    
+    for threads in args.threads:
+        for stripes in args.stripes:
+            race_check(threads, stripes)
+    print(f'race check passed: one winner per contested driver ({", ".join(map(str, args.threads))} threads)')
+    print()
+    
+    rows = []
+    for threads in args.threads:
+        for stripes in args.stripes:
+            rows.append((threads, stripes, 'memory', f'{in_memory(threads, args.trips, stripes):,.0f}'))
+            rows.append((threads, stripes, 'event log', f'{event_logged(threads, args.durable_trips, stripes):,.0f}'))
+    print_table(('threads', 'stripes', 'backend', 'writes/s'), rows)
+
+
+if __name__ == '__main__':
+    main()
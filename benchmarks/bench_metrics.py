@@ -0,0 +1,192 @@
+"""
+Cost of the request and booking metrics on the hot path.
+
+Times the metric updates on their own (a counter increment, a histogram
+observation, and the start/finish pair every request makes), then the
+same requests through each app with and without instrumentation: the
+ASGI app's __call__ against its uninstrumented handle(), and the Flask
+app with its metrics hooks registered and removed. Last, a booking
+lifecycle (create, assign, start, complete) on services with and
+without a MetricsRegistry counting its transitions.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from _common import print_table, random_location
+
+from cab_booking.app.metrics import HTTPMetrics
+from cab_booking.services import create_services
+from cab_booking.utils import MetricsRegistry
+
+
+def per_op_us(fn, ops, repeat):
+    """Best microseconds per call of fn() over repeat rounds of ops calls"""
+    return paired_us([fn], ops, repeat)[0]
+
+
+def paired_us(fns, ops, repeat):
+    """
+    Best microseconds per call of each of fns, taking turns round by round
+    
+    Alternating keeps a slow spell on a busy machine from landing on just
+    one side of a comparison.
+    """
+    timings = [[] for _ in fns]
+    for _ in range(repeat):
+        for fn, fn_timings in zip(fns, timings):
+            start = time.perf_counter()
+            for _ in range(ops):
+                fn()
+            fn_timings.append((time.perf_counter() - start) / ops)
+    return [min(fn_timings) * 1e6 for fn_timings in timings]
+
+
+def metric_updates(ops, repeat):
+    registry = MetricsRegistry()
+    counter = registry.counter('c', 'counter', ('method', 'route', 'status'))
+    histogram = registry.histogram('h', 'histogram', ('method', 'route'))
+    http = HTTPMetrics(registry)
+    
+    def request():
+        http.finish(http.start(), 'GET', '/api/bookings/<booking_id>', 200)
+    return [
+        ('Counter.inc', per_op_us(lambda: counter.inc('GET', '/api/status', 200), ops, repeat)),
+        ('Histogram.observe', per_op_us(lambda: histogram.observe(0.00042, 'GET', '/api/status'), ops, repeat)),
+        ('HTTPMetrics start + finish', per_op_us(request, ops, repeat)),
+    ]
+
+
+def seeded_services(rng):
+    services = create_services()
+    passenger = services.passenger_service.create_passenger({
+        'name': 'Rider', 'phone': '8000000000', 'email': 'rider@example.com',
+    })
+    booking = services.booking_service.create_booking({
+        'passenger_id': passenger.passenger_id,
+        'from_location': random_location(rng),
+        'to_location': random_location(rng),
+    })
+    return services, booking.booking_id
+
+
+def asgi_requests(rng, ops, repeat):
+    from cab_booking.app.asgi import CabBookingASGI
+    
+    services, booking_id = seeded_services(rng)
+    app = CabBookingASGI(services)
+    
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+    
+    async def send(message):
+        pass
+    
+    async def serve(entry, path):
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': [], 'query_string': b''}
+        await entry(scope, receive, send)
+    
+    loop = asyncio.new_event_loop()
+    rows = []
+    for path in ('/api/status', f'/api/bookings/{booking_id}'):
+        plain, instrumented = paired_us([
+            lambda: loop.run_until_complete(serve(app.handle, path)),
+            lambda: loop.run_until_complete(serve(app, path)),
+        ], ops, repeat)
+        rows.append((f'ASGI GET {path}', plain, instrumented))
+    loop.close()
+    return rows
+
+
+def flask_requests(rng, ops, repeat):
+    from cab_booking.app.api import app, booking_service, passenger_service, record_request_metrics, \
+        start_request_metrics
+    
+    passenger = passenger_service.create_passenger({
+        'name': 'Rider', 'phone': '8000000001', 'email': 'rider1@example.com',
+    })
+    booking = booking_service.create_booking({
+        'passenger_id': passenger.passenger_id,
+        'from_location': random_location(rng),
+        'to_location': random_location(rng),
+    })
+    client = app.test_client()
+    
+    def set_hooks(enabled):
+        app.before_request_funcs.setdefault(None, [])
+        app.after_request_funcs.setdefault(None, [])
+        for hooks, hook in ((app.before_request_funcs[None], start_request_metrics),
+                            (app.after_request_funcs[None], record_request_metrics)):
+            if hook in hooks:
+                hooks.remove(hook)
+            if enabled:
+                hooks.append(hook)
+    
+    def get(path, instrumented):
+        set_hooks(instrumented)
+        client.get(path)
+    
+    rows = []
+    for path in ('/api/status', f'/api/bookings/{booking.booking_id}'):
+        plain, instrumented = paired_us([lambda: get(path, False), lambda: get(path, True)], ops, repeat)
+        rows.append((f'Flask GET {path}', plain, instrumented))
+    set_hooks(True)
+    return rows
+
+
+def lifecycle(rng, **service_options):
+    """A function running one booking through create, assign, start and complete"""
+    services = create_services(**service_options)
+    passenger = services.passenger_service.create_passenger({
+        'name': 'Rider', 'phone': '8000000002', 'email': 'rider2@example.com',
+    })
+    car = services.car_service.create_car({
+        'model': 'Model', 'make': 'Make', 'year': 2022, 'license_plate': 'KA-0000001',
+        'capacity': 4, 'car_type': 'economy',
+    })
+    driver = services.driver_service.create_driver({
+        'name': 'Driver', 'phone': '9000000000', 'license_number': 'DL-0000001',
+    })
+    services.driver_service.assign_car(driver.driver_id, car)
+    booking_service = services.booking_service
+    request = {
+        'passenger_id': passenger.passenger_id,
+        'from_location': random_location(rng),
+        'to_location': random_location(rng),
+    }
+    trip_data = {'actual_distance_km': 7.5, 'actual_duration_minutes': 18}
+    
+    def run():
+        booking_id = booking_service.create_booking(request).booking_id
+        booking_service.assign_driver(booking_id, driver.driver_id)
+        booking_service.start_trip(booking_id)
+        booking_service.complete_trip(booking_id, trip_data)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=2000, help='operations per round')
+    parser.add_argument('--repeat', type=int, default=9, help='rounds, of which the best is reported')
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    
+    print_table(('metric update', 'us'),
+                [(name, f'{us:,.2f}') for name, us in metric_updates(args.ops * 10, args.repeat)])
+    print()
+    rows = [
+        *asgi_requests(rng, args.ops, args.repeat),
+        *flask_requests(rng, args.ops, args.repeat),
+        ('booking lifecycle', *paired_us([lifecycle(rng, metrics=None), lifecycle(rng)], args.ops, args.repeat)),
+    ]
+    print_table(('operation', 'us without', 'us with', 'us added', 'overhead'),
+                [(name, f'{plain:,.2f}', f'{instrumented:,.2f}', f'{instrumented - plain:+,.2f}',
+                  f'{instrumented / plain - 1:+.1%}')
+                 for name, plain, instrumented in rows])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Model memory footprint: __slots__ models vs. equivalent __dict__-based classes.
+
+Reports tracemalloc bytes per object for each model, and the resident
+set size of a process holding N bookings (each with its own Fare, and
+passengers/drivers/cars shared between bookings). Each variant runs in
+a fresh subprocess so the RSS figures don't contaminate each other.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+from _common import print_table
+
+from cab_booking import models
+
+
+def dict_based(cls):
+    """Rebuild a slotted model as an ordinary class with a per-instance __dict__"""
+    namespace = {
+        name: value for name, value in vars(cls).items()
+        if name not in cls.__slots__ and name not in ('__slots__', '__dict__', '__weakref__')
+    }
+    return type(cls.__name__, (), namespace)
+
+
+def model_classes(variant):
+    classes = {name: getattr(models, name) for name in ('Booking', 'Car', 'Driver', 'Passenger', 'Fare')}
+    if variant == 'dict':
+        classes = {name: dict_based(cls) for name, cls in classes.items()}
+    return classes
+
+
+def make_booking(classes, i, passenger, driver):
+    booking = classes['Booking'](f'BOOK-{i:08d}', passenger, f'{i} Main St', f'{i} Park Ave')
+    booking.set_estimated_trip_details(12.5, 30)
+    booking.assign_driver(driver)
+    booking.start_trip()
+    booking.complete_trip(12.5, 30)
+    booking.fare = classes['Fare'](booking.booking_id, 50, 12.5, 30)
+    return booking
+
+
+def bytes_per_object(classes, count=20000):
+    factories = {
+        'Passenger': lambda key: classes['Passenger'](key, 'Name', '555', 'a@b.c'),
+        'Driver': lambda key: classes['Driver'](key, 'Name', '555', 'a@b.c', 'LIC'),
+        'Car': lambda key: classes['Car'](key, 'Prius', 'Toyota', 2020, 'ABC', 4, 'economy'),
+        'Fare': lambda key: classes['Fare'](key, 50, 12.5, 30),
+        'Booking': lambda key: classes['Booking'](key, None, 'A', 'B'),
+    }
+    # IDs are built before tracing starts so only the objects themselves
+    # (and whatever they allocate) are measured
+    keys = [f'ID-{i:08d}' for i in range(count)]
+    objects = [None] * count
+    results = {}
+    for name, factory in factories.items():
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i, key in enumerate(keys):
+            objects[i] = factory(key)
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[name] = (after - before) / count
+        objects = [None] * count
+    return results
+
+
+def resident_bytes():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def run_variant(variant, bookings):
+    classes = model_classes(variant)
+    per_object = bytes_per_object(classes)
+    
+    baseline = resident_bytes()
+    passengers = [classes['Passenger'](f'PASS-{i:08d}', 'Name', '555', 'a@b.c') for i in range(bookings // 10)]
+    drivers = []
+    for i in range(bookings // 20):
+        driver = classes['Driver'](f'DRIV-{i:08d}', 'Name', '555', 'a@b.c', 'LIC')
+        driver.assign_car(classes['Car'](f'CAR-{i:08d}', 'Prius', 'Toyota', 2020, 'ABC', 4, 'economy'))
+        drivers.append(driver)
+    store = {}
+    for i in range(bookings):
+        booking = make_booking(classes, i, passengers[i % len(passengers)], drivers[i % len(drivers)])
+        store[booking.booking_id] = booking
+    
+    return {'per_object': per_object, 'rss_bytes': resident_bytes() - baseline}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--variant', choices=('dict', 'slots'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.bookings)))
+        return
+    
+    results = {}
+    for variant in ('dict', 'slots'):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--variant', variant, '--bookings', str(args.bookings)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[variant] = json.loads(output)
+    
+    rows = []
+    for name in results['dict']['per_object']:
+        before = results['dict']['per_object'][name]
+        after = results['slots']['per_object'][name]
+        rows.append((name, f'{before:.0f}', f'{after:.0f}', f'{(1 - after / before) * 100:.0f}%'))
+    before = results['dict']['rss_bytes']
+    after = results['slots']['rss_bytes']
+    rows.append((f'RSS @ {args.bookings:,} bookings', f'{before / 2**20:.0f} MiB', f'{after / 2**20:.0f} MiB',
+                 f'{(1 - after / before) * 100:.0f}%'))
+    print_table(('', '__dict__ bytes', '__slots__ bytes', 'saved'), rows)
+
+
+if __name__ == '__main__':
+    main()
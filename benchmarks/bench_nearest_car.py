@@ -0,0 +1,75 @@
+"""
+Nearest-available-car lookup: spatial index vs. linear scan.
+
+The linear scan is what callers had to do before
+CarService.find_nearest_available existed: fetch get_available_cars()
+and sort every candidate by distance.
+"""
+
+import argparse
+import heapq
+import random
+
+from _common import CAR_TYPES, measure, print_table, random_location, summarize
+
+from cab_booking.services import CarService
+from cab_booking.utils import get_coordinates, haversine_km
+
+
+def build_fleet(size, seed):
+    rng = random.Random(seed)
+    service = CarService()
+    for i in range(size):
+        car = service.create_car({
+            'model': 'Prius', 'make': 'Toyota', 'year': 2020,
+            'license_plate': f'BM-{i:06d}', 'capacity': 4,
+            'car_type': rng.choice(CAR_TYPES),
+        })
+        service.update_location(car.car_id, random_location(rng))
+        if rng.random() < 0.3:
+            service.update_availability(car.car_id, False)
+    return service
+
+
+def linear_nearest(service, location, car_type, k):
+    lat, lon = get_coordinates(location)
+    candidates = []
+    for car in service.get_available_cars(car_type):
+        car_lat, car_lon = get_coordinates(car.current_location)
+        candidates.append((haversine_km(lat, lon, car_lat, car_lon), car.car_id))
+    return heapq.nsmallest(k, candidates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cars', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    rows = []
+    for size in args.cars:
+        service = build_fleet(size, args.seed)
+        rng = random.Random(args.seed + 1)
+        queries = [(random_location(rng), rng.choice(CAR_TYPES)) for _ in range(args.queries)]
+        
+        for location, car_type in queries[:50]:
+            expected = [car_id for _, car_id in linear_nearest(service, location, car_type, args.k)]
+            actual = [car.car_id for car, _ in service.find_nearest_available(location, car_type, k=args.k)]
+            assert actual == expected, (location, car_type, actual, expected)
+        
+        linear = summarize(measure(lambda: [linear_nearest(service, loc, ct, args.k) for loc, ct in queries], repeat=3))
+        indexed = summarize(measure(lambda: [service.find_nearest_available(loc, ct, k=args.k) for loc, ct in queries], repeat=3))
+        rows.append((
+            size,
+            f"{linear['best_s'] / args.queries * 1e6:.1f}",
+            f"{indexed['best_s'] / args.queries * 1e6:.1f}",
+            f"{linear['best_s'] / indexed['best_s']:.1f}x",
+        ))
+    
+    print_table(('cars', 'linear us/query', 'indexed us/query', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
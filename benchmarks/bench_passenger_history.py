@@ -0,0 +1,73 @@
+"""
+Passenger booking history: memory held, and recent-booking lookups.
+
+P passengers each take T trips that end completed, so every booking
+moves into the archive. "unbounded" keeps every Booking on
+Passenger.booking_history (RECENT_BOOKINGS = None, as before the window
+was bounded); "window" keeps the latest Passenger.RECENT_BOOKINGS.
+Reports traced memory once all trips are done, and the time of
+BookingService.get_recent_bookings for a limit the window covers and
+for one that pages older bookings in from the archive.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from _common import print_table
+
+from cab_booking.models import Passenger
+from cab_booking.services import create_services
+
+
+def run(passengers, trips, limits):
+    tracemalloc.start()
+    services = create_services()
+    car = services.car_service.create_car({'license_plate': 'KA-01-0001', 'car_type': 'economy'})
+    driver = services.driver_service.create_driver({'name': 'Driver', 'license_number': 'DL-1'})
+    services.driver_service.assign_car(driver.driver_id, car)
+    passenger_ids = [services.passenger_service.create_passenger({'name': f'Rider {i}'}).passenger_id
+                     for i in range(passengers)]
+    booking_service = services.booking_service
+    for _ in range(trips):
+        for passenger_id in passenger_ids:
+            booking = booking_service.create_booking({
+                'passenger_id': passenger_id, 'from_location': 'A', 'to_location': 'B',
+            })
+            booking_service.assign_driver(booking.booking_id, driver.driver_id)
+            booking_service.start_trip(booking.booking_id)
+            booking_service.complete_trip(booking.booking_id, {'actual_distance_km': 5})
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    timings = []
+    for limit in limits:
+        start = time.perf_counter()
+        for passenger_id in passenger_ids:
+            booking_service.get_recent_bookings(passenger_id, limit)
+        timings.append((time.perf_counter() - start) / len(passenger_ids))
+    return memory, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--passengers', type=int, default=200)
+    parser.add_argument('--trips', type=int, default=200)
+    args = parser.parse_args()
+    
+    window = Passenger.RECENT_BOOKINGS
+    limits = (5, 50)
+    rows = []
+    for name, size in (('unbounded', None), (f'window of {window}', window)):
+        Passenger.RECENT_BOOKINGS = size
+        memory, timings = run(args.passengers, args.trips, limits)
+        rows.append((name, f'{memory / 2 ** 20:,.1f}', f'{memory / (args.passengers * args.trips):,.0f}',
+                     *(f'{t * 1e6:,.1f}' for t in timings)))
+    Passenger.RECENT_BOOKINGS = window
+    
+    print(f'{args.passengers:,} passengers x {args.trips} completed trips')
+    print_table(('history', 'traced MiB', 'bytes/booking', *(f'recent {n} us' for n in limits)), rows)
+
+
+if __name__ == '__main__':
+    main()
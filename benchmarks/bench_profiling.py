@@ -0,0 +1,96 @@
+"""
+Cost of on-demand request profiling.
+
+Times POST /api/bookings and GET /api/bookings/<id> through the Flask
+test client with no profiler installed, with one installed but not
+asked for (the cost every request pays while profiling is available),
+and with each request profiled by cProfile and by stack sampling,
+including writing the profile files. The configurations take turns
+round by round, and the best round of each is reported.
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from _common import print_table, random_location
+
+from cab_booking.app import create_app, profiling
+
+HOOK_LISTS = ('before_request_funcs', 'after_request_funcs', 'teardown_request_funcs')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=500, help='requests per round')
+    parser.add_argument('--profiled-ops', type=int, default=50, help='profiled requests per round')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    
+    directory = tempfile.mkdtemp(prefix='cab-booking-profiles-')
+    app = create_app(profile_directory=directory, profile_token='bench')
+    # Profile every request asked for, however close together
+    app.extensions['request_profiler'].min_interval = 0
+    client = app.test_client()
+    passenger_id = client.post('/api/passengers', json={
+        'name': 'Rider', 'phone': '8000000000', 'email': 'rider@example.com',
+    }).get_json()['passenger_id']
+    booking = {
+        'passenger_id': passenger_id,
+        'from_location': random_location(rng),
+        'to_location': random_location(rng),
+    }
+    booking_path = f"/api/bookings/{client.post('/api/bookings', json=booking).get_json()['booking_id']}"
+    
+    # The profiler's hooks, taken out for the "not installed" runs
+    hooks = {name: [hook for hook in getattr(app, name)[None] if hook.__module__ == profiling.__name__]
+             for name in HOOK_LISTS}
+    
+    def set_installed(installed):
+        for name, profiler_hooks in hooks.items():
+            registered = getattr(app, name)[None]
+            for hook in profiler_hooks:
+                if hook in registered:
+                    registered.remove(hook)
+                if installed:
+                    registered.append(hook)
+    
+    requests = {
+        'POST /api/bookings': lambda headers: client.post('/api/bookings', json=booking, headers=headers),
+        'GET /api/bookings/<id>': lambda headers: client.get(booking_path, headers=headers),
+    }
+    configurations = (
+        ('not installed', False, {}, args.ops),
+        ('installed, idle', True, {}, args.ops),
+        ('cprofile', True, {'X-Profile': 'cprofile:bench'}, args.profiled_ops),
+        ('sample', True, {'X-Profile': 'sample:bench'}, args.profiled_ops),
+    )
+    
+    rows = []
+    try:
+        for endpoint, send in requests.items():
+            best = {}
+            for _ in range(args.repeat):
+                for label, installed, headers, ops in configurations:
+                    set_installed(installed)
+                    start = time.perf_counter()
+                    for _ in range(ops):
+                        send(headers)
+                    elapsed = (time.perf_counter() - start) / ops
+                    best[label] = min(best.get(label, elapsed), elapsed)
+            baseline = best['not installed']
+            for label, _, _, _ in configurations:
+                rows.append((endpoint, label, f'{best[label] * 1e6:,.1f}', f'{best[label] / baseline - 1:+.1%}'))
+    finally:
+        set_installed(True)
+        shutil.rmtree(directory)
+    
+    print_table(('request', 'profiling', 'us per request', 'vs. not installed'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Service throughput over the in-memory dict backend vs. SQLiteRepository.
+
+Runs the same CarService workload (create, hot reads, cold reads,
+availability updates) against each backend and reports operations per
+second. The SQLite figures include the final flush of buffered writes.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _common import print_table
+
+from cab_booking.services import CarService
+from cab_booking.storage import open_sqlite_repositories
+
+
+def run(service, size, seed, flush):
+    rng = random.Random(seed)
+    results = {}
+    
+    start = time.perf_counter()
+    ids = [service.create_car({'model': 'Prius', 'make': 'Toyota', 'car_type': 'economy'}).car_id
+           for _ in range(size)]
+    flush()
+    results['create'] = size / (time.perf_counter() - start)
+    
+    hot = ids[:1000]
+    start = time.perf_counter()
+    for _ in range(size):
+        service.get_car(rng.choice(hot))
+    results['hot read'] = size / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    for _ in range(size):
+        service.get_car(rng.choice(ids))
+    results['random read'] = size / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    for _ in range(size):
+        service.update_availability(rng.choice(ids), rng.random() < 0.5)
+    flush()
+    results['update'] = size / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cars', type=int, default=50000)
+    parser.add_argument('--cache-size', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+    
+    backends = {'dict': run(CarService(), args.cars, args.seed, lambda: None)}
+    
+    with tempfile.TemporaryDirectory() as directory:
+        repositories = open_sqlite_repositories(os.path.join(directory, 'bench.db'),
+                                                cache_size=args.cache_size, batch_size=args.batch_size)
+        repository = repositories['car']
+        backends['sqlite'] = run(CarService(repository), args.cars, args.seed, repository.flush)
+        repository.pool.close()
+    
+    rows = [
+        (operation, f"{backends['dict'][operation]:,.0f}", f"{backends['sqlite'][operation]:,.0f}")
+        for operation in backends['dict']
+    ]
+    print(f'{args.cars:,} cars, SQLite cache {args.cache_size:,}, write batch {args.batch_size}')
+    print_table(('operation', 'dict ops/s', 'sqlite ops/s'), rows)
+
+
+if __name__ == '__main__':
+    main()
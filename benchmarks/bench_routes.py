@@ -0,0 +1,92 @@
+"""
+Route estimates: popular trips with and without the RouteEstimator cache.
+
+T trip requests are drawn from P origin-destination pairs with Zipf
+popularity (a few airport and station runs dominate), each end jittered
+by up to 30 m as real pickups are. The route callable stands in for a
+routing service by sleeping --route-ms per call. Requests are estimated
+by calling the route directly, then through a RouteEstimator, first
+from one thread and then from --threads threads starting with a cold
+cache, where misses on the same pair are coalesced into one call.
+"""
+
+import argparse
+import concurrent.futures
+import random
+import threading
+import time
+
+from _common import print_table, random_location
+
+from cab_booking.services import RouteEstimator
+from cab_booking.services.routing import straight_line_route
+
+
+def trips(rng, pairs, count, jitter_deg=0.0003):
+    ends = [(random_location(rng), random_location(rng)) for _ in range(pairs)]
+    weights = [1 / (rank + 1) for rank in range(pairs)]
+    
+    def jittered(location):
+        return (location['latitude'] + rng.uniform(-jitter_deg, jitter_deg),
+                location['longitude'] + rng.uniform(-jitter_deg, jitter_deg))
+    return [(jittered(origin), jittered(destination))
+            for origin, destination in rng.choices(ends, weights, k=count)]
+
+
+class SlowRoute:
+    """straight_line_route behind a fixed delay, counting calls"""
+    
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def __call__(self, origin, destination):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return straight_line_route(origin, destination)
+
+
+def run(requests, estimate, threads):
+    start = time.perf_counter()
+    if threads == 1:
+        for origin, destination in requests:
+            estimate(origin, destination)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda trip: estimate(*trip), requests))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trips', type=int, default=5000)
+    parser.add_argument('--pairs', type=int, default=500)
+    parser.add_argument('--route-ms', type=float, default=2.0)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+    
+    requests = trips(random.Random(args.seed), args.pairs, args.trips)
+    rows = []
+    
+    route = SlowRoute(args.route_ms / 1e3)
+    elapsed = run(requests, route, 1)
+    rows.append(('uncached, 1 thread', route.calls, '-', '-', f'{elapsed / len(requests) * 1e6:,.0f}', '-'))
+    
+    for threads in (1, args.threads):
+        route = SlowRoute(args.route_ms / 1e3)
+        estimator = RouteEstimator(route=route)
+        elapsed = run(requests, estimator.estimate, threads)
+        stats = estimator.stats()
+        rows.append((f'RouteEstimator, {threads} thread{"s" if threads > 1 else ""}', route.calls,
+                     stats['coalesced'], f"{stats['hit_rate']:.1%}", f'{elapsed / len(requests) * 1e6:,.0f}',
+                     f"{stats['hit_ms_p50'] * 1e3:,.1f}"))
+    
+    print(f'{args.trips:,} trips over {args.pairs:,} pairs, route call {args.route_ms:g} ms')
+    print_table(('estimates', 'route calls', 'coalesced', 'hit rate', 'us per trip', 'hit p50 us'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Booking serialization: encoding a hot booking for GET /api/bookings/<id>.
+
+Compares Flask's jsonify encoding of get_trip_details() (the previous
+code path), the serialization module's encoder with the json module
+and with orjson, and a ResponseCache hit for a booking that has not
+changed since it was last encoded, and the 304 check for a poll whose
+If-None-Match names the current ETag. Bookings are completed trips with
+a passenger, driver, car and fare, so every field is populated.
+"""
+
+import argparse
+import json
+
+from _common import measure, print_table, summarize
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from cab_booking.app import serialization
+from cab_booking.app.serialization import ResponseCache, booking_payload
+from cab_booking.services import create_services
+
+
+def completed_bookings(count):
+    services = create_services()
+    passenger = services.passenger_service.create_passenger({'name': 'Rider'})
+    bookings = []
+    for i in range(count):
+        car = services.car_service.create_car({
+            'make': 'Maruti', 'model': 'Dzire', 'year': 2022,
+            'license_plate': f'KA-01-{i:06d}', 'car_type': 'economy',
+        })
+        driver = services.driver_service.create_driver({'name': f'Driver {i}', 'license_number': f'DL-{i}'})
+        services.driver_service.assign_car(driver.driver_id, car)
+        booking = services.booking_service.create_booking({
+            'passenger_id': passenger.passenger_id,
+            'from_location': {'latitude': 12.97, 'longitude': 77.59},
+            'to_location': {'latitude': 12.93, 'longitude': 77.62},
+        })
+        booking_id = booking.booking_id
+        services.booking_service.assign_driver(booking_id, driver.driver_id)
+        services.booking_service.start_trip(booking_id)
+        services.booking_service.complete_trip(booking_id, {'actual_distance_km': 7.5})
+        bookings.append(services.booking_service.get_booking(booking_id))
+    return bookings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=1000)
+    parser.add_argument('--reads', type=int, default=50)
+    args = parser.parse_args()
+    
+    bookings = completed_bookings(args.bookings)
+    provider = DefaultJSONProvider(Flask('bench'))
+    stdlib = json.JSONEncoder(default=serialization._default, separators=(',', ':'))
+    cache = ResponseCache()
+    
+    variants = [
+        ('jsonify (before)', lambda b: provider.dumps(b.get_trip_details()).encode('utf-8')),
+        ('encode, json module', lambda b: stdlib.encode(booking_payload(b)).encode('utf-8')),
+    ]
+    if serialization.orjson is not None:
+        variants.append(('encode, orjson', lambda b: serialization.encode(booking_payload(b))))
+    variants.append(('ResponseCache hit', lambda b: cache.respond('booking', b)[1]))
+    etags = {b.booking_id: cache.respond('booking', b)[0] for b in bookings}
+    variants.append(('If-None-Match match (304)',
+                     lambda b: cache.respond('booking', b, etags[b.booking_id])))
+    
+    reads = args.bookings * args.reads
+    rows = []
+    baseline = None
+    for name, fn in variants:
+        def run():
+            for _ in range(args.reads):
+                for booking in bookings:
+                    fn(booking)
+        run()  # warm up, and fill the cache
+        best = summarize(measure(run, repeat=3))['best_s']
+        baseline = baseline or best
+        rows.append((name, f'{best / reads * 1e6:.2f}', f'{reads / best:,.0f}', f'{baseline / best:.1f}x'))
+    
+    print(f'{args.bookings:,} completed bookings x {args.reads} reads')
+    print_table(('encoding', 'us/read', 'reads/s', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
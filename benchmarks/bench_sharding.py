@@ -0,0 +1,161 @@
+"""
+Sharded deployment: throughput across processes and border dispatch.
+
+Throughput: W client processes each run booking lifecycles (move car,
+create, assign, start, complete) for their own passenger, driver and
+car, either all inside one process on local services (W threads) or
+against a cluster of S shard processes through connect_shards. Useful
+numbers need as many cores as shards plus clients.
+
+Border dispatch: bookings and drivers scattered over a city cut into
+small regions, matched by a single-process dispatch_batch, by each
+shard on its own, and by the sharded dispatch_batch with its
+cross-border pass.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from _common import CAR_TYPES, print_table, random_location
+
+from cab_booking.services import create_services
+from cab_booking.sharding import connect_shards, start_shards, stop_shards
+
+
+def lifecycles(services, seed, duration):
+    rng = random.Random(seed)
+    passenger = services.passenger_service.create_passenger({'name': f'Passenger {seed}'})
+    car = services.car_service.create_car({
+        'car_type': CAR_TYPES[seed % len(CAR_TYPES)],
+        'current_location': random_location(rng),
+    })
+    driver = services.driver_service.create_driver({'name': f'Driver {seed}', 'car_id': car.car_id})
+    if driver.assigned_car is None:  # local services ignore car_id
+        services.driver_service.assign_car(driver.driver_id, car)
+    
+    trips = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        location = random_location(rng)
+        services.car_service.update_location(car.car_id, location)
+        booking = services.booking_service.create_booking({
+            'passenger_id': passenger.passenger_id,
+            'from_location': location,
+            'to_location': random_location(rng),
+        })
+        services.booking_service.assign_driver(booking.booking_id, driver.driver_id)
+        services.booking_service.start_trip(booking.booking_id)
+        services.booking_service.complete_trip(booking.booking_id, {'actual_distance_km': 5})
+        trips += 1
+    return trips
+
+
+def _client_process(directory, seed, duration, results):
+    results.put(lifecycles(connect_shards(directory), seed, duration))
+
+
+def local_throughput(workers, duration):
+    services = create_services()
+    counts = []
+    threads = [threading.Thread(target=lambda seed=seed: counts.append(lifecycles(services, seed, duration)))
+               for seed in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration
+
+
+def sharded_throughput(shards, workers, duration):
+    with tempfile.TemporaryDirectory() as directory:
+        processes = start_shards(directory, shards)
+        try:
+            results = multiprocessing.Queue()
+            clients = [multiprocessing.Process(target=_client_process, args=(directory, seed, duration, results))
+                       for seed in range(workers)]
+            for client in clients:
+                client.start()
+            trips = sum(results.get() for _ in clients)
+            for client in clients:
+                client.join()
+        finally:
+            stop_shards(processes)
+    return trips / duration
+
+
+def border_dispatch(shards, count, region_size_deg, radius_km):
+    rng = random.Random(7)
+    drivers = [random_location(rng, spread_deg=0.1) for _ in range(count)]
+    pickups = [random_location(rng, spread_deg=0.1) for _ in range(count)]
+    
+    def populate(services):
+        passenger = services.passenger_service.create_passenger({'name': 'Rider'})
+        for location in drivers:
+            car = services.car_service.create_car({'car_type': 'economy', 'current_location': location})
+            driver = services.driver_service.create_driver({'name': 'Driver', 'car_id': car.car_id})
+            if driver.assigned_car is None:
+                services.car_service.update_location(car.car_id, location)
+                services.driver_service.assign_car(driver.driver_id, car)
+        for location in pickups:
+            services.booking_service.create_booking({
+                'passenger_id': passenger.passenger_id, 'from_location': location,
+            })
+    
+    rows = []
+    services = create_services()
+    populate(services)
+    start = time.perf_counter()
+    assigned = services.booking_service.dispatch_batch(radius_km=radius_km)
+    rows.append(('single process', len(assigned), f'{time.perf_counter() - start:.3f}'))
+    
+    with tempfile.TemporaryDirectory() as directory:
+        processes = start_shards(directory, shards, region_size_deg=region_size_deg)
+        try:
+            services = connect_shards(directory)
+            populate(services)
+            cluster = services.booking_service.cluster
+            start = time.perf_counter()
+            local = sum(len(result) for result in
+                        cluster.broadcast('booking_service', 'dispatch_batch', radius_km, 8))
+            rows.append((f'{shards} shards, local only', local, f'{time.perf_counter() - start:.3f}'))
+            start = time.perf_counter()
+            border = services.booking_service.dispatch_batch(radius_km=radius_km)
+            rows.append((f'{shards} shards, + border pass', local + len(border),
+                         f'{time.perf_counter() - start:.3f}'))
+        finally:
+            stop_shards(processes)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--dispatch-count', type=int, default=2000)
+    parser.add_argument('--region-size-deg', type=float, default=0.05)
+    parser.add_argument('--radius-km', type=float, default=2.0)
+    args = parser.parse_args()
+    
+    print(f'{os.cpu_count()} CPUs, {args.workers} clients')
+    rows = [('local, threads', '-', f'{local_throughput(args.workers, args.duration):,.0f}')]
+    for shards in args.shards:
+        rows.append(('sharded, processes', shards,
+                     f'{sharded_throughput(shards, args.workers, args.duration):,.0f}'))
+    print_table(('mode', 'shards', 'trips/s'), rows)
+    print()
+    
+    shards = max(args.shards)
+    print(f'{args.dispatch_count:,} bookings x {args.dispatch_count:,} drivers, '
+          f'{args.region_size_deg} deg regions, {args.radius_km} km radius')
+    print_table(('dispatch', 'assigned', 'seconds'),
+                border_dispatch(shards, args.dispatch_count, args.region_size_deg, args.radius_km))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Microbenchmark suite for the service and model hot paths.
+
+Builds a synthetic fleet (see _fleet.py) at each scale, counted in
+bookings, and times these operations on it:
+
+    BookingService.create_booking, assign_driver, complete_trip,
+    get_passenger_bookings; CarService.get_available_cars;
+    Fare.calculate_fare; Booking.get_trip_details
+
+Each operation runs --ops times per round (get_available_cars, which
+walks every car, runs --ops // 100 times) with inputs prepared outside
+the timed part, for --repeat rounds. The median and best time per
+operation are printed and, with --output, saved as JSON along with the
+commit and environment. Pass an earlier file as --compare to see the
+change per operation; the script exits with status 1 if any best time
+(the least noisy figure on a busy machine) got slower by more than
+--tolerance, so it can gate a commit:
+
+    python benchmarks/bench_suite.py --scales 1000,100000 --output before.json
+    (change something)
+    python benchmarks/bench_suite.py --scales 1000,100000 --compare before.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from _common import print_table, random_location
+from _fleet import build_fleet
+
+from cab_booking.models import Fare
+
+DEFAULT_SCALES = (1000, 100000, 1000000)
+
+
+def free_drivers(fleet, count):
+    driver_service = fleet.services.driver_service
+    drivers = [driver_id for driver_id in fleet.driver_ids if driver_service.get_driver(driver_id).is_available]
+    return drivers[:count]
+
+
+def new_bookings(fleet, rng, count):
+    return [fleet.services.booking_service.create_booking({
+        'passenger_id': rng.choice(fleet.passenger_ids),
+        'from_location': random_location(rng),
+        'to_location': random_location(rng),
+    }) for _ in range(count)]
+
+
+def finish(fleet, booking_ids):
+    """Complete trips left open by a round, freeing their drivers"""
+    booking_service = fleet.services.booking_service
+    for booking_id in booking_ids:
+        if booking_service.get_booking(booking_id).status == 'ACCEPTED':
+            booking_service.start_trip(booking_id)
+        booking_service.complete_trip(booking_id, {'actual_distance_km': 5, 'actual_duration_minutes': 12})
+
+
+# Each case prepares one round: it returns (operations, run, cleanup),
+# where only run() is timed and cleanup() (or None) undoes its effects
+
+def case_create_booking(fleet, rng, ops):
+    booking_service = fleet.services.booking_service
+    requests = [{
+        'passenger_id': rng.choice(fleet.passenger_ids),
+        'from_location': random_location(rng),
+        'to_location': random_location(rng),
+    } for _ in range(ops)]
+    created = []
+    
+    def run():
+        for request in requests:
+            created.append(booking_service.create_booking(request).booking_id)
+    
+    def cleanup():
+        for booking_id in created:
+            booking_service.cancel_trip(booking_id)
+    return len(requests), run, cleanup
+
+
+def case_assign_driver(fleet, rng, ops):
+    booking_service = fleet.services.booking_service
+    drivers = free_drivers(fleet, ops)
+    pairs = list(zip((booking.booking_id for booking in new_bookings(fleet, rng, len(drivers))), drivers))
+    
+    def run():
+        for booking_id, driver_id in pairs:
+            booking_service.assign_driver(booking_id, driver_id)
+    return len(pairs), run, lambda: finish(fleet, [booking_id for booking_id, _ in pairs])
+
+
+def case_complete_trip(fleet, rng, ops):
+    booking_service = fleet.services.booking_service
+    booking_ids = []
+    for booking, driver_id in zip(new_bookings(fleet, rng, ops), free_drivers(fleet, ops)):
+        booking_service.assign_driver(booking.booking_id, driver_id)
+        booking_service.start_trip(booking.booking_id)
+        booking_ids.append(booking.booking_id)
+    trip_data = {'actual_distance_km': 8.5, 'actual_duration_minutes': 21}
+    
+    def run():
+        for booking_id in booking_ids:
+            booking_service.complete_trip(booking_id, trip_data)
+    return len(booking_ids), run, None
+
+
+def case_get_passenger_bookings(fleet, rng, ops):
+    booking_service = fleet.services.booking_service
+    passenger_ids = [rng.choice(fleet.passenger_ids) for _ in range(ops)]
+    
+    def run():
+        for passenger_id in passenger_ids:
+            booking_service.get_passenger_bookings(passenger_id)
+    return len(passenger_ids), run, None
+
+
+def case_get_available_cars(fleet, rng, ops):
+    car_service = fleet.services.car_service
+    car_types = [rng.choice((None, 'economy', 'premium', 'suv')) for _ in range(max(1, ops // 100))]
+    
+    def run():
+        for car_type in car_types:
+            car_service.get_available_cars(car_type)
+    return len(car_types), run, None
+
+
+def case_calculate_fare(fleet, rng, ops):
+    fares = [Fare(f'BOOK-{i:08d}', 50, rng.uniform(1, 25), rng.uniform(5, 60)) for i in range(ops)]
+    
+    def run():
+        for fare in fares:
+            fare.calculate_fare()
+    return len(fares), run, None
+
+
+def case_get_trip_details(fleet, rng, ops):
+    booking_service = fleet.services.booking_service
+    bookings = [booking_service.get_booking(rng.choice(fleet.booking_ids)) for _ in range(ops)]
+    
+    def run():
+        for booking in bookings:
+            booking.get_trip_details()
+    return len(bookings), run, None
+
+
+CASES = {
+    'create_booking': case_create_booking,
+    'assign_driver': case_assign_driver,
+    'complete_trip': case_complete_trip,
+    'get_passenger_bookings': case_get_passenger_bookings,
+    'get_available_cars': case_get_available_cars,
+    'calculate_fare': case_calculate_fare,
+    'get_trip_details': case_get_trip_details,
+}
+
+
+def run_case(case, fleet, rng, ops, repeat):
+    """Per-operation seconds of each round"""
+    timings = []
+    for _ in range(repeat):
+        count, run, cleanup = case(fleet, rng, ops)
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        if cleanup is not None:
+            cleanup()
+        timings.append(elapsed / max(count, 1))
+    return timings
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    optional = {}
+    for module in ('numpy', 'orjson'):
+        try:
+            optional[module] = __import__(module).__version__
+        except ImportError:
+            optional[module] = None
+    return {
+        'commit': commit,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'optional': optional,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every result also in baseline; returns the names of regressions"""
+    rows, regressions = [], []
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratio = result['best_us'] / before['best_us']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = 'SLOWER'
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            flag = 'faster'
+        rows.append((name, f"{before['best_us']:,.2f}", f"{result['best_us']:,.2f}", f'{ratio - 1:+.1%}', flag))
+    print()
+    print(f"vs. {baseline['environment'].get('commit') or 'baseline'} ({baseline['environment'].get('date')})")
+    print_table(('benchmark', 'best us before', 'best us now', 'change', ''), rows)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help='comma-separated fleet sizes, in bookings')
+    parser.add_argument('--cases', default=','.join(CASES), help='comma-separated subset of the cases')
+    parser.add_argument('--ops', type=int, default=2000, help='operations per round')
+    parser.add_argument('--repeat', type=int, default=5, help='rounds per case')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='slowdown of a best time beyond which --compare fails (default 0.15)')
+    args = parser.parse_args()
+    
+    cases = args.cases.split(',')
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+    
+    results = {}
+    rows = []
+    for scale in (int(scale) for scale in args.scales.split(',')):
+        start = time.perf_counter()
+        fleet = build_fleet(scale, args.seed)
+        print(f'scale {scale:,}: fleet built in {time.perf_counter() - start:,.1f} s', file=sys.stderr)
+        rng = random.Random(args.seed)
+        for name in cases:
+            timings = run_case(CASES[name], fleet, rng, args.ops, args.repeat)
+            median = statistics.median(timings)
+            results[f'{name}@{scale}'] = {
+                'case': name,
+                'scale': scale,
+                'median_us': median * 1e6,
+                'best_us': min(timings) * 1e6,
+                'ops_per_s': 1 / median if median else None,
+                'rounds_us': [t * 1e6 for t in timings],
+            }
+            rows.append((name, f'{scale:,}', f'{median * 1e6:,.2f}', f'{min(timings) * 1e6:,.2f}',
+                         f'{1 / median:,.0f}' if median else '-'))
+        del fleet
+    
+    print_table(('benchmark', 'scale', 'median us', 'best us', 'ops/s'), rows)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'ops': args.ops, 'repeat': args.repeat,
+                       'results': results}, f, indent=2)
+        print(f'\nresults written to {args.output}')
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
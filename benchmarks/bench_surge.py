@@ -0,0 +1,105 @@
+"""
+Surge pricing: create_booking cost with zone counters and a cached table.
+
+N available cars and B bookings are spread over a city. Bookings are
+created three ways: without surge pricing (surge=None); with the
+SurgePricing engine, which counts demand and supply as they change and
+recomputes multipliers at most every refresh_seconds; and by working
+out the pickup zone's demand and supply on every request, scanning the
+cars and the bookings of the last window as would be needed without
+the counters. The second table times SurgePricing.refresh(), the work
+done once per refresh_seconds, for an increasing number of zones with
+demand.
+"""
+
+import argparse
+import datetime
+import random
+import time
+
+from _common import print_table, random_location
+
+from cab_booking.services import SurgePricing, create_services
+
+
+def build(cars, seed, surge):
+    rng = random.Random(seed)
+    services = create_services(surge=surge)
+    for i in range(cars):
+        car = services.car_service.create_car({'license_plate': f'KA-{i:06d}', 'car_type': 'economy'})
+        services.car_service.update_location(car.car_id, random_location(rng))
+    passenger = services.passenger_service.create_passenger({'name': 'Rider'})
+    return services, passenger.passenger_id
+
+
+def scan_multiplier(services, pricing, location):
+    """The zone's multiplier from a scan of every car and recent booking"""
+    zone = pricing.zone(location)
+    since = datetime.datetime.now() - datetime.timedelta(seconds=pricing.window_seconds)
+    supply = sum(1 for car in services.car_service.cars.values()
+                 if car.is_available and pricing.zone(car.current_location) == zone)
+    demand = sum(1 for booking in services.booking_service.bookings.values()
+                 if booking.request_time >= since and pricing.zone(booking.from_location) == zone)
+    return pricing.price(demand, supply)
+
+
+def create_bookings(services, passenger_id, locations, quote=None):
+    start = time.perf_counter()
+    for location in locations:
+        booking = services.booking_service.create_booking({
+            'passenger_id': passenger_id, 'from_location': location, 'to_location': 'B',
+        })
+        if quote is not None:
+            booking.surge_multiplier = quote(location)
+    return (time.perf_counter() - start) / len(locations) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cars', type=int, default=20000)
+    parser.add_argument('--bookings', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=9)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    locations = [random_location(rng) for _ in range(args.bookings)]
+    rows = []
+    
+    services, passenger_id = build(args.cars, args.seed, None)
+    rows.append(('no surge pricing', f'{create_bookings(services, passenger_id, locations):,.1f}', '-'))
+    
+    pricing = SurgePricing()
+    services, passenger_id = build(args.cars, args.seed, pricing)
+    us = create_bookings(services, passenger_id, locations)
+    rows.append(('SurgePricing (counters, cached table)', f'{us:,.1f}', pricing.refreshes))
+    
+    scan_pricing = SurgePricing()
+    services, passenger_id = build(args.cars, args.seed, None)
+    sample = locations[:max(1, args.bookings // 20)]
+    us = create_bookings(services, passenger_id, sample,
+                         lambda location: scan_multiplier(services, scan_pricing, location))
+    rows.append((f'recomputed per request ({len(sample):,} bookings)', f'{us:,.1f}', len(sample)))
+    
+    print(f'{args.cars:,} available cars, {args.bookings:,} bookings')
+    print_table(('create_booking', 'us per booking', 'recomputations'), rows)
+    
+    rows = []
+    for zones in (100, 1000, 10000):
+        pricing = SurgePricing()
+        for i in range(zones):
+            location = {'latitude': (i // 100 + 0.5) * pricing.zone_size_deg,
+                        'longitude': (i % 100 + 0.5) * pricing.zone_size_deg}
+            for _ in range(3):
+                pricing.record_demand(location)
+        start = time.perf_counter()
+        pricing.refresh()
+        elapsed = time.perf_counter() - start
+        stats = pricing.stats()
+        rows.append((f"{stats['demand_zones']:,}", f'{elapsed * 1e3:,.2f}', f"{stats['surging_zones']:,}"))
+    
+    print()
+    print_table(('zones with demand', 'refresh ms', 'surging zones'), rows)
+
+
+if __name__ == '__main__':
+    main()
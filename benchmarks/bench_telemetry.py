@@ -0,0 +1,124 @@
+"""
+Telemetry ingest: pings/s absorbed, and nearest-car latency meanwhile.
+
+N cars each report P GPS pings, streamed as NDJSON in 64 KiB chunks.
+"direct" applies every ping with CarService.update_location as it is
+parsed; "coalesced" feeds the same body through the TelemetryStream
+used by POST /api/telemetry, whose TelemetryCoalescer moves each car at
+most once per tick. Timings include the final flush. A second thread
+issues find_nearest_available queries throughout, standing in for
+booking requests.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+
+from _common import CAR_TYPES, print_table, random_location
+
+from cab_booking.app.telemetry import TelemetryStream
+from cab_booking.services import CarService, TelemetryCoalescer
+
+CHUNK_SIZE = 64 * 1024
+
+
+def telemetry_body(car_ids, pings_per_car, rng):
+    lines = []
+    for tick in range(pings_per_car):
+        for car_id in car_ids:
+            location = random_location(rng)
+            lines.append(json.dumps({
+                'car_id': car_id,
+                'latitude': location['latitude'],
+                'longitude': location['longitude'],
+                'timestamp': tick,
+            }))
+    body = '\n'.join(lines).encode('utf-8')
+    return [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+
+
+class DirectSink:
+    """TelemetryCoalescer stand-in applying every ping immediately"""
+    
+    def __init__(self, car_service):
+        self.car_service = car_service
+    
+    def submit_many(self, pings):
+        for car_id, location, _ in pings:
+            self.car_service.update_location(car_id, location)
+        return len(pings)
+
+
+def populate(cars, rng):
+    service = CarService()
+    car_ids = []
+    for i in range(cars):
+        car = service.create_car({'car_type': CAR_TYPES[i % len(CAR_TYPES)]})
+        service.update_location(car.car_id, random_location(rng))
+        car_ids.append(car.car_id)
+    return service, car_ids
+
+
+def query_latencies(service, stop, rng, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        service.find_nearest_available(random_location(rng), k=5, radius_km=3)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.001)
+
+
+def run(mode, cars, pings_per_car, tick_seconds):
+    rng = random.Random(11)
+    service, car_ids = populate(cars, rng)
+    chunks = telemetry_body(car_ids, pings_per_car, rng)
+    
+    coalescer = None
+    if mode == 'coalesced':
+        coalescer = TelemetryCoalescer(service, tick_seconds=tick_seconds)
+        coalescer.start()
+        stream = TelemetryStream(coalescer)
+    else:
+        stream = TelemetryStream(DirectSink(service))
+    
+    stop = threading.Event()
+    latencies = []
+    querier = threading.Thread(target=query_latencies, args=(service, stop, random.Random(3), latencies))
+    querier.start()
+    start = time.perf_counter()
+    for chunk in chunks:
+        stream.feed(chunk)
+    summary = stream.close()
+    if coalescer is not None:
+        coalescer.stop()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    querier.join()
+    
+    moves = coalescer.stats()['applied'] if coalescer is not None else summary['accepted']
+    latencies.sort()
+    return (
+        mode,
+        f"{summary['received'] / elapsed:,.0f}",
+        f'{moves:,}',
+        f'{statistics.median(latencies) * 1e3:.2f}',
+        f'{latencies[int(len(latencies) * 0.99)] * 1e3:.2f}',
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cars', type=int, default=20000)
+    parser.add_argument('--pings-per-car', type=int, default=20)
+    parser.add_argument('--tick-seconds', type=float, default=1.0)
+    args = parser.parse_args()
+    
+    print(f'{args.cars:,} cars x {args.pings_per_car} pings, {args.tick_seconds}s ticks')
+    rows = [run(mode, args.cars, args.pings_per_car, args.tick_seconds) for mode in ('direct', 'coalesced')]
+    print_table(('mode', 'pings/s', 'location updates', 'query p50 ms', 'query p99 ms'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Trip statistics: rollups kept by TripAnalytics vs. walking every booking.
+
+N trips in a few car types and zones complete over the past day. Each
+is fed to TripAnalytics as complete_trip does, which times the cost per
+trip. Then two questions are answered from the rollups and by walking
+the bookings, as was needed before: revenue per hour per car type over
+the last 24 hours, and the mean trip length since midnight.
+"""
+
+import argparse
+import collections
+import datetime
+import random
+import statistics
+import time
+
+from _common import CAR_TYPES, print_table, random_location
+
+from cab_booking.models import Booking, Car, Fare, Passenger
+from cab_booking.services import TripAnalytics
+
+
+def trips(count, seed):
+    rng = random.Random(seed)
+    passenger = Passenger('PASS-00000001', 'Rider', 'rider@example.com', '0000000000')
+    cars = [Car(f'CAR-{i:08d}', 'Model', 'Make', 2024, f'KA-{i:04d}', 4, car_type)
+            for i, car_type in enumerate(CAR_TYPES)]
+    now = datetime.datetime.now()
+    bookings = []
+    for i in range(count):
+        booking = Booking(f'BOOK-{i:08d}', passenger, random_location(rng), random_location(rng))
+        booking.car = rng.choice(cars)
+        booking.status = 'COMPLETED'
+        booking.completion_time = now - datetime.timedelta(seconds=rng.uniform(0, 86400))
+        booking.actual_distance_km = rng.lognormvariate(1.6, 0.6)
+        booking.actual_duration_minutes = booking.actual_distance_km * rng.uniform(2, 4)
+        booking.fare = Fare(booking.booking_id, 50, booking.actual_distance_km, booking.actual_duration_minutes)
+        booking.fare.calculate_fare()
+        bookings.append(booking)
+    bookings.sort(key=lambda booking: booking.completion_time)
+    return bookings
+
+
+def scan_revenue_per_hour(bookings, since):
+    revenue = collections.defaultdict(float)
+    for booking in bookings:
+        if booking.status == 'COMPLETED' and booking.completion_time >= since:
+            hour = booking.completion_time.replace(minute=0, second=0, microsecond=0)
+            revenue[(hour, booking.car.car_type)] += booking.fare.total_amount
+    return revenue
+
+
+def scan_mean_distance(bookings, since):
+    return statistics.mean(booking.actual_distance_km for booking in bookings
+                           if booking.status == 'COMPLETED' and booking.completion_time >= since)
+
+
+def per_call_ms(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trips', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=4)
+    args = parser.parse_args()
+    
+    bookings = trips(args.trips, args.seed)
+    analytics = TripAnalytics()
+    start = time.perf_counter()
+    for booking in bookings:
+        analytics.record_trip(booking)
+    record_us = (time.perf_counter() - start) / len(bookings) * 1e6
+    
+    now = datetime.datetime.now()
+    day_ago = (now - datetime.timedelta(hours=24)).replace(minute=0, second=0, microsecond=0)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    def rollup_revenue_per_hour():
+        return analytics.rollups('hour', since=day_ago, group_by=('time', 'car_type'))
+    
+    def rollup_mean_distance():
+        (rollup,) = analytics.rollups('hour', since=midnight, group_by=()).values()
+        return rollup.distance_km.total / rollup.distance_km.count
+    
+    rows = [
+        ('record_trip', f'{record_us:.1f} us', '-', '-'),
+        ('revenue per hour per car type, 24 h', f'{per_call_ms(rollup_revenue_per_hour):,.2f}',
+         f'{per_call_ms(lambda: scan_revenue_per_hour(bookings, day_ago)):,.2f}',
+         f'{len(rollup_revenue_per_hour())} rows'),
+        ('mean trip km since midnight', f'{per_call_ms(rollup_mean_distance):,.2f}',
+         f'{per_call_ms(lambda: scan_mean_distance(bookings, midnight)):,.2f}',
+         f'{rollup_mean_distance():.3f} vs. {scan_mean_distance(bookings, midnight):.3f}'),
+    ]
+    print(f'{args.trips:,} trips over 24 hours')
+    print_table(('query', 'rollups ms', 'walk bookings ms', 'result'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,56 @@
 from flask import Flask
+import atexit
+import os
 
-def create_app():
-    from .api import app
+def create_app(profile_directory=None, profile_sample_every=None, profile_mode='cprofile', profile_token=None,
+               profile_trusted_addresses=None):
+    """
+    The Flask app, optionally profiling requests on demand
+    
+    Args:
+        profile_directory (str, optional): Where to write request profiles
+                                           (see cab_booking.app.profiling);
+                                           defaults to $CAB_BOOKING_PROFILE_DIR,
+                                           and without one nothing is profiled
+        profile_sample_every (int, optional): Also profile one request in this
+                                              many; defaults to
+                                              $CAB_BOOKING_PROFILE_SAMPLE_EVERY
+                                              or 0, only requests sent with an
+                                              X-Profile header
+        profile_mode (str): 'cprofile' or 'sample'
+        profile_token (str, optional): Secret an X-Profile header must carry;
+                                       defaults to $CAB_BOOKING_PROFILE_TOKEN
+        profile_trusted_addresses (iterable, optional): Client addresses whose
+                                                        X-Profile header needs no
+                                                        token; defaults to the
+                                                        comma-separated
+                                                        $CAB_BOOKING_PROFILE_TRUSTED
+        
+    Returns:
+        Flask: The app
+    """
+    from .api import app, car_service, telemetry
+    
+    # Background jobs: telemetry ticks, and surge multipliers recomputed
+    # off the request path; both are stopped when the process exits
+    telemetry.start()
+    atexit.register(telemetry.stop)
+    surge = getattr(car_service, 'surge', None)
+    if surge is not None:
+        surge.start()
+        atexit.register(surge.stop)
+    
+    profile_directory = profile_directory or os.environ.get('CAB_BOOKING_PROFILE_DIR')
+    if profile_directory:
+        from .profiling import RequestProfiler
+        if profile_sample_every is None:
+            profile_sample_every = int(os.environ.get('CAB_BOOKING_PROFILE_SAMPLE_EVERY', 0))
+        profile_token = profile_token or os.environ.get('CAB_BOOKING_PROFILE_TOKEN') or None
+        if profile_trusted_addresses is None:
+            trusted = os.environ.get('CAB_BOOKING_PROFILE_TRUSTED', '')
+            profile_trusted_addresses = [address.strip() for address in trusted.split(',') if address.strip()]
+        RequestProfiler(profile_directory, profile_sample_every, profile_mode, token=profile_token,
+                        trusted_addresses=profile_trusted_addresses).install(app)
     return app
 
 if __name__ == "__main__":
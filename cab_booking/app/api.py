@@ -1,23 +1,82 @@
-from flask import Flask, request, jsonify
-import uuid
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+import functools
 import sys
 import os
 
 # Add parent directory to path to allow relative imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from cab_booking.models import Booking, Car, Driver, Passenger, Fare
+from cab_booking.services import passenger_service, driver_service, car_service, booking_service
+from cab_booking.services import TelemetryCoalescer
+from cab_booking.app.bulk import BulkIngest, is_ndjson
+from cab_booking.app.listing import parse_query, stream_bookings
+from cab_booking.app.metrics import UNMATCHED_ROUTE, HTTPMetrics, registry_of
+from cab_booking.app import stats
+from cab_booking.app.serialization import ResponseCache
+from cab_booking.app.telemetry import TelemetryStream
 
 app = Flask(__name__)
 
-# In-memory storage for demo purposes
-cars = {}
-drivers = {}
-passengers = {}
-bookings = {}
+# Service rule violations (e.g. a driver already taken) are client errors
+@app.errorhandler(ValueError)
+def handle_value_error(error):
+    return jsonify({'error': str(error)}), 400
 
-# Helper function to generate IDs
-def generate_id(prefix):
-    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+# Request counts and latencies, in the booking service's registry
+metrics = HTTPMetrics(registry_of(booking_service))
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = metrics.start()
+
+# Runs for every response, including error handler and 500 responses;
+# a streamed body is timed up to the start of the stream
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+        metrics.finish(start, request.method, route, response.status_code)
+    return response
+
+# Read size for streamed bulk request bodies
+BULK_CHUNK_SIZE = 64 * 1024
+
+# Helper function to stream a bulk request through a service
+def bulk_create(service, kind):
+    ingest = BulkIngest(service, kind, is_ndjson(request.mimetype))
+    
+    def generate():
+        yield ingest.start()
+        while True:
+            chunk = request.stream.read(BULK_CHUNK_SIZE)
+            if not chunk:
+                break
+            out = ingest.feed(chunk)
+            if out:
+                yield out
+        yield ingest.close()
+    
+    mimetype = request.mimetype if ingest.ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+# Car location pings are coalesced per car and applied once per tick
+telemetry = TelemetryCoalescer(car_service)
+
+# Encoded GET responses, reused until the entity changes
+responses = ResponseCache()
+
+# Helper function to send an entity's cached GET response, or a 304
+# when the client's If-None-Match shows it already has that version
+def entity_response(kind, entity):
+    etag, content = responses.respond(kind, entity, request.headers.get('If-None-Match'))
+    if content is None:
+        return Response(status=304, headers={'ETag': etag})
+    return Response(content, mimetype='application/json', headers={'ETag': etag})
+
+# Helper function to stream one page of an owner's bookings
+def list_bookings(fetch_page):
+    query = parse_query(request.args)
+    return Response(stream_bookings(fetch_page, **query), mimetype='application/json')
 
 # Route to get API status
 @app.route('/api/status', methods=['GET'])
@@ -30,169 +89,152 @@ def get_status():
 # PASSENGER ENDPOINTS
 @app.route('/api/passengers', methods=['POST'])
 def create_passenger():
-    data = request.json
-    passenger_id = generate_id('PASS')
-    
-    passenger = Passenger(
-        passenger_id=passenger_id,
-        name=data.get('name'),
-        phone=data.get('phone'),
-        email=data.get('email')
-    )
-    
-    passengers[passenger_id] = passenger
+    passenger = passenger_service.create_passenger(request.json)
     
     return jsonify({
         'message': 'Passenger created successfully',
-        'passenger_id': passenger_id
+        'passenger_id': passenger.passenger_id
     }), 201
 
+@app.route('/api/passengers/bulk', methods=['POST'])
+def bulk_create_passengers():
+    return bulk_create(passenger_service, 'passengers')
+
 @app.route('/api/passengers/<passenger_id>', methods=['GET'])
 def get_passenger(passenger_id):
-    passenger = passengers.get(passenger_id)
+    passenger = passenger_service.get_passenger(passenger_id)
     if not passenger:
         return jsonify({'error': 'Passenger not found'}), 404
     
-    return jsonify({
-        'passenger_id': passenger.passenger_id,
-        'name': passenger.name,
-        'phone': passenger.phone,
-        'email': passenger.email
-    })
+    return entity_response('passenger', passenger)
+
+@app.route('/api/passengers/<passenger_id>/bookings', methods=['GET'])
+def get_passenger_bookings(passenger_id):
+    if not passenger_service.get_passenger(passenger_id):
+        return jsonify({'error': 'Passenger not found'}), 404
+    
+    return list_bookings(functools.partial(booking_service.page_passenger_bookings, passenger_id))
 
 # DRIVER ENDPOINTS
 @app.route('/api/drivers', methods=['POST'])
 def create_driver():
-    data = request.json
-    driver_id = generate_id('DRIV')
-    
-    driver = Driver(
-        driver_id=driver_id,
-        name=data.get('name'),
-        phone=data.get('phone'),
-        email=data.get('email'),
-        license_number=data.get('license_number')
-    )
-    
-    drivers[driver_id] = driver
+    driver = driver_service.create_driver(request.json)
     
     return jsonify({
         'message': 'Driver created successfully',
-        'driver_id': driver_id
+        'driver_id': driver.driver_id
     }), 201
 
+@app.route('/api/drivers/bulk', methods=['POST'])
+def bulk_create_drivers():
+    return bulk_create(driver_service, 'drivers')
+
 @app.route('/api/drivers/<driver_id>', methods=['GET'])
 def get_driver(driver_id):
-    driver = drivers.get(driver_id)
+    driver = driver_service.get_driver(driver_id)
     if not driver:
         return jsonify({'error': 'Driver not found'}), 404
     
-    return jsonify({
-        'driver_id': driver.driver_id,
-        'name': driver.name,
-        'phone': driver.phone,
-        'email': driver.email,
-        'license_number': driver.license_number,
-        'is_available': driver.is_available,
-        'rating': driver.rating,
-        'assigned_car': str(driver.assigned_car) if driver.assigned_car else None
-    })
+    return entity_response('driver', driver)
+
+@app.route('/api/drivers/<driver_id>/bookings', methods=['GET'])
+def get_driver_bookings(driver_id):
+    if not driver_service.get_driver(driver_id):
+        return jsonify({'error': 'Driver not found'}), 404
+    
+    return list_bookings(functools.partial(booking_service.page_driver_bookings, driver_id))
 
 # CAR ENDPOINTS
 @app.route('/api/cars', methods=['POST'])
 def create_car():
-    data = request.json
-    car_id = generate_id('CAR')
-    
-    car = Car(
-        car_id=car_id,
-        model=data.get('model'),
-        make=data.get('make'),
-        year=data.get('year'),
-        license_plate=data.get('license_plate'),
-        capacity=data.get('capacity'),
-        car_type=data.get('car_type')
-    )
-    
-    cars[car_id] = car
+    car = car_service.create_car(request.json)
     
     return jsonify({
         'message': 'Car created successfully',
-        'car_id': car_id
+        'car_id': car.car_id
     }), 201
 
+@app.route('/api/cars/bulk', methods=['POST'])
+def bulk_create_cars():
+    return bulk_create(car_service, 'cars')
+
 @app.route('/api/cars/<car_id>', methods=['GET'])
 def get_car(car_id):
-    car = cars.get(car_id)
+    car = car_service.get_car(car_id)
     if not car:
         return jsonify({'error': 'Car not found'}), 404
     
-    return jsonify({
-        'car_id': car.car_id,
-        'model': car.model,
-        'make': car.make,
-        'year': car.year,
-        'license_plate': car.license_plate,
-        'capacity': car.capacity,
-        'car_type': car.car_type,
-        'is_available': car.is_available,
-        'features': car.features
-    })
+    return entity_response('car', car)
+
+# TELEMETRY ENDPOINTS
+@app.route('/api/telemetry', methods=['POST'])
+def ingest_telemetry():
+    telemetry.start()
+    stream = TelemetryStream(telemetry)
+    while True:
+        chunk = request.stream.read(BULK_CHUNK_SIZE)
+        if not chunk:
+            break
+        stream.feed(chunk)
+    
+    return jsonify(stream.close()), 202
+
+@app.route('/api/telemetry/stats', methods=['GET'])
+def get_telemetry_stats():
+    return jsonify(telemetry.stats())
+
+@app.route('/api/stats', methods=['GET'])
+def get_trip_stats():
+    query = stats.parse_query(request.args)
+    return jsonify({'resolution': query['resolution'], 'rows': booking_service.get_trip_stats(**query)})
+
+@app.route('/api/routes/stats', methods=['GET'])
+def get_route_stats():
+    return jsonify(booking_service.get_route_stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.registry.CONTENT_TYPE)
 
 # BOOKING ENDPOINTS
 @app.route('/api/bookings', methods=['POST'])
 def create_booking():
     data = request.json
-    booking_id = generate_id('BOOK')
     
-    passenger_id = data.get('passenger_id')
-    passenger = passengers.get(passenger_id)
-    if not passenger:
+    if not passenger_service.get_passenger(data.get('passenger_id')):
         return jsonify({'error': 'Passenger not found'}), 404
     
-    booking = Booking(
-        booking_id=booking_id,
-        passenger=passenger,
-        from_location=data.get('from_location'),
-        to_location=data.get('to_location')
-    )
-    
-    # Set estimated trip details
-    booking.set_estimated_trip_details(
-        data.get('estimated_distance_km', 0),
-        data.get('estimated_duration_minutes', 0)
-    )
-    
-    bookings[booking_id] = booking
-    passenger.add_to_booking_history(booking)
+    booking = booking_service.create_booking(data)
     
     return jsonify({
         'message': 'Booking created successfully',
-        'booking_id': booking_id
+        'booking_id': booking.booking_id
     }), 201
 
+@app.route('/api/bookings/bulk', methods=['POST'])
+def bulk_create_bookings():
+    return bulk_create(booking_service, 'bookings')
+
 @app.route('/api/bookings/<booking_id>', methods=['GET'])
 def get_booking(booking_id):
-    booking = bookings.get(booking_id)
+    booking = booking_service.get_booking(booking_id)
     if not booking:
         return jsonify({'error': 'Booking not found'}), 404
     
-    return jsonify(booking.get_trip_details())
+    return entity_response('booking', booking)
 
 @app.route('/api/bookings/<booking_id>/assign-driver', methods=['POST'])
 def assign_driver_to_booking(booking_id):
     data = request.json
     driver_id = data.get('driver_id')
     
-    booking = bookings.get(booking_id)
-    if not booking:
+    if not booking_service.get_booking(booking_id):
         return jsonify({'error': 'Booking not found'}), 404
     
-    driver = drivers.get(driver_id)
-    if not driver:
+    if not driver_service.get_driver(driver_id):
         return jsonify({'error': 'Driver not found'}), 404
     
-    booking.assign_driver(driver)
+    booking_service.assign_driver(booking_id, driver_id)
     
     return jsonify({
         'message': 'Driver assigned to booking successfully',
@@ -202,14 +244,14 @@ def assign_driver_to_booking(booking_id):
 
 @app.route('/api/bookings/<booking_id>/start', methods=['PUT'])
 def start_trip(booking_id):
-    booking = bookings.get(booking_id)
+    booking = booking_service.get_booking(booking_id)
     if not booking:
         return jsonify({'error': 'Booking not found'}), 404
     
     if not booking.driver:
         return jsonify({'error': 'Cannot start trip without assigned driver'}), 400
     
-    booking.start_trip()
+    booking = booking_service.start_trip(booking_id)
     
     return jsonify({
         'message': 'Trip started successfully',
@@ -220,20 +262,16 @@ def start_trip(booking_id):
 @app.route('/api/bookings/<booking_id>/complete', methods=['PUT'])
 def complete_trip(booking_id):
     data = request.json
-    booking = bookings.get(booking_id)
+    booking = booking_service.get_booking(booking_id)
     if not booking:
         return jsonify({'error': 'Booking not found'}), 404
     
     if booking.status != 'IN_PROGRESS':
         return jsonify({'error': 'Only in-progress trips can be completed'}), 400
     
-    booking.complete_trip(
-        data.get('actual_distance_km', booking.estimated_distance_km),
-        data.get('actual_duration_minutes', booking.estimated_duration_minutes)
-    )
-    
-    # Calculate fare after trip completion
-    fare = booking.calculate_fare()
+    # The service calculates the fare and frees the driver and car
+    booking = booking_service.complete_trip(booking_id, data)
+    fare = booking.fare
     
     return jsonify({
         'message': 'Trip completed successfully',
@@ -245,14 +283,14 @@ def complete_trip(booking_id):
 @app.route('/api/bookings/<booking_id>/cancel', methods=['PUT'])
 def cancel_trip(booking_id):
     data = request.json
-    booking = bookings.get(booking_id)
+    booking = booking_service.get_booking(booking_id)
     if not booking:
         return jsonify({'error': 'Booking not found'}), 404
     
     if booking.status in ['COMPLETED', 'CANCELLED']:
         return jsonify({'error': 'Cannot cancel a completed or already cancelled trip'}), 400
     
-    booking.cancel_trip(data.get('reason'))
+    booking = booking_service.cancel_trip(booking_id, data.get('reason'))
     
     return jsonify({
         'message': 'Trip cancelled successfully',
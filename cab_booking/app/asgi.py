@@ -0,0 +1,463 @@
+"""
+ASGI version of the Cab Booking API.
+
+Serves the same endpoints as api.py on top of the shared services,
+without any framework dependency. Run it with any ASGI server, e.g.::
+
+    uvicorn cab_booking.app.asgi:app
+"""
+
+import asyncio
+import functools
+import json
+import os
+import re
+import sys
+import urllib.parse
+
+# Add parent directory to path to allow relative imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from cab_booking import services as default_services
+from cab_booking.services import TelemetryCoalescer
+from cab_booking.app.bulk import KINDS as BULK_KINDS, BulkIngest, is_ndjson
+from cab_booking.app.listing import parse_query, stream_bookings
+from cab_booking.app.metrics import UNMATCHED_ROUTE, HTTPMetrics, registry_of
+from cab_booking.app import stats
+from cab_booking.app.serialization import ResponseCache, encode
+from cab_booking.app.telemetry import TelemetryStream
+
+
+class Request:
+    """The parts of an ASGI HTTP request the handlers need"""
+    
+    __slots__ = ('method', 'path', 'headers', 'body', 'args')
+    
+    def __init__(self, method, path, headers, body, args=None):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.args = args or {}
+    
+    @property
+    def json(self):
+        if not self.body:
+            return {}
+        return json.loads(self.body)
+
+
+def query_args(scope):
+    """A request's query parameters, name -> first value"""
+    query = urllib.parse.parse_qs(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True)
+    return {name: values[0] for name, values in query.items()}
+
+
+class CabBookingASGI:
+    """
+    ASGI application exposing the booking API
+    
+    Args:
+        services (Services, optional): The services to serve; defaults to
+                                       the shared cab_booking.services ones
+        offload (bool): Run service calls in the default thread pool, for
+                        services backed by blocking storage
+    """
+    
+    def __init__(self, services=None, offload=False):
+        if services is None:
+            services = default_services
+        self.passenger_service = services.passenger_service
+        self.driver_service = services.driver_service
+        self.car_service = services.car_service
+        self.booking_service = services.booking_service
+        self.offload = offload
+        self.telemetry = TelemetryCoalescer(self.car_service)
+        # The car service's SurgePricing, if any, recomputed in the background
+        self.surge = getattr(self.car_service, 'surge', None)
+        self.responses = ResponseCache()
+        self.metrics = HTTPMetrics(registry_of(self.booking_service))
+        
+        self.routes = []
+        self.route('GET', '/api/status', self.get_status)
+        self.route('POST', '/api/passengers', self.create_passenger)
+        self.route('POST', '/api/<kind>/bulk', self.bulk_create, streaming=True)
+        self.route('GET', '/api/passengers/<passenger_id>', self.get_passenger)
+        self.route('GET', '/api/passengers/<passenger_id>/bookings', self.get_passenger_bookings, streaming=True)
+        self.route('POST', '/api/drivers', self.create_driver)
+        self.route('GET', '/api/drivers/<driver_id>', self.get_driver)
+        self.route('GET', '/api/drivers/<driver_id>/bookings', self.get_driver_bookings, streaming=True)
+        self.route('POST', '/api/cars', self.create_car)
+        self.route('GET', '/api/cars/<car_id>', self.get_car)
+        self.route('POST', '/api/telemetry', self.ingest_telemetry, streaming=True)
+        self.route('GET', '/api/telemetry/stats', self.get_telemetry_stats)
+        self.route('GET', '/api/stats', self.get_trip_stats)
+        self.route('GET', '/api/routes/stats', self.get_route_stats)
+        self.route('GET', '/api/metrics', self.get_metrics, streaming=True)
+        self.route('POST', '/api/bookings', self.create_booking)
+        self.route('GET', '/api/bookings/<booking_id>', self.get_booking)
+        self.route('POST', '/api/bookings/<booking_id>/assign-driver', self.assign_driver_to_booking)
+        self.route('PUT', '/api/bookings/<booking_id>/start', self.start_trip)
+        self.route('PUT', '/api/bookings/<booking_id>/complete', self.complete_trip)
+        self.route('PUT', '/api/bookings/<booking_id>/cancel', self.cancel_trip)
+    
+    def route(self, method, rule, handler, streaming=False):
+        """
+        Register a handler for a Flask-style rule such as /api/cars/<car_id>
+        
+        Streaming handlers are called with (scope, receive, send) instead
+        of a Request and produce the whole response themselves. The rule
+        a request matches is noted in its scope as 'route'.
+        """
+        pattern = re.sub(r'<(\w+)>', r'(?P<\1>[^/]+)', rule)
+        self.routes.append((method, re.compile(f'^{pattern}$'), handler, streaming, rule))
+    
+    async def call(self, fn, *args):
+        """Run a service call, in the thread pool if offloading is enabled"""
+        if self.offload:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, functools.partial(fn, *args))
+        return fn(*args)
+    
+    # ASGI entry point
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    self.telemetry.start()
+                    if self.surge is not None:
+                        self.surge.start()
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, self.telemetry.stop)
+                    if self.surge is not None:
+                        await loop.run_in_executor(None, self.surge.stop)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+        
+        start = self.metrics.start()
+        status = 500  # if handling fails before responding
+        try:
+            status = await self.handle(scope, receive, send)
+        finally:
+            self.metrics.finish(start, scope['method'], scope.get('route', UNMATCHED_ROUTE), status)
+    
+    async def handle(self, scope, receive, send):
+        """Respond to an HTTP request; returns the response status"""
+        streaming = self.match_streaming(scope)
+        if streaming is not None:
+            handler, params = streaming
+            response = {'status': 500}
+            
+            # Streaming handlers send their own status, so note it on the way
+            async def send_and_note_status(message):
+                if message['type'] == 'http.response.start':
+                    response['status'] = message['status']
+                await send(message)
+            await handler(scope, receive, send_and_note_status, **params)
+            return response['status']
+        
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        
+        status, payload, headers = await self.dispatch(scope, body)
+        if status == 304:  # no body, so no content headers either
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return status
+        content = payload if isinstance(payload, bytes) else encode(payload)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(content)).encode('ascii')),
+                *headers,
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+        return status
+    
+    @staticmethod
+    async def send_json(send, status, payload):
+        """Send a whole JSON response from a streaming handler"""
+        content = encode(payload)
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(content)).encode('ascii')),
+        ]})
+        await send({'type': 'http.response.body', 'body': content})
+    
+    def match_streaming(self, scope):
+        """The streaming handler and its parameters for a request, if any"""
+        for route_method, pattern, handler, streaming, rule in self.routes:
+            if streaming and route_method == scope['method']:
+                match = pattern.match(scope['path'])
+                if match:
+                    scope['route'] = rule
+                    return handler, match.groupdict()
+        return None
+    
+    async def dispatch(self, scope, body):
+        """Route a request; returns (status, payload or encoded body, extra headers)"""
+        method = scope['method']
+        path = scope['path']
+        allowed = False
+        for route_method, pattern, handler, _, rule in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            scope['route'] = rule
+            headers = {key.decode('latin-1').lower(): value.decode('latin-1')
+                       for key, value in scope.get('headers', ())}
+            request = Request(method, path, headers, body, query_args(scope))
+            try:
+                result = await handler(request, **match.groupdict())
+            except ValueError as exc:  # service rule violations and malformed JSON
+                return 400, {'error': str(exc)}, []
+            if isinstance(result, tuple):
+                return result[1], result[0], list(result[2]) if len(result) > 2 else []
+            return 200, result, []
+        if allowed:
+            return 405, {'error': 'Method not allowed'}, []
+        return 404, {'error': 'Not found'}, []
+    
+    def entity_response(self, request, kind, entity):
+        """An entity's cached GET response, or a 304 if If-None-Match shows the client has it"""
+        etag, content = self.responses.respond(kind, entity, request.headers.get('if-none-match'))
+        headers = [(b'etag', etag.encode('ascii'))]
+        if content is None:
+            return b'', 304, headers
+        return content, 200, headers
+    
+    async def list_bookings(self, scope, send, fetch_page):
+        """Stream one page of an owner's bookings, fetching a batch per chunk"""
+        try:
+            query = parse_query(query_args(scope))
+        except ValueError as exc:
+            await self.send_json(send, 400, {'error': str(exc)})
+            return
+        chunks = stream_bookings(fetch_page, **query)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'application/json'),
+        ]})
+        while True:
+            chunk = await self.call(next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    
+    # Handlers, mirroring api.py
+    
+    async def get_status(self, request):
+        return {
+            'status': 'online',
+            'message': 'Cab Booking API is running'
+        }
+    
+    async def create_passenger(self, request):
+        passenger = await self.call(self.passenger_service.create_passenger, request.json)
+        return {
+            'message': 'Passenger created successfully',
+            'passenger_id': passenger.passenger_id
+        }, 201
+    
+    async def bulk_create(self, scope, receive, send, kind):
+        if kind not in BULK_KINDS:
+            await self.send_json(send, 404, {'error': 'Not found'})
+            return
+        
+        headers = dict(scope.get('headers', ()))
+        mimetype = headers.get(b'content-type', b'').decode('latin-1').split(';')[0].strip().lower()
+        service = getattr(self, BULK_KINDS[kind][0])
+        ingest = BulkIngest(service, kind, is_ndjson(mimetype))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', mimetype.encode('latin-1') if ingest.ndjson else b'application/json'),
+        ]})
+        await send({'type': 'http.response.body', 'body': ingest.start(), 'more_body': True})
+        while True:
+            message = await receive()
+            out = await self.call(ingest.feed, message.get('body', b''))
+            if out:
+                await send({'type': 'http.response.body', 'body': out, 'more_body': True})
+            if not message.get('more_body'):
+                break
+        await send({'type': 'http.response.body', 'body': await self.call(ingest.close)})
+    
+    async def get_passenger(self, request, passenger_id):
+        passenger = await self.call(self.passenger_service.get_passenger, passenger_id)
+        if not passenger:
+            return {'error': 'Passenger not found'}, 404
+        
+        return self.entity_response(request, 'passenger', passenger)
+    
+    async def get_passenger_bookings(self, scope, receive, send, passenger_id):
+        if not await self.call(self.passenger_service.get_passenger, passenger_id):
+            await self.send_json(send, 404, {'error': 'Passenger not found'})
+            return
+        await self.list_bookings(scope, send, functools.partial(
+            self.booking_service.page_passenger_bookings, passenger_id))
+    
+    async def create_driver(self, request):
+        driver = await self.call(self.driver_service.create_driver, request.json)
+        return {
+            'message': 'Driver created successfully',
+            'driver_id': driver.driver_id
+        }, 201
+    
+    async def get_driver(self, request, driver_id):
+        driver = await self.call(self.driver_service.get_driver, driver_id)
+        if not driver:
+            return {'error': 'Driver not found'}, 404
+        
+        return self.entity_response(request, 'driver', driver)
+    
+    async def get_driver_bookings(self, scope, receive, send, driver_id):
+        if not await self.call(self.driver_service.get_driver, driver_id):
+            await self.send_json(send, 404, {'error': 'Driver not found'})
+            return
+        await self.list_bookings(scope, send, functools.partial(
+            self.booking_service.page_driver_bookings, driver_id))
+    
+    async def create_car(self, request):
+        car = await self.call(self.car_service.create_car, request.json)
+        return {
+            'message': 'Car created successfully',
+            'car_id': car.car_id
+        }, 201
+    
+    async def get_car(self, request, car_id):
+        car = await self.call(self.car_service.get_car, car_id)
+        if not car:
+            return {'error': 'Car not found'}, 404
+        
+        return self.entity_response(request, 'car', car)
+    
+    async def ingest_telemetry(self, scope, receive, send):
+        # Parsing and submitting only touch the coalescer's buffer, so
+        # they run on the loop; the coalescer thread does the updates
+        self.telemetry.start()
+        stream = TelemetryStream(self.telemetry)
+        while True:
+            message = await receive()
+            stream.feed(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        await self.send_json(send, 202, stream.close())
+    
+    async def get_telemetry_stats(self, request):
+        return self.telemetry.stats()
+    
+    async def get_trip_stats(self, request):
+        query = stats.parse_query(request.args)
+        rows = await self.call(functools.partial(self.booking_service.get_trip_stats, **query))
+        return {'resolution': query['resolution'], 'rows': rows}
+    
+    async def get_route_stats(self, request):
+        return await self.call(self.booking_service.get_route_stats)
+    
+    async def get_metrics(self, scope, receive, send):
+        content = self.metrics.registry.render()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', self.metrics.registry.CONTENT_TYPE.encode('ascii')),
+            (b'content-length', str(len(content)).encode('ascii')),
+        ]})
+        await send({'type': 'http.response.body', 'body': content})
+    
+    async def create_booking(self, request):
+        data = request.json
+        if not await self.call(self.passenger_service.get_passenger, data.get('passenger_id')):
+            return {'error': 'Passenger not found'}, 404
+        
+        booking = await self.call(self.booking_service.create_booking, data)
+        return {
+            'message': 'Booking created successfully',
+            'booking_id': booking.booking_id
+        }, 201
+    
+    async def get_booking(self, request, booking_id):
+        booking = await self.call(self.booking_service.get_booking, booking_id)
+        if not booking:
+            return {'error': 'Booking not found'}, 404
+        
+        return self.entity_response(request, 'booking', booking)
+    
+    async def assign_driver_to_booking(self, request, booking_id):
+        driver_id = request.json.get('driver_id')
+        if not await self.call(self.booking_service.get_booking, booking_id):
+            return {'error': 'Booking not found'}, 404
+        if not await self.call(self.driver_service.get_driver, driver_id):
+            return {'error': 'Driver not found'}, 404
+        
+        await self.call(self.booking_service.assign_driver, booking_id, driver_id)
+        return {
+            'message': 'Driver assigned to booking successfully',
+            'booking_id': booking_id,
+            'driver_id': driver_id
+        }
+    
+    async def start_trip(self, request, booking_id):
+        booking = await self.call(self.booking_service.get_booking, booking_id)
+        if not booking:
+            return {'error': 'Booking not found'}, 404
+        
+        if not booking.driver:
+            return {'error': 'Cannot start trip without assigned driver'}, 400
+        
+        booking = await self.call(self.booking_service.start_trip, booking_id)
+        return {
+            'message': 'Trip started successfully',
+            'booking_id': booking_id,
+            'status': booking.status
+        }
+    
+    async def complete_trip(self, request, booking_id):
+        booking = await self.call(self.booking_service.get_booking, booking_id)
+        if not booking:
+            return {'error': 'Booking not found'}, 404
+        
+        if booking.status != 'IN_PROGRESS':
+            return {'error': 'Only in-progress trips can be completed'}, 400
+        
+        booking = await self.call(self.booking_service.complete_trip, booking_id, request.json)
+        return {
+            'message': 'Trip completed successfully',
+            'booking_id': booking_id,
+            'status': booking.status,
+            'fare': booking.fare.generate_receipt() if booking.fare else None
+        }
+    
+    async def cancel_trip(self, request, booking_id):
+        booking = await self.call(self.booking_service.get_booking, booking_id)
+        if not booking:
+            return {'error': 'Booking not found'}, 404
+        
+        if booking.status in ['COMPLETED', 'CANCELLED']:
+            return {'error': 'Cannot cancel a completed or already cancelled trip'}, 400
+        
+        booking = await self.call(self.booking_service.cancel_trip, booking_id, request.json.get('reason'))
+        return {
+            'message': 'Trip cancelled successfully',
+            'booking_id': booking_id,
+            'status': booking.status
+        }
+
+
+def create_asgi_app(services=None, offload=False):
+    return CabBookingASGI(services, offload=offload)
+
+
+# Shard calls block on IPC, so keep them off the event loop
+app = create_asgi_app(offload=bool(os.environ.get('CAB_BOOKING_SHARDS')))
@@ -0,0 +1,258 @@
+"""
+Bulk ingest shared by the Flask and ASGI apps.
+
+A bulk request body is either a JSON array of records or an NDJSON
+stream (one JSON object per line). BulkIngest consumes the body chunk
+by chunk as it arrives, validates and creates each record as soon as it
+is complete, and returns the encoded per-item results for that chunk,
+so neither the request nor the response is ever held in memory whole.
+Results come back in the same format as the request:
+{"index": 0, "car_id": "CAR-00000001"} or {"index": 1, "error": "..."}.
+"""
+
+import codecs
+import json
+import re
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# URL segment -> (service attribute, create method, ID attribute)
+KINDS = {
+    'passengers': ('passenger_service', 'create_passenger', 'passenger_id'),
+    'drivers': ('driver_service', 'create_driver', 'driver_id'),
+    'cars': ('car_service', 'create_car', 'car_id'),
+    'bookings': ('booking_service', 'create_booking', 'booking_id'),
+}
+
+# Fields every record of a kind must have, and the types of optional ones
+REQUIRED_FIELDS = {
+    'passengers': ('name',),
+    'drivers': ('name', 'license_number'),
+    'cars': ('license_plate', 'car_type'),
+    'bookings': ('passenger_id',),
+}
+_NUMBER = (int, float)
+FIELD_TYPES = {
+    'passengers': {'name': str, 'phone': str, 'email': str},
+    'drivers': {'name': str, 'phone': str, 'email': str, 'license_number': str},
+    'cars': {'model': str, 'make': str, 'year': int, 'license_plate': str, 'capacity': int,
+             'car_type': str, 'features': list},
+    'bookings': {'passenger_id': str, 'estimated_distance_km': _NUMBER,
+                 'estimated_duration_minutes': _NUMBER},
+}
+
+# Longest single record kept buffered while waiting for the rest of it
+MAX_RECORD_BYTES = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _Invalid:
+    """A record that could not be parsed"""
+    
+    __slots__ = ('message',)
+    
+    def __init__(self, message):
+        self.message = message
+
+
+def is_ndjson(mimetype):
+    return mimetype in NDJSON_MIMETYPES
+
+
+def validate(kind, record):
+    """
+    Check a record before it reaches the service
+    
+    Args:
+        kind (str): A key of KINDS
+        record: The decoded record
+    
+    Returns:
+        str: What is wrong with the record, or None if it is valid
+    """
+    if not isinstance(record, dict):
+        return "Record must be a JSON object"
+    for field in REQUIRED_FIELDS[kind]:
+        if record.get(field) in (None, ''):
+            return f"Missing required field '{field}'"
+    for field, expected in FIELD_TYPES[kind].items():
+        value = record.get(field)
+        if value is not None and (not isinstance(value, expected) or isinstance(value, bool)):
+            return f"Field '{field}' has the wrong type"
+    return None
+
+
+class _LineParser:
+    """Splits an NDJSON byte stream into decoded records"""
+    
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._partial = b''
+        # Set once an over-long line has been reported, until its newline
+        self._skipping = False
+    
+    def feed(self, chunk):
+        if self._skipping:
+            end = chunk.find(b'\n')
+            if end < 0:
+                return []
+            chunk = chunk[end + 1:]
+            self._skipping = False
+        lines = (self._partial + chunk).split(b'\n')
+        self._partial = lines.pop()
+        records = [self._decode(line) for line in lines if line.strip()]
+        if len(self._partial) > MAX_RECORD_BYTES:
+            # The rest of the line is discarded as it arrives, so it isn't
+            # decoded as a record of its own
+            self._partial = b''
+            self._skipping = True
+            records.append(_Invalid(f"Line longer than {MAX_RECORD_BYTES} bytes"))
+        return records
+    
+    def close(self):
+        if self._skipping:
+            self._skipping = False
+            return []
+        line, self._partial = self._partial, b''
+        return [self._decode(line)] if line.strip() else []
+    
+    def _decode(self, line):
+        # raw_decode skips the per-call work of json.loads (encoding
+        # detection, whitespace scans), which dominates for short lines
+        try:
+            text = line.decode('utf-8').strip(' \t\r')
+            record, end = self._decoder.raw_decode(text)
+        except ValueError as exc:
+            return _Invalid(f"Invalid JSON: {exc}")
+        if end != len(text):
+            return _Invalid(f"Invalid JSON: Extra data at column {end + 1}")
+        return record
+
+
+class _ArrayParser:
+    """
+    Incrementally decodes the elements of a top-level JSON array
+    
+    Elements are decoded with JSONDecoder.raw_decode as soon as they are
+    complete, keeping only the unparsed tail of the body buffered. A
+    syntax error can't be recovered from, so it ends the stream.
+    """
+    
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._state = 'start'  # start, value_or_end, value, separator, done
+    
+    def feed(self, chunk, final=False):
+        if self._state == 'done':
+            return []
+        buffer = self._buffer + self._text.decode(chunk, final)
+        records = []
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if self._state == 'start':
+                if char != '[':
+                    return self._fail(records, "Body must be a JSON array")
+                self._state = 'value_or_end'
+                pos += 1
+            elif self._state == 'separator' or (self._state == 'value_or_end' and char == ']'):
+                if char == ']':
+                    self._state = 'done'
+                    pos += 1
+                    break
+                if char != ',':
+                    return self._fail(records, f"Expected ',' or ']' at offset {pos}")
+                self._state = 'value'
+                pos += 1
+            else:
+                try:
+                    record, end = self._decoder.raw_decode(buffer, pos)
+                except ValueError as exc:
+                    if final or len(buffer) - pos > MAX_RECORD_BYTES:
+                        return self._fail(records, f"Invalid JSON: {exc}")
+                    break
+                if end == len(buffer) and not final:
+                    break  # a number or literal might continue in the next chunk
+                records.append(record)
+                self._state = 'separator'
+                pos = end
+        self._buffer = buffer[pos:]
+        return records
+    
+    def close(self):
+        records = self.feed(b'', final=True)
+        if self._state != 'done':
+            records = self._fail(records, "Unterminated JSON array")
+        return records
+    
+    def _fail(self, records, message):
+        self._state = 'done'
+        self._buffer = ''
+        records.append(_Invalid(message))
+        return records
+
+
+class BulkIngest:
+    """
+    Creates the records of one bulk request as its body streams in
+    
+    Args:
+        service: The service to create records with
+        kind (str): A key of KINDS, e.g. 'cars'
+        ndjson (bool): The body is NDJSON rather than a JSON array
+    """
+    
+    def __init__(self, service, kind, ndjson):
+        _, method, self.id_attribute = KINDS[kind]
+        self.kind = kind
+        self.create = getattr(service, method)
+        self.ndjson = ndjson
+        self.parser = _LineParser() if ndjson else _ArrayParser()
+        self.count = 0
+        self.created = 0
+    
+    def start(self):
+        """Bytes opening the response body"""
+        return b'' if self.ndjson else b'['
+    
+    def feed(self, chunk):
+        """Process a chunk of the request body; returns response bytes"""
+        return self._results(self.parser.feed(chunk))
+    
+    def close(self):
+        """Process the end of the request body; returns the final response bytes"""
+        return self._results(self.parser.close()) + (b'' if self.ndjson else b']')
+    
+    def _results(self, records):
+        out = []
+        for record in records:
+            out.append(self._encode(self._ingest(record)))
+        return b''.join(out)
+    
+    def _ingest(self, record):
+        index = self.count
+        self.count += 1
+        if isinstance(record, _Invalid):
+            return {'index': index, 'error': record.message}
+        error = validate(self.kind, record)
+        if error is None:
+            try:
+                entity = self.create(record)
+            except ValueError as exc:
+                error = str(exc)
+            else:
+                self.created += 1
+                return {'index': index, self.id_attribute: getattr(entity, self.id_attribute)}
+        return {'index': index, 'error': error}
+    
+    def _encode(self, result):
+        text = json.dumps(result)
+        if self.ndjson:
+            return (text + '\n').encode('utf-8')
+        return (text if result['index'] == 0 else ',' + text).encode('utf-8')
@@ -0,0 +1,120 @@
+"""
+Booking list endpoints shared by the Flask and ASGI apps.
+
+GET /api/passengers/<id>/bookings and /api/drivers/<id>/bookings page
+through an owner's bookings by booking ID (keyset pagination), so a
+page costs the same wherever it starts. Query parameters:
+
+- status: one status or a comma-separated list, e.g. COMPLETED,CANCELLED
+- since / until: ISO 8601 bounds on the request time (since inclusive)
+- order: asc (oldest first, the default) or desc
+- limit: bookings in the response, 1 to MAX_LIMIT (default DEFAULT_LIMIT)
+- cursor: the next_cursor of the previous response
+
+The body is {"bookings": [...], "next_cursor": "..."} with next_cursor
+null on the last page. It is streamed while bookings are fetched
+PAGE_SIZE at a time, so a request holds at most one batch however large
+its limit or the owner's history.
+"""
+
+import datetime
+
+from .serialization import booking_payload, encode
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 10000
+
+# Bookings fetched from the service per batch of a streamed response
+PAGE_SIZE = 200
+
+STATUSES = ('REQUESTED', 'ACCEPTED', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED')
+
+
+def parse_time(name, value):
+    """Parse an ISO 8601 query parameter as a naive local datetime"""
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an ISO 8601 date or time") from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)  # request times are local
+    return moment
+
+
+def parse_query(args):
+    """
+    Validate the query parameters of a booking list request
+    
+    Args:
+        args (Mapping): Query parameter name -> (first) value
+    
+    Returns:
+        dict: Keyword arguments for stream_bookings
+    
+    Raises:
+        ValueError: If a parameter is malformed
+    """
+    query = {'cursor': args.get('cursor') or None}
+    
+    limit = args.get('limit')
+    try:
+        query['limit'] = DEFAULT_LIMIT if limit in (None, '') else int(limit)
+    except ValueError:
+        raise ValueError("'limit' must be an integer") from None
+    if not 1 <= query['limit'] <= MAX_LIMIT:
+        raise ValueError(f"'limit' must be between 1 and {MAX_LIMIT}")
+    
+    order = args.get('order') or 'asc'
+    if order not in ('asc', 'desc'):
+        raise ValueError("'order' must be 'asc' or 'desc'")
+    query['descending'] = order == 'desc'
+    
+    status = None
+    if args.get('status'):
+        status = [s.strip().upper() for s in args['status'].split(',') if s.strip()]
+        for s in status:
+            if s not in STATUSES:
+                raise ValueError(f"Unknown status '{s}'")
+        status = status[0] if len(status) == 1 else status
+    query['status'] = status
+    
+    for name in ('since', 'until'):
+        query[name] = parse_time(name, args[name]) if args.get(name) else None
+    return query
+
+
+def stream_bookings(fetch_page, cursor=None, limit=DEFAULT_LIMIT, status=None, since=None, until=None,
+                    descending=False, page_size=PAGE_SIZE):
+    """
+    Encode a page of bookings as it is fetched
+    
+    Args:
+        fetch_page (callable): A BookingService.page_*_bookings method
+                               bound to the owner
+        cursor (str, optional): Last booking ID of the previous page
+        limit (int): Bookings in the response
+        status, since, until, descending: Filters and order for fetch_page
+        page_size (int): Bookings fetched per batch
+    
+    Yields:
+        bytes: Chunks of the JSON response body
+    """
+    yield b'{"bookings":['
+    after = cursor
+    remaining = limit
+    more = False
+    separator = b''
+    while remaining:
+        size = min(page_size, remaining)
+        # One booking extra tells whether another page follows
+        page = fetch_page(status, after, size + 1, since, until, descending)
+        more = len(page) > size
+        page = page[:size]
+        if page:
+            yield separator + b','.join(encode(booking_payload(booking)) for booking in page)
+            separator = b','
+            after = page[-1].booking_id
+            remaining -= len(page)
+        if not more:
+            break
+    yield b'],"next_cursor":' + encode(after if more else None) + b'}'
@@ -0,0 +1,60 @@
+"""
+Request metrics shared by the Flask and ASGI apps.
+
+Both apps time every request and serve these, together with the
+booking service's own counters, at GET /api/metrics in the Prometheus
+text format:
+
+- cab_booking_http_requests_total{method,route,status}
+- cab_booking_http_request_duration_seconds{method,route}: a histogram
+  of the time from receiving a request to producing its response
+- cab_booking_http_requests_in_flight
+- cab_booking_booking_transitions_total{from_status,to_status}
+- cab_booking_dispatch_failures_total{reason}
+
+Requests are labelled with the rule they matched (e.g.
+/api/bookings/<booking_id>) rather than their path, so the number of
+series stays bounded; requests that match no route share one label.
+"""
+
+import time
+
+from cab_booking.utils import MetricsRegistry
+
+# Route label of requests that match no route
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+def registry_of(booking_service):
+    """The booking service's registry, so one scrape covers both, or a new one"""
+    registry = getattr(booking_service, 'metrics', None)
+    return registry if registry is not None else MetricsRegistry()
+
+
+class HTTPMetrics:
+    """Request counts, latencies and requests in flight"""
+    
+    def __init__(self, registry):
+        self.registry = registry
+        self.requests = registry.counter(
+            'cab_booking_http_requests_total', 'HTTP requests served', ('method', 'route', 'status'))
+        self.durations = registry.histogram(
+            'cab_booking_http_request_duration_seconds', 'HTTP request latency', ('method', 'route'))
+        # One item per request in flight; list append and pop are atomic,
+        # so unlike Gauge.inc() they need no lock
+        self._in_flight = []
+        self.in_flight = registry.gauge(
+            'cab_booking_http_requests_in_flight', 'HTTP requests being handled')
+        self.in_flight.set_function(self._in_flight.__len__)
+    
+    def start(self):
+        """Count a request in flight; returns its start time for finish()"""
+        self._in_flight.append(None)
+        return time.perf_counter()
+    
+    def finish(self, start, method, route, status):
+        """Record a request started at start that ended with status"""
+        elapsed = time.perf_counter() - start
+        self._in_flight.pop()
+        self.requests.inc(method, route, status)
+        self.durations.observe(elapsed, method, route)
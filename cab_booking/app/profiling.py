@@ -0,0 +1,346 @@
+"""
+On-demand profiling of single requests to the Flask app.
+
+create_app(profile_directory=...) installs a RequestProfiler, which
+profiles a request when it carries an X-Profile header, or when it is
+one of every sample_every requests. The header is only honoured with
+the configured token, as "X-Profile: <token>" or "X-Profile:
+<mode>:<token>", or from a trusted address, where "X-Profile: <mode>"
+is enough; mode is "cprofile" or "sample", and the default otherwise.
+Header requests are limited to one every min_interval seconds, and
+only the last max_profiles profiles are kept. Without a profile
+directory nothing is installed, so requests don't pay for it.
+
+Each profiled request writes three files to the directory, named
+<time>-<method>-<route>-<n>, and the name is returned in the response's
+X-Profile header:
+
+- .collapsed: one "outer;...;inner microseconds" line per stack, the
+  input of flamegraph.pl, speedscope and inferno
+- .txt: the top functions by own and by cumulative time
+- .prof: the cProfile stats, for pstats or snakeviz (cprofile only)
+
+cprofile traces every call, so it is exact but slows the request down,
+and its stacks are rebuilt from caller/callee totals. sample reads the
+request thread's stack every sample_interval seconds from a second
+thread: the request runs at close to full speed, but short calls can be
+missed. One request is profiled at a time; the others run as usual.
+"""
+
+import cProfile
+import collections
+import datetime
+import hmac
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+
+from flask import current_app, g, request
+
+MODES = ('cprofile', 'sample')
+
+# Stack paths deeper than this are cut short
+MAX_DEPTH = 200
+
+
+def frame_label(filename, lineno, name):
+    """A function's name in the collapsed stacks, e.g. create_booking (services/booking_service.py:75)"""
+    if filename == '~':  # built-ins
+        return name.replace(';', ',')
+    short = '/'.join(filename.replace('\\', '/').split('/')[-2:])
+    return f'{name} ({short}:{lineno})'.replace(';', ',')
+
+
+class _Sampler(threading.Thread):
+    """
+    Collects the stacks of one thread every interval seconds until stopped
+    
+    The sampler needs the GIL to look, and by default a busy thread only
+    hands it over every 5 ms, so the switch interval is shortened to the
+    sampling interval while it runs.
+    """
+    
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}  # tuple of (filename, line, name), outermost first -> samples
+        self.samples = 0
+        self.started = None
+        self.elapsed = None
+        self._stop_event = threading.Event()
+        self._switch_interval = None
+    
+    def start(self):
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.interval, self._switch_interval))
+        self.started = time.perf_counter()
+        super().start()
+    
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack = tuple(reversed(stack))[:MAX_DEPTH]
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.elapsed = time.perf_counter() - self.started
+        sys.setswitchinterval(self._switch_interval)
+
+
+class RequestProfiler:
+    """
+    Profiles chosen requests and writes flame graph and summary files
+    
+    Args:
+        directory (str): Where the profiles are written; created if missing
+        sample_every (int): Also profile one request in this many; 0 only
+                            profiles requests with the header
+        mode (str): Default profiler, 'cprofile' or 'sample'
+        header (str, optional): Request header asking for a profile, or
+                                None to only profile sampled requests
+        sample_interval (float): Seconds between stack samples
+        top (int): Functions listed in each summary
+        token (str, optional): Secret the header must carry
+        trusted_addresses (iterable): Client addresses whose header is
+                                      honoured without the token
+        min_interval (float): Seconds between profiles asked for by header
+        max_profiles (int): Profiles kept; the oldest written by this
+                            profiler are deleted beyond it
+    """
+    
+    def __init__(self, directory, sample_every=0, mode='cprofile', header='X-Profile',
+                 sample_interval=0.001, top=30, token=None, trusted_addresses=(),
+                 min_interval=1.0, max_profiles=100):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}'")
+        self.directory = directory
+        self.sample_every = sample_every
+        self.mode = mode
+        self.header = header
+        self.sample_interval = sample_interval
+        self.top = top
+        self.token = token
+        self.trusted_addresses = frozenset(trusted_addresses)
+        self.min_interval = min_interval
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+        self._requests = itertools.count(1)
+        self._profiles = itertools.count(1)
+        # Python 3.12 allows one active cProfile at a time, so profiles
+        # never overlap
+        self._busy = threading.Lock()
+        self._last_asked = None
+        self._written = collections.deque()  # base paths, oldest first
+        self._lock = threading.Lock()
+    
+    def install(self, app):
+        """Profile the requests of a Flask app; installing again replaces the profiler"""
+        installed = 'request_profiler' in app.extensions
+        app.extensions['request_profiler'] = self
+        if not installed:
+            app.before_request(_start_profile)
+            app.after_request(_finish_profile)
+            app.teardown_request(_abandon_profile)
+        return app
+    
+    def choose_mode(self):
+        """The mode to profile the current request with, or None to leave it alone"""
+        asked = request.headers.get(self.header) if self.header else None
+        if asked is not None:
+            mode = self._allowed_mode(asked)
+            if mode is not None and self._take_turn():
+                return mode
+        if self.sample_every and next(self._requests) % self.sample_every == 0:
+            return self.mode
+        return None
+    
+    def _allowed_mode(self, value):
+        """The mode a header value asks for, or None if it has no right to ask"""
+        mode, separator, token = value.strip().partition(':')
+        if not separator and mode.lower() not in MODES:
+            mode, token = '', mode
+        allowed = (self.token is not None and hmac.compare_digest(token.encode(), self.token.encode())
+                   or request.remote_addr in self.trusted_addresses)
+        if not allowed:
+            return None
+        mode = mode.lower()
+        return mode if mode in MODES else self.mode
+    
+    def _take_turn(self):
+        """Whether min_interval has passed since the last profile asked for by header"""
+        now = time.monotonic()
+        with self._lock:
+            if self._last_asked is not None and now - self._last_asked < self.min_interval:
+                return False
+            self._last_asked = now
+            return True
+    
+    def start(self, mode):
+        """Start profiling the current thread; returns the profiler, or None if one is running"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                profiler = _Sampler(threading.get_ident(), self.sample_interval)
+                profiler.start()
+        except Exception:
+            self._busy.release()
+            raise
+        return profiler
+    
+    def stop(self, profiler):
+        if isinstance(profiler, _Sampler):
+            profiler.stop()
+        else:
+            profiler.disable()
+        self._busy.release()
+    
+    def write(self, profiler, method, route):
+        """Write a stopped profile's files; returns their common name"""
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        name = f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{method}-{slug}-{next(self._profiles)}"
+        base = os.path.join(self.directory, name)
+        if isinstance(profiler, _Sampler):
+            stacks, summary = self._sampled(profiler)
+        else:
+            profiler.dump_stats(base + '.prof')
+            stacks, summary = self._traced(profiler)
+        with open(base + '.collapsed', 'w') as f:
+            for stack, microseconds in sorted(stacks.items()):
+                if microseconds >= 1:
+                    f.write(f"{';'.join(stack)} {round(microseconds)}\n")
+        with open(base + '.txt', 'w') as f:
+            f.write(f'{method} {route}\n\n{summary}')
+        self._retain(base)
+        return name
+    
+    def _retain(self, base):
+        """Keep a new profile, deleting the oldest beyond max_profiles"""
+        with self._lock:
+            self._written.append(base)
+            expired = []
+            while len(self._written) > self.max_profiles:
+                expired.append(self._written.popleft())
+        for old in expired:
+            for extension in ('.collapsed', '.txt', '.prof'):
+                try:
+                    os.remove(old + extension)
+                except FileNotFoundError:
+                    pass
+    
+    def _traced(self, profiler):
+        """Collapsed stacks and summary of a cProfile run"""
+        stats = pstats.Stats(profiler).stats
+        
+        # Each function's own time is shared out among the paths that
+        # reach it in proportion to the time each caller spent in it
+        callees = {}
+        for function, (_, _, _, _, callers) in stats.items():
+            for caller, edge in callers.items():
+                callees.setdefault(caller, []).append((function, edge[3]))
+        stacks = {}
+        
+        def walk(function, path, seconds):
+            _, _, own, cumulative, _ = stats[function]
+            if not cumulative:
+                return
+            share = seconds / cumulative
+            path = path + (frame_label(*function),)
+            stacks[path] = stacks.get(path, 0.0) + own * share * 1e6
+            if len(path) >= MAX_DEPTH:
+                return
+            for callee, edge_seconds in callees.get(function, ()):
+                if callee != function and frame_label(*callee) not in path and edge_seconds * share * 1e6 >= 1:
+                    walk(callee, path, edge_seconds * share)
+        
+        for function, (_, _, _, cumulative, callers) in stats.items():
+            if not callers:
+                walk(function, (), cumulative)
+        
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        by_own = [(own, cumulative, calls, frame_label(*function))
+                  for function, (_, calls, own, cumulative, _) in rows]
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        by_cumulative = [(own, cumulative, calls, frame_label(*function))
+                         for function, (_, calls, own, cumulative, _) in rows]
+        total = sum(own for _, _, own, _, _ in stats.values())
+        summary = (f'cProfile, {total * 1e3:,.2f} ms traced\n\n'
+                   + self._table('By own time', by_own) + '\n'
+                   + self._table('By cumulative time', by_cumulative))
+        return stacks, summary
+    
+    def _sampled(self, sampler):
+        """Collapsed stacks and summary of a stack-sampling run"""
+        per_sample = sampler.elapsed / sampler.samples if sampler.samples else 0.0
+        stacks = {}
+        own, cumulative = {}, {}
+        for stack, samples in sampler.stacks.items():
+            labels = tuple(frame_label(*frame) for frame in stack)
+            stacks[labels] = stacks.get(labels, 0.0) + samples * per_sample * 1e6
+            if labels:
+                own[labels[-1]] = own.get(labels[-1], 0) + samples
+            for label in set(labels):
+                cumulative[label] = cumulative.get(label, 0) + samples
+        
+        def rows(counts):
+            ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:self.top]
+            return [(own.get(label, 0) * per_sample, cumulative[label] * per_sample, '-', label)
+                    for label, _ in ranked]
+        summary = (f'{sampler.samples} samples over {sampler.elapsed * 1e3:,.2f} ms\n\n'
+                   + self._table('By own time', rows(own)) + '\n'
+                   + self._table('By cumulative time', rows(cumulative)))
+        return stacks, summary
+    
+    @staticmethod
+    def _table(title, rows):
+        lines = [title, f"{'own ms':>10} {'cum ms':>10} {'calls':>8}  function"]
+        for own, cumulative, calls, label in rows:
+            lines.append(f'{own * 1e3:>10.3f} {cumulative * 1e3:>10.3f} {calls:>8}  {label}')
+        return '\n'.join(lines) + '\n'
+
+
+# Flask hooks; the profiler of the app is looked up on each request so a
+# later install() can replace it
+
+def _profiler_of_app():
+    return current_app.extensions['request_profiler']
+
+
+def _start_profile():
+    profiler = _profiler_of_app()
+    mode = profiler.choose_mode()
+    if mode is not None:
+        g.request_profile = profiler.start(mode)
+
+
+def _finish_profile(response):
+    active = g.pop('request_profile', None)
+    if active is not None:
+        profiler = _profiler_of_app()
+        profiler.stop(active)
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        response.headers['X-Profile'] = profiler.write(active, request.method, route)
+    return response
+
+
+def _abandon_profile(error=None):
+    # Requests that failed before after_request still release the profiler
+    active = g.pop('request_profile', None)
+    if active is not None:
+        _profiler_of_app().stop(active)
@@ -0,0 +1,219 @@
+"""
+JSON encoding of API responses, shared by the Flask and ASGI apps.
+
+encode() uses orjson when it is installed (pip install -e .[fast]) and
+the json module otherwise; both write datetimes as HTTP dates, like
+Flask's jsonify. ResponseCache keeps the encoded body of each entity's
+GET response and serves it again until the entity's version (or that
+of anything the response embeds) changes, so a hot booking is encoded
+once per change rather than once per read. The same versions give each
+response an ETag, and a poll whose If-None-Match still matches gets a
+304 without the payload being built at all.
+"""
+
+import datetime
+import hashlib
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; encode falls back to the json module
+    orjson = None
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value):
+    """
+    Format a date or datetime as an HTTP date, e.g. "Sun, 18 Oct 2026 11:33:40 GMT"
+    
+    Naive datetimes are taken as UTC, as Flask's jsonify does.
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+    else:
+        value = datetime.datetime(value.year, value.month, value.day)
+    return (f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT")
+
+
+def _default(value):
+    if isinstance(value, datetime.date):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    
+    def encode(payload):
+        """Encode a response payload as compact UTF-8 JSON"""
+        return orjson.dumps(payload, default=_default, option=_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+    
+    def encode(payload):
+        """Encode a response payload as compact UTF-8 JSON"""
+        return _encoder.encode(payload).encode('utf-8')
+
+
+def passenger_payload(passenger):
+    return {
+        'passenger_id': passenger.passenger_id,
+        'name': passenger.name,
+        'phone': passenger.phone,
+        'email': passenger.email
+    }
+
+
+def driver_payload(driver):
+    return {
+        'driver_id': driver.driver_id,
+        'name': driver.name,
+        'phone': driver.phone,
+        'email': driver.email,
+        'license_number': driver.license_number,
+        'is_available': driver.is_available,
+        'rating': driver.rating,
+        'assigned_car': str(driver.assigned_car) if driver.assigned_car else None
+    }
+
+
+def car_payload(car):
+    return {
+        'car_id': car.car_id,
+        'model': car.model,
+        'make': car.make,
+        'year': car.year,
+        'license_plate': car.license_plate,
+        'capacity': car.capacity,
+        'car_type': car.car_type,
+        'is_available': car.is_available,
+        'features': car.features
+    }
+
+
+def booking_payload(booking):
+    return booking.get_trip_details()
+
+
+def _version(entity):
+    return entity.version if entity is not None else None
+
+
+def _label(entity):
+    return str(entity) if entity is not None else None
+
+
+# kind -> (ID attribute, tag function, payload function). A tag holds
+# the versions of everything the payload is built from; the embedded
+# str() of related entities is compared as text instead, so a car
+# reporting its location (which bumps its version but not its text)
+# doesn't invalidate the responses of its driver and bookings.
+_KINDS = {
+    'passenger': ('passenger_id', lambda passenger: passenger.version, passenger_payload),
+    'driver': ('driver_id', lambda driver: (driver.version, _label(driver.assigned_car)), driver_payload),
+    'car': ('car_id', lambda car: car.version, car_payload),
+    'booking': ('booking_id', lambda booking: (
+        booking.version, _version(booking.fare),
+        _label(booking.passenger), _label(booking.driver), _label(booking.car),
+    ), booking_payload),
+}
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header value names an ETag
+    
+    Args:
+        if_none_match (str): The header value, e.g. '"a1b2", W/"c3d4"' or '*'
+        etag (str): The current quoted ETag
+    
+    Returns:
+        bool: True if a 304 Not Modified applies
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]  # GET uses the weak comparison
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Encoded GET responses of entities, with ETags, reused until they change
+    
+    An entity's ETag is a hash of its tag (see _KINDS), so it is the
+    same in every process serving the entity and can be checked against
+    If-None-Match without building or encoding the payload. Encoded
+    bodies are kept per entity ID along with the tag they were built
+    from, and served again while the tag still matches. When the cache
+    is full the oldest entries are dropped first.
+    
+    Args:
+        max_entries (int): Most responses kept
+    """
+    
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = {}  # (kind, entity ID) -> (tag, ETag, encoded body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+    
+    def respond(self, kind, entity, if_none_match=None):
+        """
+        The ETag and encoded body of an entity's GET response
+        
+        Args:
+            kind (str): 'passenger', 'driver', 'car' or 'booking'
+            entity: The entity
+            if_none_match (str, optional): The request's If-None-Match header
+        
+        Returns:
+            tuple: (ETag, body), where body is None if if_none_match
+                   already names the current ETag
+        """
+        id_attribute, tag_of, build = _KINDS[kind]
+        key = (kind, getattr(entity, id_attribute))
+        tag = tag_of(entity)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == tag:
+            etag = entry[1]
+        else:
+            etag = self._etag(key, tag)
+            entry = None
+        
+        if etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            return etag, None
+        if entry is not None:
+            self.hits += 1
+            return etag, entry[2]
+        
+        self.misses += 1
+        content = encode(build(entity))
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (tag, etag, content)
+        return etag, content
+    
+    @staticmethod
+    def _etag(key, tag):
+        digest = hashlib.blake2b(repr((key, tag)).encode('utf-8'), digest_size=8).hexdigest()
+        return f'"{digest}"'
+    
+    def __len__(self):
+        return len(self._entries)
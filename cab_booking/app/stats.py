@@ -0,0 +1,60 @@
+"""
+Trip statistics endpoint shared by the Flask and ASGI apps.
+
+GET /api/stats answers from the rollups TripAnalytics keeps as trips
+complete and are cancelled, so its cost depends on the number of
+buckets in range rather than the number of trips. Query parameters:
+
+- resolution: minute or hour (the default) buckets
+- since / until: ISO 8601 bounds on the bucket start (since inclusive)
+- car_type: only trips in cars of this type
+- near: "lat,lon"; only trips picked up in the zone of that point
+- group_by: a comma-separated list of time, car_type and zone (default
+  time); empty merges everything in range into one row
+
+The body is {"resolution": ..., "rows": [...]}, each row holding trips,
+cancelled, and count/sum/min/max/mean/p50/p90/p99 of revenue,
+distance_km and duration_minutes.
+"""
+
+from cab_booking.services.analytics import GROUP_BY, RESOLUTIONS
+from .listing import parse_time
+
+
+def parse_query(args):
+    """
+    Validate the query parameters of a stats request
+    
+    Args:
+        args (Mapping): Query parameter name -> (first) value
+    
+    Returns:
+        dict: Keyword arguments for BookingService.get_trip_stats
+    
+    Raises:
+        ValueError: If a parameter is malformed
+    """
+    query = {'resolution': args.get('resolution') or 'hour'}
+    if query['resolution'] not in RESOLUTIONS:
+        raise ValueError(f"'resolution' must be one of {', '.join(RESOLUTIONS)}")
+    
+    for name in ('since', 'until'):
+        query[name] = parse_time(name, args[name]) if args.get(name) else None
+    query['car_type'] = args.get('car_type') or None
+    
+    location = None
+    if args.get('near'):
+        try:
+            lat, lon = (float(part) for part in args['near'].split(','))
+        except ValueError:
+            raise ValueError("'near' must be 'latitude,longitude'") from None
+        location = (lat, lon)
+    query['location'] = location
+    
+    group_by = args.get('group_by')
+    group_by = ('time',) if group_by is None else tuple(g.strip() for g in group_by.split(',') if g.strip())
+    for name in group_by:
+        if name not in GROUP_BY:
+            raise ValueError(f"'group_by' may only list {', '.join(GROUP_BY)}")
+    query['group_by'] = group_by
+    return query
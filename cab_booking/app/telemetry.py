@@ -0,0 +1,88 @@
+"""
+Telemetry ingest shared by the Flask and ASGI apps.
+
+Cars stream location pings to POST /api/telemetry as NDJSON, one ping
+per line, e.g. {"car_id": "CAR-00000001", "latitude": 12.97,
+"longitude": 77.59, "timestamp": 1729240000.5} (the timestamp is
+optional; lat/lng/lon keys work too). Pings are parsed as the body
+arrives and handed to a TelemetryCoalescer in batches; the response is
+a single summary once the body ends, not one result per ping.
+"""
+
+import numbers
+
+from cab_booking.utils import get_coordinates
+from .bulk import _Invalid, _LineParser
+
+# Parse errors echoed back in the summary; the rest are only counted
+MAX_REPORTED_ERRORS = 10
+
+
+class TelemetryStream:
+    """
+    Feeds the pings of one telemetry request into a coalescer
+    
+    Args:
+        coalescer (TelemetryCoalescer): Where accepted pings go
+    """
+    
+    def __init__(self, coalescer):
+        self.coalescer = coalescer
+        self.parser = _LineParser()
+        self.count = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+    
+    def feed(self, chunk):
+        """Process a chunk of the request body"""
+        self._submit(self.parser.feed(chunk))
+    
+    def close(self):
+        """
+        Process the end of the request body
+        
+        Returns:
+            dict: The response summary
+        """
+        self._submit(self.parser.close())
+        return {
+            'received': self.count,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'stale': self.count - self.accepted - self.rejected,
+            'errors': self.errors,
+        }
+    
+    def _submit(self, records):
+        pings = []
+        for record in records:
+            index = self.count
+            self.count += 1
+            ping = self._ping(record)
+            if isinstance(ping, str):
+                self.rejected += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({'index': index, 'error': ping})
+            else:
+                pings.append(ping)
+        if pings:
+            self.accepted += self.coalescer.submit_many(pings)
+    
+    @staticmethod
+    def _ping(record):
+        """A (car_id, location, timestamp) tuple, or what is wrong with the record"""
+        if isinstance(record, _Invalid):
+            return record.message
+        if not isinstance(record, dict):
+            return "Ping must be a JSON object"
+        car_id = record.get('car_id')
+        if not isinstance(car_id, str) or not car_id:
+            return "Missing required field 'car_id'"
+        coordinates = get_coordinates(record)
+        if coordinates is None:
+            return "Ping has no latitude/longitude"
+        timestamp = record.get('timestamp')
+        if timestamp is not None and (not isinstance(timestamp, numbers.Real) or isinstance(timestamp, bool)):
+            return "Field 'timestamp' has the wrong type"
+        return car_id, {'latitude': coordinates[0], 'longitude': coordinates[1]}, timestamp
@@ -1,6 +1,13 @@
 import datetime
 
 class Booking:
+    __slots__ = ('booking_id', 'passenger', 'driver', 'car', 'from_location',
+                 'to_location', 'status', 'request_time', 'pickup_time',
+                 'completion_time', 'cancellation_time', 'cancellation_reason',
+                 'estimated_distance_km', 'estimated_duration_minutes',
+                 'actual_distance_km', 'actual_duration_minutes', 'fare',
+                 'surge_multiplier', 'version')
+
     def __init__(self, booking_id, passenger, from_location, to_location):
         self.booking_id = booking_id
         self.passenger = passenger
@@ -19,16 +26,20 @@ class Booking:
         self.actual_distance_km = 0
         self.actual_duration_minutes = 0
         self.fare = None
+        self.surge_multiplier = 1.0  # quoted when requested; see cab_booking.services.surge
+        self.version = 0  # bumped on every change; see cab_booking.app.serialization
 
     def assign_driver(self, driver):
         self.driver = driver
         self.car = driver.assigned_car
         self.status = "ACCEPTED"
+        self.version += 1
         return self
 
     def start_trip(self):
         self.status = "IN_PROGRESS"
         self.pickup_time = datetime.datetime.now()
+        self.version += 1
         return self
 
     def complete_trip(self, actual_distance_km, actual_duration_minutes):
@@ -36,17 +47,20 @@ class Booking:
         self.completion_time = datetime.datetime.now()
         self.actual_distance_km = actual_distance_km
         self.actual_duration_minutes = actual_duration_minutes
+        self.version += 1
         return self
 
     def cancel_trip(self, reason=None):
         self.status = "CANCELLED"
         self.cancellation_time = datetime.datetime.now()
         self.cancellation_reason = reason
+        self.version += 1
         return self
 
     def set_estimated_trip_details(self, distance_km, duration_minutes):
         self.estimated_distance_km = distance_km
         self.estimated_duration_minutes = duration_minutes
+        self.version += 1
         return self
 
     def calculate_fare(self, base_fare=50):
@@ -56,8 +70,10 @@ class Booking:
                 self.booking_id,
                 base_fare,
                 self.actual_distance_km,
-                self.actual_duration_minutes
+                self.actual_duration_minutes,
+                self.surge_multiplier
             )
+            self.version += 1
         return self.fare
 
     def get_trip_details(self):
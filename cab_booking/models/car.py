@@ -1,4 +1,8 @@
 class Car:
+    __slots__ = ('car_id', 'model', 'make', 'year', 'license_plate',
+                 'capacity', 'car_type', 'is_available', 'current_location',
+                 'features', 'version')
+
     def __init__(self, car_id, model, make, year, license_plate, capacity, car_type):
         self.car_id = car_id
         self.model = model
@@ -10,15 +14,19 @@ class Car:
         self.is_available = True
         self.current_location = None
         self.features = []
+        self.version = 0  # bumped on every change; see cab_booking.app.serialization
 
     def update_location(self, location):
         self.current_location = location
+        self.version += 1
 
     def set_availability(self, is_available):
         self.is_available = is_available
+        self.version += 1
 
     def add_feature(self, feature):
         self.features.append(feature)
+        self.version += 1
 
     def __str__(self):
         return f"{self.make} {self.model} ({self.year}) - {self.license_plate}"
\ No newline at end of file
@@ -1,4 +1,8 @@
 class Driver:
+    __slots__ = ('driver_id', 'name', 'phone', 'email', 'license_number',
+                 'is_available', 'rating', 'total_ratings', 'assigned_car',
+                 'version')
+
     def __init__(self, driver_id, name, phone, email, license_number):
         self.driver_id = driver_id
         self.name = name
@@ -9,17 +13,21 @@ class Driver:
         self.rating = 0.0
         self.total_ratings = 0
         self.assigned_car = None
+        self.version = 0  # bumped on every change; see cab_booking.app.serialization
 
     def assign_car(self, car):
         self.assigned_car = car
+        self.version += 1
 
     def set_availability(self, is_available):
         self.is_available = is_available
+        self.version += 1
 
     def update_rating(self, new_rating):
         total = self.rating * self.total_ratings
         self.total_ratings += 1
         self.rating = (total + new_rating) / self.total_ratings
+        self.version += 1
 
     def __str__(self):
         return f"{self.name} ({self.driver_id}) - Rating: {self.rating:.1f}"
\ No newline at end of file
@@ -1,28 +1,78 @@
 import datetime
 
+try:
+    import numpy
+except ImportError:  # numpy is optional; calculate_fares falls back to plain Python
+    numpy = None
+
+RATE_PER_KM = 10  # Assume rate of $10 per km
+RATE_PER_MINUTE = 2  # Assume rate of $2 per minute
+
 class Fare:
-    def __init__(self, booking_id, base_fare, distance_km, time_minutes):
-        self.fare_id = f"FARE-{booking_id}"
+    __slots__ = ('booking_id', 'base_fare', 'distance_km',
+                 'time_minutes', 'total_amount', 'discount',
+                 'surge_multiplier', 'payment_status', 'payment_method',
+                 'timestamp', 'version')
+
+    def __init__(self, booking_id, base_fare, distance_km, time_minutes, surge_multiplier=1.0):
         self.booking_id = booking_id
         self.base_fare = base_fare
         self.distance_km = distance_km
         self.time_minutes = time_minutes
         self.total_amount = 0
         self.discount = 0
-        self.surge_multiplier = 1.0
+        self.surge_multiplier = surge_multiplier
         self.payment_status = "PENDING"  # PENDING, PAID, FAILED
         self.payment_method = None
         self.timestamp = datetime.datetime.now()
+        self.version = 0  # bumped on every change; see cab_booking.app.serialization
         self.calculate_fare()
 
+    @property
+    def fare_id(self):
+        # Derived rather than stored, saving a string per fare
+        return f"FARE-{self.booking_id}"
+
     def calculate_fare(self):
-        distance_cost = self.distance_km * 10  # Assume rate of $10 per km
-        time_cost = self.time_minutes * 2  # Assume rate of $2 per minute
+        distance_cost = self.distance_km * RATE_PER_KM
+        time_cost = self.time_minutes * RATE_PER_MINUTE
         subtotal = self.base_fare + distance_cost + time_cost
         surge_amount = subtotal * (self.surge_multiplier - 1)
         self.total_amount = (subtotal + surge_amount) * (1 - self.discount / 100)
+        self.version += 1
         return self.total_amount
 
+    @staticmethod
+    def calculate_fares(base_fares, distances_km, times_minutes, surge_multipliers=1.0, discounts=0):
+        # Vectorized calculate_fare over columns of trip data (scalars are
+        # broadcast). Performs the same operations in the same order, so the
+        # totals match calculate_fare exactly. Returns a float64 array, or a
+        # list when numpy is not installed.
+        if numpy is not None:
+            base = numpy.asarray(base_fares, dtype=numpy.float64)
+            distance = numpy.asarray(distances_km, dtype=numpy.float64)
+            minutes = numpy.asarray(times_minutes, dtype=numpy.float64)
+            surge = numpy.asarray(surge_multipliers, dtype=numpy.float64)
+            discount = numpy.asarray(discounts, dtype=numpy.float64)
+
+            subtotal = base + distance * RATE_PER_KM
+            subtotal += minutes * RATE_PER_MINUTE
+            surge_amount = subtotal * (surge - 1)
+            subtotal += surge_amount
+            subtotal *= 1 - discount / 100
+            return subtotal
+
+        columns = [base_fares, distances_km, times_minutes, surge_multipliers, discounts]
+        size = max((len(c) for c in columns if not isinstance(c, (int, float))), default=1)
+        base, distance, minutes, surge, discount = (
+            [c] * size if isinstance(c, (int, float)) else c for c in columns
+        )
+        totals = []
+        for b, d, m, s, disc in zip(base, distance, minutes, surge, discount):
+            subtotal = b + d * RATE_PER_KM + m * RATE_PER_MINUTE
+            totals.append((subtotal + subtotal * (s - 1)) * (1 - disc / 100))
+        return totals
+
     def apply_discount(self, discount_percentage):
         self.discount = discount_percentage
         self.calculate_fare()
@@ -31,9 +81,18 @@ class Fare:
         self.surge_multiplier = multiplier
         self.calculate_fare()
 
+    def apply_pricing(self, surge_multiplier=None, discount_percentage=None):
+        # Set surge and discount together with a single recalculation
+        if surge_multiplier is not None:
+            self.surge_multiplier = surge_multiplier
+        if discount_percentage is not None:
+            self.discount = discount_percentage
+        self.calculate_fare()
+
     def mark_as_paid(self, payment_method):
         self.payment_status = "PAID"
         self.payment_method = payment_method
+        self.version += 1
 
     def generate_receipt(self):
         return {
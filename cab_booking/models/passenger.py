@@ -1,24 +1,46 @@
+import collections
+import itertools
+
 class Passenger:
+    __slots__ = ('passenger_id', 'name', 'phone', 'email', 'payment_methods',
+                 'booking_history', 'favorite_locations', 'version')
+
+    # booking_history keeps only the latest bookings; older ones are paged
+    # in from BookingService (see BookingService.get_recent_bookings)
+    RECENT_BOOKINGS = 10
+
     def __init__(self, passenger_id, name, phone, email):
         self.passenger_id = passenger_id
         self.name = name
         self.phone = phone
         self.email = email
         self.payment_methods = []
-        self.booking_history = []
+        self.booking_history = self.new_booking_history()
         self.favorite_locations = []
+        self.version = 0  # bumped on every change; see cab_booking.app.serialization
+
+    @classmethod
+    def new_booking_history(cls):
+        return collections.deque(maxlen=cls.RECENT_BOOKINGS)
 
     def add_payment_method(self, payment_method):
         self.payment_methods.append(payment_method)
+        self.version += 1
 
     def add_to_booking_history(self, booking):
         self.booking_history.append(booking)
+        self.version += 1
 
     def add_favorite_location(self, location):
         self.favorite_locations.append(location)
+        self.version += 1
 
     def get_recent_bookings(self, limit=5):
-        return self.booking_history[-limit:] if len(self.booking_history) > 0 else []
+        if limit <= 0:
+            return []
+        if limit >= len(self.booking_history):
+            return list(self.booking_history)
+        return list(itertools.islice(reversed(self.booking_history), limit))[::-1]
 
     def __str__(self):
         return f"{self.name} ({self.passenger_id})"
\ No newline at end of file
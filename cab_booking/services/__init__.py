@@ -2,17 +2,81 @@
 This module contains initialization for the services package.
 """
 
+import collections
+import os
+
+from cab_booking.utils import MetricsRegistry, id_sequence
+
 from .passenger_service import PassengerService
 from .driver_service import DriverService
 from .car_service import CarService
 from .booking_service import BookingService
+from .telemetry import TelemetryCoalescer
+from .surge import SurgePricing
+from .routing import RouteEstimator
+from .analytics import TripAnalytics
 
-# Initialize services
-passenger_service = PassengerService()
-driver_service = DriverService()
-car_service = CarService()
-booking_service = BookingService(
-    passenger_service=passenger_service,
-    driver_service=driver_service,
-    car_service=car_service
+Services = collections.namedtuple(
+    'Services', ['passenger_service', 'driver_service', 'car_service', 'booking_service']
 )
+
+
+def create_services(repositories=None, lock_stripes=64, shard=0, shards=1, **booking_options):
+    """
+    Create the four services wired to each other
+    
+    Args:
+        repositories (dict, optional): Maps 'passenger', 'driver', 'car' and
+                                       'booking' to Repository backends;
+                                       missing kinds use in-memory dicts
+        lock_stripes (int): Lock stripes per service; 1 gives each service
+                            a single global lock
+        shard (int): This process's shard number, for sharded deployments
+        shards (int): Number of shards; new IDs made here are congruent to
+                      shard modulo shards, so they are unique cluster-wide
+        **booking_options: Extra keyword arguments for BookingService; pass
+                           surge=None to turn off surge pricing, or
+                           route_estimator=None to take trip estimates
+                           from the client, or analytics=None to keep no
+                           trip rollups, or metrics=None to count no
+                           booking transitions
+        
+    Returns:
+        Services: The passenger, driver, car and booking services
+    """
+    repositories = repositories or {}
+    
+    def numbers(kind):
+        return id_sequence(repositories.get(kind) or (), shard, shards)
+    
+    passenger_service = PassengerService(repositories.get('passenger'), lock_stripes=lock_stripes,
+                                         id_numbers=numbers('passenger'))
+    driver_service = DriverService(repositories.get('driver'), lock_stripes=lock_stripes,
+                                   id_numbers=numbers('driver'))
+    surge = booking_options.pop('surge', SurgePricing())
+    booking_options.setdefault('route_estimator', RouteEstimator())
+    booking_options.setdefault('analytics', TripAnalytics())
+    booking_options.setdefault('metrics', MetricsRegistry())
+    car_service = CarService(repositories.get('car'), lock_stripes=lock_stripes,
+                             id_numbers=numbers('car'), surge=surge, ratings=driver_service.ratings)
+    booking_service = BookingService(
+        passenger_service=passenger_service,
+        driver_service=driver_service,
+        car_service=car_service,
+        repository=repositories.get('booking'),
+        lock_stripes=lock_stripes,
+        id_numbers=numbers('booking'),
+        surge=surge,
+        **booking_options
+    )
+    return Services(passenger_service, driver_service, car_service, booking_service)
+
+
+# Initialize services; with CAB_BOOKING_SHARDS set they forward to the
+# shard processes of that cluster directory (see cab_booking.sharding)
+if os.environ.get('CAB_BOOKING_SHARDS'):
+    from cab_booking.sharding import connect_shards
+    passenger_service, driver_service, car_service, booking_service = connect_shards(
+        os.environ['CAB_BOOKING_SHARDS'])
+else:
+    passenger_service, driver_service, car_service, booking_service = create_services()
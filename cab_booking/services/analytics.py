@@ -0,0 +1,303 @@
+import datetime
+import math
+import threading
+
+from cab_booking.utils import get_coordinates
+
+# Seconds per bucket at each resolution
+RESOLUTIONS = {'minute': 60, 'hour': 3600}
+
+# What rollups can be grouped by, besides nothing at all
+GROUP_BY = ('time', 'car_type', 'zone')
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _Summary:
+    """
+    Count, sum, min, max and a quantile sketch of one metric
+    
+    The sketch counts values in logarithmic bins (bin i holds values in
+    (gamma^(i-1), gamma^i]), so a quantile read back is within the
+    sketch's relative accuracy of the true one, it stays a few hundred
+    bins whatever the number of values, and two summaries merge by
+    adding their bins.
+    """
+    
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'zeros', 'bins', 'log_gamma')
+    
+    def __init__(self, log_gamma):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.zeros = 0  # values <= 0, which have no bin
+        self.bins = {}  # bin index -> count
+        self.log_gamma = log_gamma
+    
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if value <= 0:
+            self.zeros += 1
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+    
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        if other.minimum is not None and (self.minimum is None or other.minimum < self.minimum):
+            self.minimum = other.minimum
+        if other.maximum is not None and (self.maximum is None or other.maximum > self.maximum):
+            self.maximum = other.maximum
+        self.zeros += other.zeros
+        bins = self.bins
+        for index, count in other.bins.items():
+            bins[index] = bins.get(index, 0) + count
+    
+    def quantile(self, q):
+        """The approximate q-quantile, clamped to the exact min and max"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        value = 0.0
+        if rank >= seen:
+            for index in sorted(self.bins):
+                seen += self.bins[index]
+                if rank < seen:
+                    break
+            # Midpoint of the bin, in the relative sense
+            value = 2 * math.exp(index * self.log_gamma) / (1 + math.exp(self.log_gamma))
+        return min(max(value, self.minimum), self.maximum)
+    
+    def report(self):
+        report = {
+            'count': self.count,
+            'sum': round(self.total, 2),
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': round(self.total / self.count, 2) if self.count else None,
+        }
+        for q in QUANTILES:
+            value = self.quantile(q)
+            report[f'p{round(q * 100)}'] = round(value, 2) if value is not None else None
+        return report
+
+
+class _Rollup:
+    """Trips, cancellations and trip metrics of one bucket and group"""
+    
+    __slots__ = ('trips', 'cancelled', 'revenue', 'distance_km', 'duration_minutes')
+    
+    def __init__(self, log_gamma):
+        self.trips = 0
+        self.cancelled = 0
+        self.revenue = _Summary(log_gamma)
+        self.distance_km = _Summary(log_gamma)
+        self.duration_minutes = _Summary(log_gamma)
+    
+    def merge(self, other):
+        self.trips += other.trips
+        self.cancelled += other.cancelled
+        self.revenue.merge(other.revenue)
+        self.distance_km.merge(other.distance_km)
+        self.duration_minutes.merge(other.duration_minutes)
+        return self
+    
+    def report(self):
+        return {
+            'trips': self.trips,
+            'cancelled': self.cancelled,
+            'revenue': self.revenue.report(),
+            'distance_km': self.distance_km.report(),
+            'duration_minutes': self.duration_minutes.report(),
+        }
+
+
+class TripAnalytics:
+    """
+    Streaming rollups of completed and cancelled trips.
+    
+    BookingService feeds every trip here as it completes or is
+    cancelled. Each one is added to a per-minute and a per-hour bucket,
+    split by car type and pickup zone (a zone_size_deg grid square), so
+    a question such as revenue per hour per car type, or the mean trip
+    length today, merges a few bucket rollups instead of walking every
+    booking. Each rollup keeps counts, sums, min/max and quantile
+    sketches (within accuracy relative error) of revenue, distance and
+    duration. Minute buckets are kept for minute_retention_hours and
+    hour buckets for hour_retention_days.
+    
+    Args:
+        zone_size_deg (float): Side of a zone in degrees
+        accuracy (float): Relative error of the quantiles reported
+        minute_retention_hours (float): Age at which minute buckets are dropped
+        hour_retention_days (float): Age at which hour buckets are dropped
+    """
+    
+    def __init__(self, zone_size_deg=0.05, accuracy=0.01, minute_retention_hours=24, hour_retention_days=30):
+        self.zone_size_deg = zone_size_deg
+        self.log_gamma = math.log((1 + accuracy) / (1 - accuracy))
+        self.retention = {'minute': minute_retention_hours * 3600, 'hour': hour_retention_days * 86400}
+        # resolution -> {bucket start (epoch seconds) -> (by zone, by car type)},
+        # where by zone maps (car type, zone) -> _Rollup and by car type maps
+        # car type -> _Rollup over all zones, for queries that ignore zones
+        self._buckets = {resolution: {} for resolution in RESOLUTIONS}
+        self._lock = threading.Lock()
+    
+    def zone(self, location):
+        """Grid position of the zone containing a location, or None"""
+        coordinates = get_coordinates(location)
+        if coordinates is None:
+            return None
+        return (math.floor(coordinates[0] / self.zone_size_deg),
+                math.floor(coordinates[1] / self.zone_size_deg))
+    
+    def record_trip(self, booking):
+        """Add a completed booking's fare, distance and duration"""
+        revenue = booking.fare.total_amount if booking.fare is not None else 0.0
+        group = self._group_of(booking)
+        with self._lock:
+            for rollup in self._rollups(group, booking.completion_time):
+                rollup.trips += 1
+                rollup.revenue.add(revenue)
+                rollup.distance_km.add(booking.actual_distance_km)
+                rollup.duration_minutes.add(booking.actual_duration_minutes)
+    
+    def record_cancellation(self, booking):
+        """Count a cancelled booking"""
+        group = self._group_of(booking)
+        with self._lock:
+            for rollup in self._rollups(group, booking.cancellation_time):
+                rollup.cancelled += 1
+    
+    def _group_of(self, booking):
+        return (booking.car.car_type if booking.car is not None else None, self.zone(booking.from_location))
+    
+    def _rollups(self, group, when):
+        """The rollups a trip of a group at a time is added to; the caller holds the lock"""
+        timestamp = (when or datetime.datetime.now()).timestamp()
+        rollups = []
+        for resolution, seconds in RESOLUTIONS.items():
+            buckets = self._buckets[resolution]
+            start = int(timestamp // seconds) * seconds
+            bucket = buckets.get(start)
+            if bucket is None:
+                bucket = buckets[start] = ({}, {})
+                self._expire(buckets, start - self.retention[resolution])
+            for groups, key in zip(bucket, (group, group[0])):
+                rollup = groups.get(key)
+                if rollup is None:
+                    rollup = groups[key] = _Rollup(self.log_gamma)
+                rollups.append(rollup)
+        return rollups
+    
+    @staticmethod
+    def _expire(buckets, cutoff):
+        # Buckets are created in time order, so the old ones come first
+        for start in list(buckets):
+            if start >= cutoff:
+                break
+            del buckets[start]
+    
+    def rollups(self, resolution='hour', since=None, until=None, car_type=None, location=None,
+                group_by=('time',)):
+        """
+        Merged rollups of the buckets in a time range
+        
+        Args:
+            resolution (str): 'minute' or 'hour'
+            since (datetime, optional): Only buckets starting at or after this
+            until (datetime, optional): Only buckets starting before this
+            car_type (str, optional): Only trips in cars of this type
+            location (optional): Only trips picked up in this location's zone
+            group_by (iterable): Any of 'time', 'car_type' and 'zone'; the
+                                 rollups of each distinct combination are
+                                 merged, and an empty group_by merges all
+        
+        Returns:
+            dict: (bucket start, car type, zone) -> Rollup, with the parts
+                  not grouped by set to None
+        
+        Raises:
+            ValueError: If resolution or group_by is unknown
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}'")
+        group_by = set(group_by)
+        if not group_by <= set(GROUP_BY):
+            raise ValueError(f"Can only group by {', '.join(GROUP_BY)}")
+        zone = self.zone(location) if location is not None else None
+        if location is not None and zone is None:
+            return {}
+        lower = since.timestamp() if since is not None else -math.inf
+        upper = until.timestamp() if until is not None else math.inf
+        
+        by_zone = location is not None or 'zone' in group_by
+        merged = {}
+        with self._lock:
+            for start, bucket in self._buckets[resolution].items():
+                if not lower <= start < upper:
+                    continue
+                if by_zone:
+                    groups = bucket[0].items()
+                else:
+                    groups = (((group_car_type, None), rollup) for group_car_type, rollup in bucket[1].items())
+                for (group_car_type, group_zone), rollup in groups:
+                    if car_type is not None and group_car_type != car_type:
+                        continue
+                    if zone is not None and group_zone != zone:
+                        continue
+                    key = (start if 'time' in group_by else None,
+                           group_car_type if 'car_type' in group_by else None,
+                           group_zone if 'zone' in group_by else None)
+                    total = merged.get(key)
+                    if total is None:
+                        total = merged[key] = _Rollup(self.log_gamma)
+                    total.merge(rollup)
+        return merged
+    
+    @staticmethod
+    def merge(results):
+        """Merge several rollups() results (e.g. one per shard) into one"""
+        merged = {}
+        for result in results:
+            for key, rollup in result.items():
+                if key in merged:
+                    merged[key].merge(rollup)
+                else:
+                    merged[key] = rollup
+        return merged
+    
+    @staticmethod
+    def report(rollups, group_by=('time',)):
+        """
+        Plain rows of rollups() output, in time, car type and zone order
+        
+        Args:
+            rollups (dict): The result of rollups() or merge()
+            group_by (iterable): The group_by the rollups were made with
+        
+        Returns:
+            list: One dict per group
+        """
+        rows = []
+        for key in sorted(rollups, key=lambda key: tuple((part is not None, part) for part in key)):
+            start, car_type, zone = key
+            row = {}
+            if 'time' in group_by:
+                row['start'] = datetime.datetime.fromtimestamp(start).isoformat()
+            if 'car_type' in group_by:
+                row['car_type'] = car_type
+            if 'zone' in group_by:
+                row['zone'] = list(zone) if zone is not None else None
+            row.update(rollups[key].report())
+            rows.append(row)
+        return rows
+
@@ -0,0 +1,249 @@
+import datetime
+import json
+import threading
+from array import array
+
+from cab_booking.models import Booking, Fare
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_NO_TIME = -(2 ** 63)
+_NO_CODE = -1
+_STATUSES = ("COMPLETED", "CANCELLED")
+
+
+def _to_micros(moment):
+    if moment is None:
+        return _NO_TIME
+    return (moment - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _from_micros(micros):
+    if micros == _NO_TIME:
+        return None
+    return _EPOCH + datetime.timedelta(microseconds=micros)
+
+
+class _InternTable:
+    """Maps repeated values (IDs, locations, reasons) to small integer codes"""
+    
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+    
+    def code(self, value):
+        if value is None:
+            return _NO_CODE
+        # Strings are their own key; anything else (dict or list locations,
+        # numbers) is keyed by its JSON, in a tuple so it can't equal a string
+        key = value if isinstance(value, str) else (json.dumps(value, sort_keys=True, default=str),)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+    
+    def value(self, code):
+        if code == _NO_CODE:
+            return None
+        value = self.values[code]
+        if isinstance(value, dict):
+            return dict(value)
+        if isinstance(value, list):
+            return list(value)
+        return value
+
+
+class BookingArchive:
+    """
+    Columnar store for bookings that have reached a terminal status.
+    
+    Each booking becomes one row across typed arrays (distances,
+    durations, timestamps in microseconds, fare amounts) plus integer
+    codes into intern tables for IDs, locations and other repeated
+    strings. Nothing references the live Passenger/Driver/Car objects,
+    so archived bookings cost a few hundred bytes and aggregate scans
+    read contiguous arrays. get() rebuilds a detached Booking on demand.
+    """
+    
+    FLOAT_COLUMNS = (
+        'estimated_distance_km', 'estimated_duration_minutes',
+        'actual_distance_km', 'actual_duration_minutes',
+        'base_fare', 'fare_distance_km', 'fare_time_minutes',
+        'discount', 'surge_multiplier', 'total_amount',
+        'booking_surge_multiplier',
+    )
+    TIME_COLUMNS = (
+        'request_time', 'pickup_time', 'completion_time',
+        'cancellation_time', 'fare_timestamp',
+    )
+    CODE_COLUMNS = (
+        'status', 'passenger_id', 'driver_id', 'car_id',
+        'from_location', 'to_location', 'cancellation_reason',
+        'payment_status', 'payment_method',
+    )
+    # Kept so a rebuilt booking carries the version it was archived at
+    VERSION_COLUMNS = ('version', 'fare_version')
+    
+    def __init__(self):
+        self.booking_ids = []
+        self._rows = {}
+        self._interned = _InternTable()
+        for name in self.FLOAT_COLUMNS:
+            setattr(self, name, array('d'))
+        for name in self.TIME_COLUMNS:
+            setattr(self, name, array('q'))
+        for name in self.CODE_COLUMNS:
+            setattr(self, name, array('i'))
+        for name in self.VERSION_COLUMNS:
+            setattr(self, name, array('q'))
+        self.has_fare = array('b')
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.booking_ids)
+    
+    def __contains__(self, booking_id):
+        return booking_id in self._rows
+    
+    def add(self, booking):
+        """
+        Append a terminal booking as a new row
+        
+        Args:
+            booking (Booking): A COMPLETED or CANCELLED booking
+        """
+        with self._lock:
+            if booking.status not in _STATUSES:
+                raise ValueError(f"Booking {booking.booking_id} is not completed or cancelled")
+            if booking.booking_id in self._rows:
+                raise ValueError(f"Booking {booking.booking_id} is already archived")
+            
+            code = self._interned.code
+            fare = booking.fare
+            
+            # Every value is worked out before any column grows, so a bad
+            # value can't leave the columns out of step
+            values = {
+                'status': code(booking.status),
+                'passenger_id': code(booking.passenger.passenger_id if booking.passenger else None),
+                'driver_id': code(booking.driver.driver_id if booking.driver else None),
+                'car_id': code(booking.car.car_id if booking.car else None),
+                'from_location': code(booking.from_location),
+                'to_location': code(booking.to_location),
+                'cancellation_reason': code(booking.cancellation_reason),
+                'payment_status': code(fare.payment_status if fare else None),
+                'payment_method': code(fare.payment_method if fare else None),
+                
+                'request_time': _to_micros(booking.request_time),
+                'pickup_time': _to_micros(booking.pickup_time),
+                'completion_time': _to_micros(booking.completion_time),
+                'cancellation_time': _to_micros(booking.cancellation_time),
+                'fare_timestamp': _to_micros(fare.timestamp if fare else None),
+                
+                'estimated_distance_km': booking.estimated_distance_km or 0,
+                'estimated_duration_minutes': booking.estimated_duration_minutes or 0,
+                'actual_distance_km': booking.actual_distance_km or 0,
+                'actual_duration_minutes': booking.actual_duration_minutes or 0,
+                'has_fare': 1 if fare else 0,
+                'base_fare': fare.base_fare if fare else 0,
+                'fare_distance_km': fare.distance_km if fare else 0,
+                'fare_time_minutes': fare.time_minutes if fare else 0,
+                'discount': fare.discount if fare else 0,
+                'surge_multiplier': fare.surge_multiplier if fare else 1.0,
+                'total_amount': fare.total_amount if fare else 0,
+                'booking_surge_multiplier': booking.surge_multiplier,
+                'version': booking.version,
+                'fare_version': fare.version if fare else 0,
+            }
+            
+            row = len(self.booking_ids)
+            try:
+                for name, value in values.items():
+                    getattr(self, name).append(value)
+            except Exception:
+                # A value the column's type rejects; drop the partial row
+                for name in values:
+                    del getattr(self, name)[row:]
+                raise
+            self.booking_ids.append(booking.booking_id)
+            
+            # Publish the row only once every column holds it
+            self._rows[booking.booking_id] = row
+    
+    def request_time_of(self, booking_id):
+        """
+        Get when an archived booking was requested, without rebuilding it
+        
+        Args:
+            booking_id (str): The booking ID
+            
+        Returns:
+            datetime: The request time if archived, None otherwise
+        """
+        row = self._rows.get(booking_id)
+        if row is None:
+            return None
+        return _from_micros(self.request_time[row])
+    
+    def get(self, booking_id, passenger_service=None, driver_service=None, car_service=None):
+        """
+        Rebuild an archived booking
+        
+        The passenger, driver and car are looked up through the given
+        services. The result is a detached copy: changing it does not
+        change the archive.
+        
+        Args:
+            booking_id (str): The booking ID
+            
+        Returns:
+            Booking: The rebuilt booking if archived, None otherwise
+        """
+        row = self._rows.get(booking_id)
+        if row is None:
+            return None
+        value = self._interned.value
+        
+        def lookup(service, getter, column):
+            entity_id = value(column[row])
+            if entity_id is None or service is None:
+                return None
+            return getattr(service, getter)(entity_id)
+        
+        booking = Booking(
+            booking_id,
+            lookup(passenger_service, 'get_passenger', self.passenger_id),
+            value(self.from_location[row]),
+            value(self.to_location[row]),
+        )
+        booking.driver = lookup(driver_service, 'get_driver', self.driver_id)
+        booking.car = lookup(car_service, 'get_car', self.car_id)
+        booking.status = value(self.status[row])
+        booking.request_time = _from_micros(self.request_time[row])
+        booking.pickup_time = _from_micros(self.pickup_time[row])
+        booking.completion_time = _from_micros(self.completion_time[row])
+        booking.cancellation_time = _from_micros(self.cancellation_time[row])
+        booking.cancellation_reason = value(self.cancellation_reason[row])
+        booking.estimated_distance_km = self.estimated_distance_km[row]
+        booking.estimated_duration_minutes = self.estimated_duration_minutes[row]
+        booking.actual_distance_km = self.actual_distance_km[row]
+        booking.actual_duration_minutes = self.actual_duration_minutes[row]
+        booking.surge_multiplier = self.booking_surge_multiplier[row]
+        
+        if self.has_fare[row]:
+            fare = Fare.__new__(Fare)
+            fare.booking_id = booking_id
+            fare.base_fare = self.base_fare[row]
+            fare.distance_km = self.fare_distance_km[row]
+            fare.time_minutes = self.fare_time_minutes[row]
+            fare.discount = self.discount[row]
+            fare.surge_multiplier = self.surge_multiplier[row]
+            fare.total_amount = self.total_amount[row]
+            fare.payment_status = value(self.payment_status[row])
+            fare.payment_method = value(self.payment_method[row])
+            fare.timestamp = _from_micros(self.fare_timestamp[row])
+            fare.version = self.fare_version[row]
+            booking.fare = fare
+        
+        booking.version = self.version[row]
+        return booking
@@ -0,0 +1,119 @@
+import bisect
+import heapq
+import itertools
+
+from cab_booking.utils import StripedLock
+
+
+class BookingIndex:
+    """
+    Secondary index from an owner ID (passenger or driver) to booking IDs.
+    
+    Booking IDs are kept in sorted lists, both per owner and per
+    (owner, status), so lookups cost O(result size) and come back in
+    booking ID (i.e. creation) order. page() bisects to a cursor and
+    copies a single page, however long the owner's history. Updates and reads for one owner
+    are serialized on a per-owner lock stripe.
+    """
+    
+    def __init__(self, lock_stripes=64):
+        self._all = {}        # owner_id -> sorted list of booking IDs
+        self._by_status = {}  # (owner_id, status) -> sorted list of booking IDs
+        self._locks = StripedLock(lock_stripes)
+    
+    @staticmethod
+    def _insert(lists, key, booking_id):
+        ids = lists.get(key)
+        if ids is None:
+            lists[key] = [booking_id]
+        elif ids[-1] < booking_id:
+            ids.append(booking_id)
+        else:
+            pos = bisect.bisect_left(ids, booking_id)
+            if pos == len(ids) or ids[pos] != booking_id:
+                ids.insert(pos, booking_id)
+    
+    @staticmethod
+    def _delete(lists, key, booking_id):
+        ids = lists.get(key)
+        if not ids:
+            return
+        pos = bisect.bisect_left(ids, booking_id)
+        if pos < len(ids) and ids[pos] == booking_id:
+            del ids[pos]
+            if not ids:
+                del lists[key]
+    
+    def add(self, owner_id, booking_id, status):
+        """Index a booking under an owner with its current status"""
+        with self._locks(owner_id):
+            self._insert(self._all, owner_id, booking_id)
+            self._insert(self._by_status, (owner_id, status), booking_id)
+    
+    def remove(self, owner_id, booking_id, status):
+        """Drop a booking from an owner's index"""
+        with self._locks(owner_id):
+            self._delete(self._all, owner_id, booking_id)
+            self._delete(self._by_status, (owner_id, status), booking_id)
+    
+    def move(self, owner_id, booking_id, old_status, new_status):
+        """Record a status transition for an indexed booking"""
+        if old_status == new_status:
+            return
+        with self._locks(owner_id):
+            self._delete(self._by_status, (owner_id, old_status), booking_id)
+            self._insert(self._by_status, (owner_id, new_status), booking_id)
+    
+    def get(self, owner_id, status=None):
+        """
+        Get the booking IDs for an owner
+        
+        Args:
+            owner_id (str): The passenger or driver ID
+            status (str or iterable, optional): Only return bookings in this
+                                                status (or any of these statuses)
+                                                
+        Returns:
+            list: Booking IDs in ascending order
+        """
+        with self._locks(owner_id):
+            if status is None:
+                return list(self._all.get(owner_id, ()))
+            if isinstance(status, str):
+                return list(self._by_status.get((owner_id, status), ()))
+            return list(heapq.merge(*(self._by_status.get((owner_id, s), ()) for s in set(status))))
+    
+    def page(self, owner_id, status=None, after=None, limit=100, descending=False):
+        """
+        Get one page of the booking IDs for an owner, after a cursor
+        
+        Args:
+            owner_id (str): The passenger or driver ID
+            status (str or iterable, optional): As for get()
+            after (str, optional): Only return IDs that come after this
+                                   booking ID in the requested order
+            limit (int): Maximum number of IDs returned
+            descending (bool): Newest first instead of oldest first
+            
+        Returns:
+            list: Up to limit booking IDs, in the requested order
+        """
+        with self._locks(owner_id):
+            if status is None:
+                lists = [self._all.get(owner_id, ())]
+            elif isinstance(status, str):
+                lists = [self._by_status.get((owner_id, status), ())]
+            else:
+                lists = [self._by_status.get((owner_id, s), ()) for s in set(status)]
+            slices = [self._slice(ids, after, limit, descending) for ids in lists]
+        if len(slices) == 1:
+            return list(slices[0])
+        return list(itertools.islice(heapq.merge(*slices, reverse=descending), limit))
+    
+    @staticmethod
+    def _slice(ids, after, limit, descending):
+        if descending:
+            end = len(ids) if after is None else bisect.bisect_left(ids, after)
+            return ids[max(0, end - limit):end][::-1]
+        start = 0 if after is None else bisect.bisect_right(ids, after)
+        return ids[start:start + limit]
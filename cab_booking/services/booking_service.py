@@ -1,14 +1,75 @@
+import threading
+
 from cab_booking.models import Booking, Fare
+from cab_booking.storage import InMemoryRepository
+from cab_booking.utils import GridIndex, StripedLock, get_coordinates, id_sequence, solve_assignment
+from .analytics import TripAnalytics
+from .booking_archive import BookingArchive
+from .booking_index import BookingIndex
+from .rating_index import MAX_RATING, UNRATED_SCORE
 
 class BookingService:
     """Service class for handling booking-related business logic"""
     
-    def __init__(self, passenger_service=None, driver_service=None, car_service=None):
-        # In a real application, this would be a database connection
-        self.bookings = {}
+    def __init__(self, passenger_service=None, driver_service=None, car_service=None,
+                 repository=None, archive_terminal_bookings=None, lock_stripes=64,
+                 id_numbers=None, surge=None, route_estimator=None, analytics=None, metrics=None):
+        # Any Repository backend; defaults to a process-local dict
+        self.bookings = repository if repository is not None else InMemoryRepository()
+        self._booking_numbers = id_numbers if id_numbers is not None else id_sequence(self.bookings)
         self.passenger_service = passenger_service
         self.driver_service = driver_service
         self.car_service = car_service
+        
+        # Per-booking locks; a booking's lifecycle steps run one at a time
+        # while different bookings proceed in parallel
+        self._locks = StripedLock(lock_stripes)
+        
+        # Secondary indexes so per-passenger/per-driver lookups don't scan
+        # every booking
+        self.passenger_index = BookingIndex(lock_stripes)
+        self.driver_index = BookingIndex(lock_stripes)
+        
+        # Optional SurgePricing: counts demand per zone and quotes each
+        # new booking the multiplier of its pickup zone
+        self.surge = surge
+        
+        # Optional RouteEstimator for the estimated distance and duration
+        # of bookings between coordinates, instead of the client's figures
+        self.route_estimator = route_estimator
+        
+        # Optional TripAnalytics fed every completed and cancelled trip
+        self.analytics = analytics
+        
+        # Optional MetricsRegistry counting status transitions and the
+        # reasons bookings fail to get a driver
+        self.metrics = metrics
+        if metrics is not None:
+            self._transitions = metrics.counter(
+                'cab_booking_booking_transitions_total', 'Booking status transitions',
+                ('from_status', 'to_status'))
+            self._dispatch_failures = metrics.counter(
+                'cab_booking_dispatch_failures_total', 'Bookings that could not be given a driver, by reason',
+                ('reason',))
+        
+        # IDs of bookings still waiting for a driver, in request order
+        self.requested_bookings = {}
+        self._requested_lock = threading.Lock()
+        
+        # Completed and cancelled bookings move out of self.bookings into
+        # a compact columnar archive. Only the in-memory backend does this
+        # by default; a persistent repository already is the archive.
+        if archive_terminal_bookings is None:
+            archive_terminal_bookings = repository is None
+        self.archive_terminal_bookings = archive_terminal_bookings
+        self.archive = BookingArchive()
+        
+        # Rebuild the indexes and passenger histories of a persistent store;
+        # the histories only serve as a list of IDs (see get_recent_bookings)
+        for booking in self.bookings.values():
+            self._index_booking(booking)
+            if booking.passenger:
+                booking.passenger.add_to_booking_history(booking)
     
     def create_booking(self, booking_data):
         """
@@ -21,7 +82,7 @@ class BookingService:
         Returns:
             Booking: The created booking instance
         """
-        booking_id = f"BOOK-{len(self.bookings) + 1:08d}"
+        booking_id = f"BOOK-{next(self._booking_numbers):08d}"
         
         # Get the passenger
         passenger_id = booking_data.get('passenger_id')
@@ -40,17 +101,29 @@ class BookingService:
             to_location=booking_data.get('to_location')
         )
         
-        # Set estimated trip details
-        booking.set_estimated_trip_details(
-            booking_data.get('estimated_distance_km', 0),
-            booking_data.get('estimated_duration_minutes', 0)
-        )
+        # Set estimated trip details, from the route estimator when it
+        # can place both ends of the trip
+        estimate = None
+        if self.route_estimator is not None:
+            estimate = self.route_estimator.estimate(booking.from_location, booking.to_location)
+        if estimate is None:
+            estimate = (booking_data.get('estimated_distance_km', 0),
+                        booking_data.get('estimated_duration_minutes', 0))
+        booking.set_estimated_trip_details(*estimate)
+        
+        # Quote the pickup zone's surge, then count this request as demand
+        if self.surge is not None:
+            booking.surge_multiplier = self.surge.multiplier(booking.from_location)
+            self.surge.record_demand(booking.from_location)
         
         # Add the booking to the passenger's history
         passenger.add_to_booking_history(booking)
         
         # Store the booking
         self.bookings[booking_id] = booking
+        self._index_booking(booking)
+        if self.metrics is not None:
+            self._transitions.inc('NONE', booking.status)
         
         return booking
     
@@ -58,13 +131,20 @@ class BookingService:
         """
         Get a booking by ID
         
+        Archived (completed or cancelled) bookings are rebuilt from the
+        archive; changes to such a copy are not kept.
+        
         Args:
             booking_id (str): The booking ID
             
         Returns:
             Booking: The booking instance if found, None otherwise
         """
-        return self.bookings.get(booking_id)
+        booking = self.bookings.get(booking_id)
+        if booking is None and booking_id in self.archive:
+            booking = self.archive.get(booking_id, self.passenger_service,
+                                       self.driver_service, self.car_service)
+        return booking
     
     def assign_driver(self, booking_id, driver_id):
         """
@@ -77,27 +157,114 @@ class BookingService:
         Returns:
             Booking: The updated booking instance
         """
-        booking = self.get_booking(booking_id)
-        if not booking:
-            raise ValueError(f"Booking with ID {booking_id} not found")
-        
-        driver = None
-        if self.driver_service:
-            driver = self.driver_service.get_driver(driver_id)
+        with self._locks(booking_id):
+            booking = self.get_booking(booking_id)
+            if not booking:
+                raise ValueError(f"Booking with ID {booking_id} not found")
+            
+            driver = None
+            if self.driver_service:
+                driver = self.driver_service.get_driver(driver_id)
+            
+            if not driver:
+                self._count_dispatch_failure('driver_not_found')
+                raise ValueError(f"Driver with ID {driver_id} not found")
+            
+            if booking.status in ['COMPLETED', 'CANCELLED']:
+                raise ValueError(f"Booking {booking_id} is already {booking.status.lower()}")
+            
+            previous_driver = booking.driver
+            if previous_driver is not driver:
+                # Claim the driver atomically so two bookings can't both get them
+                if not self.driver_service.reserve_driver(driver_id):
+                    self._count_dispatch_failure('driver_unavailable')
+                    raise ValueError(f"Driver {driver_id} is not available")
+                if previous_driver is not None:
+                    self._release(previous_driver)
+            
+            self._apply_assignment(booking, driver)
+            
+            return booking
+    
+    def dispatch_batch(self, radius_km=5.0, max_candidates=8, rating_weight_km=0.0):
+        """
+        Match every REQUESTED booking to an available driver in one pass
         
-        if not driver:
-            raise ValueError(f"Driver with ID {driver_id} not found")
+        Candidate drivers for each booking are pruned to the
+        max_candidates nearest within radius_km of the pickup location,
+        then a global assignment minimising total pickup distance is
+        solved over all bookings at once. Bookings without pickup
+        coordinates, or with no driver in range, stay REQUESTED, as do
+        bookings whose match was taken by a concurrent request.
         
-        # Assign the driver
-        booking.assign_driver(driver)
+        With rating_weight_km set, each candidate's cost also grows by
+        that many km per star its recent rating falls short of 5 (read
+        from the driver service's rating index), so a better rated
+        driver wins over a slightly closer one.
         
-        # Update driver and car availability
-        if driver.assigned_car and self.car_service:
-            self.car_service.update_availability(driver.assigned_car.car_id, False)
+        Args:
+            radius_km (float): Maximum pickup distance considered
+            max_candidates (int): Maximum candidate drivers per booking
+            rating_weight_km (float): Extra cost in km per missing star
+            
+        Returns:
+            dict: Maps each assigned booking ID to its driver ID
+        """
+        bookings = []
+        with self._requested_lock:
+            requested = list(self.requested_bookings)
+        for booking_id in requested:
+            booking = self.bookings.get(booking_id)
+            if booking is None:
+                continue
+            coordinates = get_coordinates(booking.from_location)
+            if coordinates is not None:
+                bookings.append((booking, coordinates))
+            else:
+                self._count_dispatch_failure('no_coordinates')
+        
+        # Index every available driver by the position of their car
+        drivers = {}
+        grid = GridIndex()
         if self.driver_service:
-            self.driver_service.update_availability(driver_id, False)
-        
-        return booking
+            for driver in self.driver_service.drivers.values():
+                car = driver.assigned_car
+                if not (driver.is_available and car and car.is_available):
+                    continue
+                coordinates = get_coordinates(car.current_location)
+                if coordinates is not None:
+                    drivers[driver.driver_id] = driver
+                    grid.insert(driver.driver_id, *coordinates)
+        
+        if not bookings or not drivers:
+            self._count_dispatch_failure('no_driver_in_range', len(bookings))
+            return {}
+        
+        candidates = [
+            grid.nearest(lat, lon, k=max_candidates, radius_km=radius_km)
+            for _, (lat, lon) in bookings
+        ]
+        if rating_weight_km:
+            score = self.driver_service.ratings.score
+            candidates = [
+                [(distance + rating_weight_km * (MAX_RATING - score(driver_id, UNRATED_SCORE)), driver_id)
+                 for distance, driver_id in options]
+                for options in candidates
+            ]
+        solution = solve_assignment(candidates)
+        
+        pairs = [
+            (booking, drivers[driver_id])
+            for (booking, _), driver_id in zip(bookings, solution)
+            if driver_id is not None
+        ]
+        matched = len(pairs)
+        with self._locks.all():
+            pairs = self._apply_assignments(pairs)
+        self._count_dispatch_failure('no_driver_in_range', len(bookings) - matched)
+        self._count_dispatch_failure('driver_taken', matched - len(pairs))
+        
+        return {booking.booking_id: driver.driver_id for booking, driver in pairs}
     
     def start_trip(self, booking_id):
         """
@@ -109,15 +276,22 @@ class BookingService:
         Returns:
             Booking: The updated booking instance
         """
-        booking = self.get_booking(booking_id)
-        if not booking:
-            raise ValueError(f"Booking with ID {booking_id} not found")
-        
-        if not booking.driver:
-            raise ValueError(f"Booking {booking_id} does not have an assigned driver")
-        
-        booking.start_trip()
-        return booking
+        with self._locks(booking_id):
+            booking = self.get_booking(booking_id)
+            if not booking:
+                raise ValueError(f"Booking with ID {booking_id} not found")
+            
+            if not booking.driver:
+                raise ValueError(f"Booking {booking_id} does not have an assigned driver")
+            
+            if booking.status in ['COMPLETED', 'CANCELLED']:
+                raise ValueError(f"Booking {booking_id} is already {booking.status.lower()}")
+            
+            previous_status = booking.status
+            booking.start_trip()
+            self.bookings[booking_id] = booking
+            self._reindex_status(booking, previous_status)
+            return booking
     
     def complete_trip(self, booking_id, trip_data):
         """
@@ -130,38 +304,42 @@ class BookingService:
         Returns:
             Booking: The updated booking instance
         """
-        booking = self.get_booking(booking_id)
-        if not booking:
-            raise ValueError(f"Booking with ID {booking_id} not found")
-        
-        if booking.status != 'IN_PROGRESS':
-            raise ValueError(f"Booking {booking_id} is not in progress")
-        
-        # Complete the trip with actual metrics
-        booking.complete_trip(
-            trip_data.get('actual_distance_km', booking.estimated_distance_km),
-            trip_data.get('actual_duration_minutes', booking.estimated_duration_minutes)
-        )
-        
-        # Calculate the fare
-        fare = booking.calculate_fare(trip_data.get('base_fare', 50))
-        
-        # Apply surge pricing if provided
-        if 'surge_multiplier' in trip_data:
-            fare.apply_surge_pricing(trip_data['surge_multiplier'])
-        
-        # Apply discount if provided
-        if 'discount' in trip_data:
-            fare.apply_discount(trip_data['discount'])
-        
-        # Update driver and car availability
-        if booking.driver and self.driver_service:
-            self.driver_service.update_availability(booking.driver.driver_id, True)
+        with self._locks(booking_id):
+            booking = self.get_booking(booking_id)
+            if not booking:
+                raise ValueError(f"Booking with ID {booking_id} not found")
             
-        if booking.car and self.car_service:
-            self.car_service.update_availability(booking.car.car_id, True)
-        
-        return booking
+            if booking.status != 'IN_PROGRESS':
+                raise ValueError(f"Booking {booking_id} is not in progress")
+            
+            # Complete the trip with actual metrics
+            previous_status = booking.status
+            booking.complete_trip(
+                trip_data.get('actual_distance_km', booking.estimated_distance_km),
+                trip_data.get('actual_duration_minutes', booking.estimated_duration_minutes)
+            )
+            self._reindex_status(booking, previous_status)
+            
+            # Calculate the fare, at the surge quoted when the trip was requested
+            fare = booking.calculate_fare(trip_data.get('base_fare', 50))
+            
+            # Apply an explicit surge multiplier and discount if provided
+            if 'surge_multiplier' in trip_data or 'discount' in trip_data:
+                fare.apply_pricing(trip_data.get('surge_multiplier'), trip_data.get('discount'))
+            
+            # Update driver and car availability
+            if booking.driver and self.driver_service:
+                self.driver_service.update_availability(booking.driver.driver_id, True)
+            
+            if booking.car and self.car_service:
+                self.car_service.update_availability(booking.car.car_id, True)
+            
+            if self.analytics is not None:
+                self.analytics.record_trip(booking)
+            
+            self.bookings[booking_id] = booking
+            self._archive(booking)
+            return booking
     
     def cancel_trip(self, booking_id, reason=None):
         """
@@ -174,23 +352,31 @@ class BookingService:
         Returns:
             Booking: The updated booking instance
         """
-        booking = self.get_booking(booking_id)
-        if not booking:
-            raise ValueError(f"Booking with ID {booking_id} not found")
-        
-        if booking.status in ['COMPLETED', 'CANCELLED']:
-            raise ValueError(f"Booking {booking_id} cannot be cancelled")
-        
-        booking.cancel_trip(reason)
-        
-        # Update driver and car availability if a driver was assigned
-        if booking.driver and self.driver_service:
-            self.driver_service.update_availability(booking.driver.driver_id, True)
+        with self._locks(booking_id):
+            booking = self.get_booking(booking_id)
+            if not booking:
+                raise ValueError(f"Booking with ID {booking_id} not found")
             
-        if booking.car and self.car_service:
-            self.car_service.update_availability(booking.car.car_id, True)
-        
-        return booking
+            if booking.status in ['COMPLETED', 'CANCELLED']:
+                raise ValueError(f"Booking {booking_id} cannot be cancelled")
+            
+            previous_status = booking.status
+            booking.cancel_trip(reason)
+            self.bookings[booking_id] = booking
+            self._reindex_status(booking, previous_status)
+            
+            # Update driver and car availability if a driver was assigned
+            if booking.driver and self.driver_service:
+                self.driver_service.update_availability(booking.driver.driver_id, True)
+            
+            if booking.car and self.car_service:
+                self.car_service.update_availability(booking.car.car_id, True)
+            
+            if self.analytics is not None:
+                self.analytics.record_cancellation(booking)
+            
+            self._archive(booking)
+            return booking
     
     def get_trip_details(self, booking_id):
         """
@@ -208,36 +394,319 @@ class BookingService:
         
         return booking.get_trip_details()
     
-    def get_passenger_bookings(self, passenger_id):
+    def get_trip_rollups(self, resolution='hour', since=None, until=None, car_type=None, location=None,
+                         group_by=('time',)):
+        """
+        Merged trip rollups; see TripAnalytics.rollups
+        
+        Returns:
+            dict: (bucket start, car type, zone) -> rollup; empty without analytics
+        """
+        if self.analytics is None:
+            return {}
+        return self.analytics.rollups(resolution, since, until, car_type, location, group_by)
+    
+    def get_trip_stats(self, resolution='hour', since=None, until=None, car_type=None, location=None,
+                       group_by=('time',)):
+        """
+        Revenue and trip statistics per time bucket, car type and/or zone
+        
+        Args:
+            resolution (str): 'minute' or 'hour' buckets
+            since (datetime, optional): Only buckets starting at or after this
+            until (datetime, optional): Only buckets starting before this
+            car_type (str, optional): Only trips in cars of this type
+            location (optional): Only trips picked up in this location's zone
+            group_by (iterable): Any of 'time', 'car_type' and 'zone'
+            
+        Returns:
+            list: One dict per group, see TripAnalytics.report
+        """
+        rollups = self.get_trip_rollups(resolution, since, until, car_type, location, group_by)
+        return TripAnalytics.report(rollups, group_by)
+    
+    def get_route_stats(self):
+        """
+        Hit rate and latency of the route estimate cache
+        
+        Returns:
+            dict: RouteEstimator.stats(), or None without a route estimator
+        """
+        if self.route_estimator is None:
+            return None
+        return self.route_estimator.stats()
+    
+    def get_passenger_bookings(self, passenger_id, status=None):
         """
         Get all bookings for a passenger
         
         Args:
             passenger_id (str): The passenger ID
+            status (str or iterable, optional): Only return bookings in this status
             
         Returns:
             list: List of booking instances
         """
-        passenger_bookings = []
-        for booking in self.bookings.values():
-            if booking.passenger and booking.passenger.passenger_id == passenger_id:
-                passenger_bookings.append(booking)
-                
-        return passenger_bookings
+        return [self.get_booking(booking_id)
+                for booking_id in self.passenger_index.get(passenger_id, status)]
     
-    def get_driver_bookings(self, driver_id):
+    def get_driver_bookings(self, driver_id, status=None):
         """
         Get all bookings for a driver
         
         Args:
             driver_id (str): The driver ID
+            status (str or iterable, optional): Only return bookings in this status
             
         Returns:
             list: List of booking instances
         """
-        driver_bookings = []
-        for booking in self.bookings.values():
-            if booking.driver and booking.driver.driver_id == driver_id:
-                driver_bookings.append(booking)
-                
-        return driver_bookings
+        return [self.get_booking(booking_id)
+                for booking_id in self.driver_index.get(driver_id, status)]
+    
+    def get_recent_bookings(self, passenger_id, limit=5):
+        """
+        Get a passenger's most recent bookings
+        
+        Served from the passenger's in-memory window when it holds enough
+        bookings; otherwise the older ones are paged in through the index
+        (and rebuilt from the archive if they are completed or cancelled).
+        Either way each booking is looked up by ID, so one that has since
+        been archived, or evicted from a repository's cache and reloaded,
+        is returned as it is now rather than as the window last saw it.
+        
+        Args:
+            passenger_id (str): The passenger ID
+            limit (int): Maximum number of bookings returned
+            
+        Returns:
+            list: Up to limit booking instances, oldest first
+        """
+        passenger = self.passenger_service.get_passenger(passenger_id) if self.passenger_service else None
+        if passenger is not None and limit <= len(passenger.booking_history):
+            return [self.get_booking(booking.booking_id) for booking in passenger.get_recent_bookings(limit)]
+        return self.page_passenger_bookings(passenger_id, limit=limit, descending=True)[::-1]
+    
+    def page_passenger_bookings(self, passenger_id, status=None, after=None, limit=100,
+                                since=None, until=None, descending=False):
+        """
+        Get one page of a passenger's bookings, keyset-paginated by booking ID
+        
+        Args:
+            passenger_id (str): The passenger ID
+            status (str or iterable, optional): Only return bookings in this status
+            after (str, optional): Cursor; the last booking ID of the previous page
+            limit (int): Maximum number of bookings returned
+            since (datetime, optional): Only bookings requested at or after this time
+            until (datetime, optional): Only bookings requested before this time
+            descending (bool): Newest first instead of oldest first
+            
+        Returns:
+            list: Up to limit booking instances; fewer means there are no more
+        """
+        return self._page(self.passenger_index, passenger_id, status, after, limit,
+                          since, until, descending)
+    
+    def page_driver_bookings(self, driver_id, status=None, after=None, limit=100,
+                             since=None, until=None, descending=False):
+        """
+        Get one page of a driver's bookings, keyset-paginated by booking ID
+        
+        Args:
+            driver_id (str): The driver ID
+            status (str or iterable, optional): Only return bookings in this status
+            after (str, optional): Cursor; the last booking ID of the previous page
+            limit (int): Maximum number of bookings returned
+            since (datetime, optional): Only bookings requested at or after this time
+            until (datetime, optional): Only bookings requested before this time
+            descending (bool): Newest first instead of oldest first
+            
+        Returns:
+            list: Up to limit booking instances; fewer means there are no more
+        """
+        return self._page(self.driver_index, driver_id, status, after, limit,
+                          since, until, descending)
+    
+    def detach_booking(self, booking_id):
+        """
+        Remove a booking that is still waiting for a driver
+        
+        Used to hand the booking over to another BookingService (e.g. the
+        shard that owns the driver it was matched with).
+        
+        Args:
+            booking_id (str): The booking ID
+            
+        Returns:
+            Booking: The removed booking instance
+        """
+        with self._locks(booking_id):
+            booking = self.bookings.get(booking_id)
+            if not booking:
+                raise ValueError(f"Booking with ID {booking_id} not found")
+            
+            if booking.status != 'REQUESTED' or booking.driver is not None:
+                raise ValueError(f"Booking {booking_id} is no longer awaiting a driver")
+            
+            del self.bookings[booking_id]
+            self.passenger_index.remove(booking.passenger.passenger_id, booking_id, booking.status)
+            with self._requested_lock:
+                self.requested_bookings.pop(booking_id, None)
+            if booking in booking.passenger.booking_history:
+                booking.passenger.booking_history.remove(booking)
+                booking.passenger.version += 1
+            return booking
+    
+    def attach_booking(self, booking):
+        """
+        Take over a booking detached from another BookingService
+        
+        Args:
+            booking (Booking): The booking, referring to this service's passenger
+            
+        Returns:
+            Booking: The stored booking instance
+        """
+        with self._locks(booking.booking_id):
+            if booking.booking_id in self.bookings or booking.booking_id in self.archive:
+                raise ValueError(f"Booking {booking.booking_id} already exists")
+            
+            booking.passenger.add_to_booking_history(booking)
+            self.bookings[booking.booking_id] = booking
+            self._index_booking(booking)
+            return booking
+    
+    def _page(self, index, owner_id, status, after, limit, since, until, descending):
+        """Walk an owner's index from a cursor, in batches, until limit bookings match"""
+        bookings = []
+        while len(bookings) < limit:
+            booking_ids = index.page(owner_id, status, after, limit, descending)
+            for booking_id in booking_ids:
+                if since is not None or until is not None:
+                    # Check the time before rebuilding an archived booking
+                    requested = self._request_time(booking_id)
+                    if (requested is None or since is not None and requested < since
+                            or until is not None and requested >= until):
+                        continue
+                booking = self.get_booking(booking_id)
+                if booking is None:
+                    continue  # detached since the index was read
+                bookings.append(booking)
+                if len(bookings) == limit:
+                    break
+            if len(booking_ids) < limit:
+                break
+            after = booking_ids[-1]
+        return bookings
+    
+    def _request_time(self, booking_id):
+        booking = self.bookings.get(booking_id)
+        if booking is not None:
+            return booking.request_time
+        return self.archive.request_time_of(booking_id)
+    
+    def _index_booking(self, booking):
+        """Add a stored booking to the secondary indexes"""
+        if booking.passenger:
+            self.passenger_index.add(booking.passenger.passenger_id, booking.booking_id, booking.status)
+        if booking.driver:
+            self.driver_index.add(booking.driver.driver_id, booking.booking_id, booking.status)
+        if booking.status == 'REQUESTED':
+            with self._requested_lock:
+                self.requested_bookings[booking.booking_id] = None
+    
+    def _archive(self, booking):
+        """
+        Move a terminal booking from the live table into the archive
+        
+        Runs after the trip's driver, car and analytics are settled, so a
+        booking the archive can't store stays in the live table, where it
+        is still served, rather than failing a transition that is done.
+        """
+        if self.archive_terminal_bookings:
+            try:
+                self.archive.add(booking)
+            except (TypeError, ValueError, OverflowError):
+                return
+            del self.bookings[booking.booking_id]
+    
+    def _apply_assignment(self, booking, driver):
+        """Assign a claimed driver and update the indexes and availability to match"""
+        previous_driver = booking.driver
+        previous_status = booking.status
+        booking.assign_driver(driver)
+        self.bookings[booking.booking_id] = booking
+        
+        if previous_driver is not None:
+            self.driver_index.remove(previous_driver.driver_id, booking.booking_id, previous_status)
+        self.driver_index.add(driver.driver_id, booking.booking_id, booking.status)
+        self._reindex_status(booking, previous_status, skip_driver=True)
+        
+        # Take the driver's car off the market too
+        if driver.assigned_car and self.car_service:
+            self.car_service.update_availability(driver.assigned_car.car_id, False)
+    
+    def _release(self, driver):
+        """Make a driver and their car available again"""
+        if self.driver_service:
+            self.driver_service.update_availability(driver.driver_id, True)
+        if driver.assigned_car and self.car_service:
+            self.car_service.update_availability(driver.assigned_car.car_id, True)
+    
+    def _revert_assignment(self, booking, driver):
+        """Undo _apply_assignment for a booking that had no driver before"""
+        self.driver_index.remove(driver.driver_id, booking.booking_id, booking.status)
+        previous_status = booking.status
+        booking.driver = None
+        booking.car = None
+        booking.status = "REQUESTED"
+        booking.version += 1
+        self.bookings[booking.booking_id] = booking
+        self._reindex_status(booking, previous_status)
+        self._release(driver)
+    
+    def _apply_assignments(self, pairs):
+        """
+        Apply a batch of (booking, driver) assignments
+        
+        Pairs whose booking is no longer awaiting a driver, or whose driver
+        can't be claimed, are skipped; if applying fails part way, every
+        assignment made so far is undone.
+        
+        Returns:
+            list: The (booking, driver) pairs that were applied
+        """
+        applied = []
+        try:
+            for booking, driver in pairs:
+                booking = self.bookings.get(booking.booking_id)
+                if booking is None or booking.status != 'REQUESTED' or booking.driver is not None:
+                    continue
+                if not self.driver_service.reserve_driver(driver.driver_id):
+                    continue
+                self._apply_assignment(booking, driver)
+                applied.append((booking, driver))
+        except Exception:
+            for booking, driver in reversed(applied):
+                self._revert_assignment(booking, driver)
+            raise
+        return applied
+    
+    def _count_dispatch_failure(self, reason, count=1):
+        if self.metrics is not None and count:
+            self._dispatch_failures.inc(reason, amount=count)
+    
+    def _reindex_status(self, booking, previous_status, skip_driver=False):
+        """Move a booking between the status buckets of the secondary indexes"""
+        if self.metrics is not None and booking.status != previous_status:
+            self._transitions.inc(previous_status, booking.status)
+        self.passenger_index.move(booking.passenger.passenger_id, booking.booking_id,
+                                  previous_status, booking.status)
+        with self._requested_lock:
+            if booking.status == 'REQUESTED':
+                self.requested_bookings[booking.booking_id] = None
+            else:
+                self.requested_bookings.pop(booking.booking_id, None)
+        if booking.driver and not skip_driver:
+            self.driver_index.move(booking.driver.driver_id, booking.booking_id,
+                                   previous_status, booking.status)
@@ -1,11 +1,37 @@
+import heapq
+import threading
+
 from cab_booking.models import Car
+from cab_booking.storage import InMemoryRepository
+from cab_booking.utils import GridIndex, StripedLock, get_coordinates, id_sequence
 
 class CarService:
     """Service class for handling car-related business logic"""
     
-    def __init__(self):
-        # In a real application, this would be a database connection
-        self.cars = {}
+    def __init__(self, repository=None, cell_size_deg=0.01, lock_stripes=64, id_numbers=None, surge=None,
+                 ratings=None):
+        # Any Repository backend; defaults to a process-local dict
+        self.cars = repository if repository is not None else InMemoryRepository()
+        self._car_numbers = id_numbers if id_numbers is not None else id_sequence(self.cars)
+        
+        # Per-car locks so concurrent updates to one car serialize
+        self._locks = StripedLock(lock_stripes)
+        
+        # Spatial index of available cars with a known location, one grid
+        # per car type, kept current by the update_* methods below
+        self.cell_size_deg = cell_size_deg
+        self._available_index = {}
+        self._indexed_type = {}
+        self._index_lock = threading.RLock()
+        
+        # Optional SurgePricing told where the available cars are
+        self.surge = surge
+        
+        # Optional RatingIndex whose drivers are regrouped as their cars
+        # move between regions or change type
+        self.ratings = ratings
+        for car in self.cars.values():
+            self._reindex(car)
     
     def create_car(self, car_data):
         """
@@ -17,7 +43,7 @@ class CarService:
         Returns:
             Car: The created car instance
         """
-        car_id = f"CAR-{len(self.cars) + 1:08d}"
+        car_id = f"CAR-{next(self._car_numbers):08d}"
         
         car = Car(
             car_id=car_id,
@@ -35,6 +61,7 @@ class CarService:
                 car.add_feature(feature)
         
         self.cars[car_id] = car
+        self._reindex(car)
         return car
     
     def get_car(self, car_id):
@@ -60,31 +87,38 @@ class CarService:
         Returns:
             Car: The updated car instance if found, None otherwise
         """
-        car = self.get_car(car_id)
-        if not car:
-            return None
+        with self._locks(car_id):
+            car = self.get_car(car_id)
+            if not car:
+                return None
             
-        # Update car attributes if provided
-        if 'model' in update_data:
-            car.model = update_data['model']
-        if 'make' in update_data:
-            car.make = update_data['make']
-        if 'year' in update_data:
-            car.year = update_data['year']
-        if 'license_plate' in update_data:
-            car.license_plate = update_data['license_plate']
-        if 'capacity' in update_data:
-            car.capacity = update_data['capacity']
-        if 'car_type' in update_data:
-            car.car_type = update_data['car_type']
+            # Update car attributes if provided
+            if 'model' in update_data:
+                car.model = update_data['model']
+            if 'make' in update_data:
+                car.make = update_data['make']
+            if 'year' in update_data:
+                car.year = update_data['year']
+            if 'license_plate' in update_data:
+                car.license_plate = update_data['license_plate']
+            if 'capacity' in update_data:
+                car.capacity = update_data['capacity']
+            retyped = 'car_type' in update_data and update_data['car_type'] != car.car_type
+            if 'car_type' in update_data:
+                car.car_type = update_data['car_type']
             
-        # Add new features if provided
-        if 'features' in update_data:
-            car.features = []  # Reset features
-            for feature in update_data['features']:
-                car.add_feature(feature)
+            # Add new features if provided
+            if 'features' in update_data:
+                car.features = []  # Reset features
+                for feature in update_data['features']:
+                    car.add_feature(feature)
             
-        return car
+            car.version += 1
+            self.cars[car_id] = car
+            self._reindex(car)
+            if retyped and self.ratings is not None:
+                self.ratings.reindex_car(car)
+            return car
     
     def delete_car(self, car_id):
         """
@@ -96,10 +130,14 @@ class CarService:
         Returns:
             bool: True if deleted, False if not found
         """
-        if car_id in self.cars:
-            del self.cars[car_id]
-            return True
-        return False
+        with self._locks(car_id):
+            if car_id in self.cars:
+                del self.cars[car_id]
+                self._unindex(car_id)
+                if self.surge is not None:
+                    self.surge.update_supply(car_id, None)
+                return True
+            return False
     
     def update_availability(self, car_id, is_available):
         """
@@ -112,12 +150,15 @@ class CarService:
         Returns:
             Car: The updated car instance if found, None otherwise
         """
-        car = self.get_car(car_id)
-        if not car:
-            return None
+        with self._locks(car_id):
+            car = self.get_car(car_id)
+            if not car:
+                return None
             
-        car.set_availability(is_available)
-        return car
+            car.set_availability(is_available)
+            self.cars[car_id] = car
+            self._reindex(car)
+            return car
     
     def update_location(self, car_id, location):
         """
@@ -130,12 +171,57 @@ class CarService:
         Returns:
             Car: The updated car instance if found, None otherwise
         """
-        car = self.get_car(car_id)
-        if not car:
-            return None
+        with self._locks(car_id):
+            car = self.get_car(car_id)
+            if not car:
+                return None
             
-        car.update_location(location)
-        return car
+            region = self._rating_region(car)
+            car.update_location(location)
+            self.cars[car_id] = car
+            self._reindex(car)
+            if region != self._rating_region(car):
+                self.ratings.reindex_car(car)
+            return car
+    
+    def apply_locations(self, locations, chunk_size=100):
+        """
+        Move many cars at once, e.g. one tick of coalesced telemetry
+        
+        Each car is updated under its own lock, and the spatial index is
+        brought up to date chunk_size cars at a time, so nearest-car
+        queries wait for at most one chunk rather than the whole batch.
+        
+        Args:
+            locations (dict): Maps car IDs to location data
+            chunk_size (int): Cars reindexed per hold of the index lock
+        
+        Returns:
+            int: Number of cars moved; unknown car IDs are skipped
+        """
+        moved = 0
+        items = list(locations.items())
+        for start in range(0, len(items), chunk_size):
+            cars = []
+            regrouped = []
+            for car_id, location in items[start:start + chunk_size]:
+                with self._locks(car_id):
+                    car = self.get_car(car_id)
+                    if not car:
+                        continue
+                    region = self._rating_region(car)
+                    car.update_location(location)
+                    self.cars[car_id] = car
+                    cars.append(car)
+                    if region != self._rating_region(car):
+                        regrouped.append(car)
+            with self._index_lock:
+                for car in cars:
+                    self._reindex(car)
+            for car in regrouped:
+                self.ratings.reindex_car(car)
+            moved += len(cars)
+        return moved
     
     def get_available_cars(self, car_type=None):
         """
@@ -153,3 +239,70 @@ class CarService:
             available_cars = [car for car in available_cars if car.car_type == car_type]
             
         return available_cars
+    
+    def find_nearest_available(self, location, car_type=None, k=1, radius_km=None):
+        """
+        Find the nearest available cars to a location using the spatial index
+        
+        Args:
+            location (dict): The location data (e.g., latitude, longitude)
+            car_type (str, optional): The car type to filter by
+            k (int): Maximum number of cars to return
+            radius_km (float, optional): Only consider cars within this distance
+            
+        Returns:
+            list: (car, distance_km) tuples, nearest first
+        """
+        coordinates = get_coordinates(location)
+        if coordinates is None:
+            raise ValueError(f"Location {location!r} has no latitude/longitude")
+        lat, lon = coordinates
+        
+        if car_type is not None:
+            grids = [self._available_index[car_type]] if car_type in self._available_index else []
+        else:
+            grids = list(self._available_index.values())
+        
+        matches = []
+        with self._index_lock:
+            for grid in grids:
+                matches.extend(grid.nearest(lat, lon, k=k, radius_km=radius_km))
+        if len(grids) > 1:
+            matches = heapq.nsmallest(k, matches)
+        
+        return [(self.cars[car_id], distance) for distance, car_id in matches]
+    
+    def _rating_region(self, car):
+        """
+        The rating index region of a car, or None without a rating index
+        
+        Drivers are only regrouped when this changes, so most location
+        updates never touch the rating index's lock.
+        """
+        if self.ratings is None:
+            return None
+        return self.ratings.region(car.current_location)
+    
+    def _unindex(self, car_id):
+        with self._index_lock:
+            if car_id in self._indexed_type:
+                car_type = self._indexed_type.pop(car_id)
+                self._available_index[car_type].remove(car_id)
+    
+    def _reindex(self, car):
+        """Bring the spatial index in line with a car's availability, type and location"""
+        coordinates = get_coordinates(car.current_location)
+        if self.surge is not None:
+            self.surge.update_supply(car.car_id, coordinates if car.is_available else None)
+        if not car.is_available or coordinates is None:
+            self._unindex(car.car_id)
+            return
+        
+        with self._index_lock:
+            if self._indexed_type.get(car.car_id, car.car_type) != car.car_type:
+                self._unindex(car.car_id)
+            grid = self._available_index.get(car.car_type)
+            if grid is None:
+                grid = self._available_index[car.car_type] = GridIndex(self.cell_size_deg)
+            grid.insert(car.car_id, *coordinates)
+            self._indexed_type[car.car_id] = car.car_type
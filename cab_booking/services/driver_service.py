@@ -1,11 +1,24 @@
 from cab_booking.models import Driver
+from cab_booking.storage import InMemoryRepository
+from cab_booking.utils import StripedLock, id_sequence
+from .rating_index import RatingIndex
 
 class DriverService:
     """Service class for handling driver-related business logic"""
     
-    def __init__(self):
-        # In a real application, this would be a database connection
-        self.drivers = {}
+    def __init__(self, repository=None, lock_stripes=64, id_numbers=None, rating_index=None):
+        # Any Repository backend; defaults to a process-local dict
+        self.drivers = repository if repository is not None else InMemoryRepository()
+        self._driver_numbers = id_numbers if id_numbers is not None else id_sequence(self.drivers)
+        
+        # Per-driver locks so concurrent updates to one driver serialize
+        self._locks = StripedLock(lock_stripes)
+        
+        # Recent ratings ranked per region and car type, so leaderboards
+        # and threshold queries don't scan every driver
+        self.ratings = rating_index if rating_index is not None else RatingIndex()
+        for driver in self.drivers.values():
+            self.ratings.seed(driver)
     
     def create_driver(self, driver_data):
         """
@@ -17,7 +30,7 @@ class DriverService:
         Returns:
             Driver: The created driver instance
         """
-        driver_id = f"DRIV-{len(self.drivers) + 1:08d}"
+        driver_id = f"DRIV-{next(self._driver_numbers):08d}"
         
         driver = Driver(
             driver_id=driver_id,
@@ -53,20 +66,23 @@ class DriverService:
         Returns:
             Driver: The updated driver instance if found, None otherwise
         """
-        driver = self.get_driver(driver_id)
-        if not driver:
-            return None
+        with self._locks(driver_id):
+            driver = self.get_driver(driver_id)
+            if not driver:
+                return None
             
-        if 'name' in update_data:
-            driver.name = update_data['name']
-        if 'phone' in update_data:
-            driver.phone = update_data['phone']
-        if 'email' in update_data:
-            driver.email = update_data['email']
-        if 'license_number' in update_data:
-            driver.license_number = update_data['license_number']
+            if 'name' in update_data:
+                driver.name = update_data['name']
+            if 'phone' in update_data:
+                driver.phone = update_data['phone']
+            if 'email' in update_data:
+                driver.email = update_data['email']
+            if 'license_number' in update_data:
+                driver.license_number = update_data['license_number']
             
-        return driver
+            driver.version += 1
+            self.drivers[driver_id] = driver
+            return driver
     
     def delete_driver(self, driver_id):
         """
@@ -80,6 +96,7 @@ class DriverService:
         """
         if driver_id in self.drivers:
             del self.drivers[driver_id]
+            self.ratings.remove(driver_id)
             return True
         return False
     
@@ -94,12 +111,15 @@ class DriverService:
         Returns:
             Driver: The updated driver instance if found, None otherwise
         """
-        driver = self.get_driver(driver_id)
-        if not driver:
-            return None
+        with self._locks(driver_id):
+            driver = self.get_driver(driver_id)
+            if not driver:
+                return None
             
-        driver.assign_car(car)
-        return driver
+            driver.assign_car(car)
+            self.ratings.reindex(driver)
+            self.drivers[driver_id] = driver
+            return driver
     
     def update_availability(self, driver_id, is_available):
         """
@@ -112,17 +132,22 @@ class DriverService:
         Returns:
             Driver: The updated driver instance if found, None otherwise
         """
-        driver = self.get_driver(driver_id)
-        if not driver:
-            return None
+        with self._locks(driver_id):
+            driver = self.get_driver(driver_id)
+            if not driver:
+                return None
             
-        driver.set_availability(is_available)
-        return driver
+            driver.set_availability(is_available)
+            self.drivers[driver_id] = driver
+            return driver
     
     def update_rating(self, driver_id, rating):
         """
         Update a driver's rating
         
+        Updates both the lifetime mean on the driver and their window
+        score in self.ratings.
+        
         Args:
             driver_id (str): The driver ID
             rating (float): The rating value (1-5)
@@ -130,9 +155,92 @@ class DriverService:
         Returns:
             Driver: The updated driver instance if found, None otherwise
         """
-        driver = self.get_driver(driver_id)
-        if not driver:
+        with self._locks(driver_id):
+            driver = self.get_driver(driver_id)
+            if not driver:
+                return None
+            
+            driver.update_rating(rating)
+            self.ratings.add(driver, rating)
+            self.drivers[driver_id] = driver
+            return driver
+    
+    def top_rated_drivers(self, k=10, location=None, car_type=None, available_only=False):
+        """
+        Get the best rated drivers by recent ratings
+        
+        Args:
+            k (int): Maximum number of drivers
+            location (optional): Only drivers in the region of this location
+            car_type (str, optional): Only drivers whose car is of this type
+            available_only (bool): Only drivers that are available now
+            
+        Returns:
+            list: (driver, window score) tuples, best first
+        """
+        return self._rated(self.ratings.top(k, location, car_type, self._filter(available_only)))
+    
+    def lowest_rated_drivers(self, k=10, location=None, car_type=None, available_only=False):
+        """
+        Get the worst rated drivers by recent ratings
+        
+        Args:
+            k (int): Maximum number of drivers
+            location (optional): Only drivers in the region of this location
+            car_type (str, optional): Only drivers whose car is of this type
+            available_only (bool): Only drivers that are available now
+            
+        Returns:
+            list: (driver, window score) tuples, worst first
+        """
+        return self._rated(self.ratings.top(k, location, car_type, self._filter(available_only), lowest=True))
+    
+    def drivers_rated_below(self, threshold, location=None, car_type=None):
+        """
+        Get every driver whose recent ratings average below a threshold
+        
+        Args:
+            threshold (float): The score threshold
+            location (optional): Only drivers in the region of this location
+            car_type (str, optional): Only drivers whose car is of this type
+            
+        Returns:
+            list: (driver, window score) tuples, worst first
+        """
+        return self._rated(self.ratings.below(threshold, location, car_type))
+    
+    def _filter(self, available_only):
+        if not available_only:
             return None
+        
+        def available(driver_id):
+            driver = self.drivers.get(driver_id)
+            return driver is not None and driver.is_available
+        return available
+    
+    def _rated(self, entries):
+        results = []
+        for score, driver_id in entries:
+            driver = self.drivers.get(driver_id)
+            if driver is not None:
+                results.append((driver, score))
+        return results
+    
+    def reserve_driver(self, driver_id):
+        """
+        Atomically take an available driver out of the available pool
+        
+        Args:
+            driver_id (str): The driver ID
             
-        driver.update_rating(rating)
-        return driver
+        Returns:
+            Driver: The driver instance if it was available, None otherwise
+        """
+        with self._locks(driver_id):
+            driver = self.get_driver(driver_id)
+            if not driver or not driver.is_available:
+                return None
+            
+            driver.set_availability(False)
+            self.drivers[driver_id] = driver
+            return driver
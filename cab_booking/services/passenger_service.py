@@ -1,11 +1,17 @@
 from cab_booking.models import Passenger
+from cab_booking.storage import InMemoryRepository
+from cab_booking.utils import StripedLock, id_sequence
 
 class PassengerService:
     """Service class for handling passenger-related business logic"""
     
-    def __init__(self):
-        # In a real application, this would be a database connection
-        self.passengers = {}
+    def __init__(self, repository=None, lock_stripes=64, id_numbers=None):
+        # Any Repository backend; defaults to a process-local dict
+        self.passengers = repository if repository is not None else InMemoryRepository()
+        self._passenger_numbers = id_numbers if id_numbers is not None else id_sequence(self.passengers)
+        
+        # Per-passenger locks so concurrent updates to one passenger serialize
+        self._locks = StripedLock(lock_stripes)
     
     def create_passenger(self, passenger_data):
         """
@@ -17,7 +23,7 @@ class PassengerService:
         Returns:
             Passenger: The created passenger instance
         """
-        passenger_id = f"PASS-{len(self.passengers) + 1:08d}"
+        passenger_id = f"PASS-{next(self._passenger_numbers):08d}"
         
         passenger = Passenger(
             passenger_id=passenger_id,
@@ -52,18 +58,21 @@ class PassengerService:
         Returns:
             Passenger: The updated passenger instance if found, None otherwise
         """
-        passenger = self.get_passenger(passenger_id)
-        if not passenger:
-            return None
+        with self._locks(passenger_id):
+            passenger = self.get_passenger(passenger_id)
+            if not passenger:
+                return None
             
-        if 'name' in update_data:
-            passenger.name = update_data['name']
-        if 'phone' in update_data:
-            passenger.phone = update_data['phone']
-        if 'email' in update_data:
-            passenger.email = update_data['email']
+            if 'name' in update_data:
+                passenger.name = update_data['name']
+            if 'phone' in update_data:
+                passenger.phone = update_data['phone']
+            if 'email' in update_data:
+                passenger.email = update_data['email']
             
-        return passenger
+            passenger.version += 1
+            self.passengers[passenger_id] = passenger
+            return passenger
     
     def delete_passenger(self, passenger_id):
         """
@@ -0,0 +1,342 @@
+import bisect
+import collections
+import datetime
+import heapq
+import itertools
+import math
+import threading
+
+from cab_booking.utils import get_coordinates
+
+MAX_RATING = 5.0
+
+# Score assumed for a driver with no ratings yet, e.g. when dispatch
+# weighs ratings against pickup distance
+UNRATED_SCORE = 4.0
+
+
+class _Window:
+    """One driver's recent ratings and where they rank"""
+    
+    __slots__ = ('ratings', 'total', 'score', 'group', 'car_id')
+    
+    def __init__(self, size):
+        self.ratings = collections.deque(maxlen=size)  # (time, rating), oldest first
+        self.total = 0.0
+        self.score = None
+        self.group = None
+        self.car_id = None
+
+
+class _Ranking:
+    """
+    A sorted sequence of (-score, driver_id) kept in chunks
+    
+    Inserts and deletes bisect the chunk maxima, then the chunk, and
+    shift at most one chunk's entries, so they stay cheap however many
+    drivers share a region and car type.
+    """
+    
+    CHUNK = 512
+    
+    __slots__ = ('_chunks', '_maxes')
+    
+    def __init__(self):
+        self._chunks = []
+        self._maxes = []  # last (largest) key of each chunk
+    
+    def __bool__(self):
+        return bool(self._chunks)
+    
+    def add(self, key):
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            return
+        i = min(bisect.bisect_left(self._maxes, key), len(self._maxes) - 1)
+        chunk = self._chunks[i]
+        bisect.insort(chunk, key)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * self.CHUNK:
+            self._chunks[i:i + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+            self._maxes[i:i + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+    
+    def remove(self, key):
+        i = bisect.bisect_left(self._maxes, key)
+        chunk = self._chunks[i]
+        del chunk[bisect.bisect_left(chunk, key)]
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+    
+    def head(self, n):
+        """The n smallest keys, ascending"""
+        return list(itertools.islice(itertools.chain.from_iterable(self._chunks), n))
+    
+    def tail(self, n):
+        """The n largest keys, descending"""
+        return list(itertools.islice(itertools.chain.from_iterable(map(reversed, reversed(self._chunks))), n))
+    
+    def above(self, key):
+        """Every key greater than key, descending"""
+        i = bisect.bisect_right(self._maxes, key)
+        if i == len(self._chunks):
+            return []
+        first = self._chunks[i]
+        results = [k for chunk in reversed(self._chunks[i + 1:]) for k in reversed(chunk)]
+        results.extend(reversed(first[bisect.bisect_right(first, key):]))
+        return results
+
+
+class RatingIndex:
+    """
+    Sliding-window driver ratings, ranked per region and car type.
+    
+    A driver's score is the mean of their last window_trips ratings that
+    are at most window_days old, kept up to date in O(1) as ratings enter
+    and leave the window (ages are checked when a rating arrives, and by
+    every query, which drops the ratings that have aged out since). Scores
+    are ranked in one sorted sequence per (region, car type), where a region
+    is a region_size_deg grid square (about a city at the default 0.25
+    degrees), so top-K, bottom-K and threshold queries read the ends of
+    a few sequences rather than scanning every driver. A driver is grouped by their
+    car's type and location as of their last rating, reindex() or
+    reindex_car(); CarService calls the latter as cars move.
+    
+    Args:
+        window_trips (int): Most recent ratings kept per driver
+        window_days (float): Age at which a rating leaves the window
+        region_size_deg (float): Side of a region in degrees
+    """
+    
+    def __init__(self, window_trips=100, window_days=30, region_size_deg=0.25):
+        self.window_trips = window_trips
+        self.window_age = datetime.timedelta(days=window_days)
+        self.region_size_deg = region_size_deg
+        self._windows = {}  # driver_id -> _Window
+        self._groups = {}   # (region, car_type) -> _Ranking of (-score, driver_id)
+        self._car_drivers = {}  # car_id -> driver_id, for reindex_car()
+        self._expiries = []  # heap of (rating time, driver_id), one per rating added
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._windows)
+    
+    def region(self, location):
+        """Grid position of the region containing a location, or None"""
+        coordinates = get_coordinates(location)
+        if coordinates is None:
+            return None
+        return (math.floor(coordinates[0] / self.region_size_deg),
+                math.floor(coordinates[1] / self.region_size_deg))
+    
+    def _group_of(self, driver):
+        car = driver.assigned_car
+        if car is None:
+            return (None, None)
+        return (self.region(car.current_location), car.car_type)
+    
+    def _track_car(self, driver_id, window, driver):
+        """Remember which car a driver drives, so the car's moves regroup them"""
+        car_id = driver.assigned_car.car_id if driver.assigned_car is not None else None
+        if window.car_id == car_id:
+            return
+        if window.car_id is not None and self._car_drivers.get(window.car_id) == driver_id:
+            del self._car_drivers[window.car_id]
+        window.car_id = car_id
+        if car_id is not None:
+            self._car_drivers[car_id] = driver_id
+    
+    def _rank(self, driver_id, window, score, group):
+        """Move a driver's entry to a new score and group"""
+        if window.score is not None:
+            ranking = self._groups[window.group]
+            ranking.remove((-window.score, driver_id))
+            if not ranking:
+                del self._groups[window.group]
+        window.score = score
+        window.group = group
+        if score is not None:
+            ranking = self._groups.get(group)
+            if ranking is None:
+                ranking = self._groups[group] = _Ranking()
+            ranking.add((-score, driver_id))
+    
+    def seed(self, driver):
+        """
+        Rank a driver by their lifetime rating until window ratings arrive
+        
+        Used for drivers loaded from storage, whose individual ratings
+        were not kept.
+        """
+        if not driver.total_ratings:
+            return
+        with self._lock:
+            if driver.driver_id not in self._windows:
+                window = self._windows[driver.driver_id] = _Window(self.window_trips)
+                self._track_car(driver.driver_id, window, driver)
+                self._rank(driver.driver_id, window, driver.rating, self._group_of(driver))
+    
+    def add(self, driver, rating, when=None):
+        """
+        Record a rating for a driver
+        
+        Args:
+            driver (Driver): The rated driver
+            rating (float): The rating value (1-5)
+            when (datetime, optional): When it was given; defaults to now
+        
+        Returns:
+            float: The driver's new window score
+        """
+        when = when or datetime.datetime.now()
+        with self._lock:
+            window = self._windows.get(driver.driver_id)
+            if window is None:
+                window = self._windows[driver.driver_id] = _Window(self.window_trips)
+            ratings = window.ratings
+            
+            cutoff = when - self.window_age
+            while ratings and ratings[0][0] < cutoff:
+                window.total -= ratings.popleft()[1]
+            if len(ratings) == ratings.maxlen:
+                window.total -= ratings[0][1]  # pushed out by the append below
+            ratings.append((when, rating))
+            window.total += rating
+            heapq.heappush(self._expiries, (when, driver.driver_id))
+            
+            score = window.total / len(ratings)
+            self._track_car(driver.driver_id, window, driver)
+            self._rank(driver.driver_id, window, score, self._group_of(driver))
+            return score
+    
+    def reindex(self, driver):
+        """Regroup a driver after a change of car (or of their car's region)"""
+        with self._lock:
+            window = self._windows.get(driver.driver_id)
+            if window is not None:
+                self._track_car(driver.driver_id, window, driver)
+                group = self._group_of(driver)
+                if group != window.group:
+                    self._rank(driver.driver_id, window, window.score, group)
+    
+    def reindex_car(self, car):
+        """Regroup the driver of a car that moved or changed type"""
+        if car.car_id not in self._car_drivers:
+            return  # no rated driver, like most cars; a dict lookup needs no lock
+        with self._lock:
+            driver_id = self._car_drivers.get(car.car_id)
+            window = self._windows.get(driver_id) if driver_id is not None else None
+            if window is not None and window.score is not None:
+                group = (self.region(car.current_location), car.car_type)
+                if group != window.group:
+                    self._rank(driver_id, window, window.score, group)
+    
+    def remove(self, driver_id):
+        """Drop a driver from the index"""
+        with self._lock:
+            window = self._windows.get(driver_id)
+            if window is not None:
+                self._forget(driver_id, window)
+    
+    def _forget(self, driver_id, window):
+        del self._windows[driver_id]
+        self._rank(driver_id, window, None, None)
+        if window.car_id is not None and self._car_drivers.get(window.car_id) == driver_id:
+            del self._car_drivers[window.car_id]
+    
+    def _expire(self):
+        """Drop ratings that have aged out of the window since; the lock must be held"""
+        expiries = self._expiries
+        if not expiries:
+            return
+        cutoff = datetime.datetime.now() - self.window_age
+        while expiries and expiries[0][0] < cutoff:
+            _, driver_id = heapq.heappop(expiries)
+            window = self._windows.get(driver_id)
+            if window is None:
+                continue
+            ratings = window.ratings
+            if all(when >= cutoff for when, _ in ratings):
+                continue  # already pushed out by newer ratings
+            # Ratings may be added with past times, so the expired ones
+            # aren't necessarily at the front
+            kept = [(when, rating) for when, rating in ratings if when >= cutoff]
+            ratings.clear()
+            ratings.extend(kept)
+            window.total = sum(rating for _, rating in kept)
+            if ratings:
+                self._rank(driver_id, window, window.total / len(ratings), window.group)
+            else:
+                # Nothing recent left; the driver is unrated again
+                self._forget(driver_id, window)
+    
+    def score(self, driver_id, default=None):
+        """A driver's window score, or default if they have no ratings"""
+        with self._lock:
+            self._expire()
+            window = self._windows.get(driver_id)
+            return window.score if window is not None else default
+    
+    def _groups_matching(self, region, car_type):
+        return [ranking for (group_region, group_car_type), ranking in self._groups.items()
+                if (region is None or group_region == region)
+                and (car_type is None or group_car_type == car_type)]
+    
+    def top(self, k, location=None, car_type=None, predicate=None, lowest=False):
+        """
+        The k best (or worst) rated drivers
+        
+        Only the head of each group's list is copied; if the predicate
+        rejects too many of those, a head twice as long is taken.
+        
+        Args:
+            k (int): Maximum number of results
+            location (optional): Only drivers in the region of this location
+            car_type (str, optional): Only drivers whose car is of this type
+            predicate (callable, optional): Only driver IDs for which
+                                            predicate(driver_id) is true
+            lowest (bool): Worst rated first instead of best rated first
+        
+        Returns:
+            list: (score, driver_id) tuples
+        """
+        region = self.region(location) if location is not None else None
+        if k <= 0 or location is not None and region is None:
+            return []
+        size = k
+        while True:
+            with self._lock:
+                self._expire()
+                heads = [ranking.tail(size) if lowest else ranking.head(size)
+                         for ranking in self._groups_matching(region, car_type)]
+            ranked = ((-neg_score, driver_id) for neg_score, driver_id in heapq.merge(*heads, reverse=lowest))
+            if predicate is not None:
+                ranked = (entry for entry in ranked if predicate(entry[1]))
+            results = list(itertools.islice(ranked, k))
+            if len(results) == k or all(len(head) < size for head in heads):
+                return results
+            size *= 2
+    
+    def below(self, threshold, location=None, car_type=None):
+        """
+        Every driver whose score is below a threshold, worst first
+        
+        Args:
+            threshold (float): The score threshold
+            location (optional): Only drivers in the region of this location
+            car_type (str, optional): Only drivers whose car is of this type
+        
+        Returns:
+            list: (score, driver_id) tuples
+        """
+        region = self.region(location) if location is not None else None
+        if location is not None and region is None:
+            return []
+        with self._lock:
+            self._expire()
+            lists = [ranking.above((-threshold, '\uffff'))
+                     for ranking in self._groups_matching(region, car_type)]
+        return [(-neg_score, driver_id) for neg_score, driver_id in heapq.merge(*lists, reverse=True)]
@@ -0,0 +1,191 @@
+import collections
+import math
+import threading
+import time
+
+from cab_booking.utils import get_coordinates, haversine_km
+
+# Latencies kept for the percentiles in RouteEstimator.stats()
+LATENCY_SAMPLES = 1024
+
+
+def straight_line_route(origin, destination, detour=1.3, speed_kmh=25.0):
+    """
+    Estimate a trip from the great-circle distance
+    
+    A stand-in for a routing engine: the road distance is taken as the
+    straight-line distance times detour, driven at speed_kmh.
+    
+    Args:
+        origin (tuple): (lat, lon) of the pickup
+        destination (tuple): (lat, lon) of the drop-off
+        detour (float): Road distance per straight-line kilometre
+        speed_kmh (float): Average driving speed
+    
+    Returns:
+        tuple: (distance_km, duration_minutes)
+    """
+    distance_km = haversine_km(*origin, *destination) * detour
+    return distance_km, distance_km / speed_kmh * 60
+
+
+class _Pending:
+    """A route being computed, for callers that miss on the same key meanwhile"""
+    
+    __slots__ = ('done', 'result', 'error')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RouteEstimator:
+    """
+    Trip distance and duration estimates, memoized per quantized route.
+    
+    route(origin, destination) is called with (lat, lon) pairs and
+    returns (distance_km, duration_minutes); it can query a local road
+    graph or a routing service, and defaults to straight_line_route.
+    Locations are snapped to a precision_deg grid (about 100 m at the
+    default 0.001 degrees) and the route is computed between the grid
+    points, so every request between the same two spots (an airport, a
+    station) shares one cache entry.
+    
+    Entries live for ttl_seconds, so traffic-dependent estimates are
+    refreshed, and the least recently used entry is dropped once
+    max_entries are held. A miss is computed outside the cache lock;
+    other callers missing on the same key meanwhile wait for that one
+    computation instead of starting their own.
+    
+    Args:
+        route (callable, optional): Computes (distance_km, duration_minutes)
+        max_entries (int): Most routes cached
+        ttl_seconds (float): How long an estimate is reused
+        precision_deg (float): Grid the endpoints are snapped to
+    """
+    
+    def __init__(self, route=None, max_entries=100000, ttl_seconds=600, precision_deg=0.001):
+        self.route = route or straight_line_route
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.precision_deg = precision_deg
+        self._entries = collections.OrderedDict()  # key -> (expires, estimate), oldest use first
+        self._pending = {}  # key -> _Pending, for routes being computed
+        self._lock = threading.Lock()
+        self._hit_seconds = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._miss_seconds = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evicted = 0
+        self.errors = 0
+    
+    def key(self, from_location, to_location):
+        """The quantized (origin, destination) cache key, or None without coordinates"""
+        origin = get_coordinates(from_location)
+        destination = get_coordinates(to_location)
+        if origin is None or destination is None:
+            return None
+        return (self._snap(origin), self._snap(destination))
+    
+    def _snap(self, coordinates):
+        return (round(coordinates[0] / self.precision_deg), round(coordinates[1] / self.precision_deg))
+    
+    def estimate(self, from_location, to_location):
+        """
+        Estimate a trip between two locations
+        
+        Args:
+            from_location: The pickup; any location accepted by get_coordinates
+            to_location: The drop-off
+        
+        Returns:
+            tuple: (distance_km, duration_minutes), or None if either
+                   location has no coordinates
+        """
+        key = self.key(from_location, to_location)
+        if key is None:
+            return None
+        start = time.perf_counter()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self._hit_seconds.append(time.perf_counter() - start)
+                    return entry[1]
+                del self._entries[key]
+                self.expired += 1
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if leader:
+            self._compute(key, pending)
+        else:
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        self._miss_seconds.append(time.perf_counter() - start)
+        return pending.result
+    
+    def _compute(self, key, pending):
+        """Run the route for a key and hand the result to everyone waiting on it"""
+        try:
+            origin, destination = ((lat * self.precision_deg, lon * self.precision_deg) for lat, lon in key)
+            pending.result = tuple(self.route(origin, destination))
+        except Exception as error:
+            pending.error = error
+        with self._lock:
+            del self._pending[key]
+            if pending.error is None:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, pending.result)
+            else:
+                self.errors += 1
+        pending.done.set()
+    
+    def clear(self):
+        """Drop every cached estimate"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        """Cache counters, hit rate and lookup latencies in milliseconds"""
+        with self._lock:
+            hit_seconds = sorted(self._hit_seconds)
+            miss_seconds = sorted(self._miss_seconds)
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'errors': self.errors,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'hit_ms_p50': _percentile(hit_seconds, 0.5),
+                'hit_ms_p99': _percentile(hit_seconds, 0.99),
+                'miss_ms_p50': _percentile(miss_seconds, 0.5),
+                'miss_ms_p99': _percentile(miss_seconds, 0.99),
+            }
+
+
+def _percentile(ordered, fraction):
+    """The fraction-th of sorted durations in seconds, in milliseconds"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, math.floor(fraction * len(ordered)))] * 1e3
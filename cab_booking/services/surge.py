@@ -0,0 +1,217 @@
+import collections
+import math
+import threading
+import time
+
+from cab_booking.utils import get_coordinates
+
+
+class SurgePricing:
+    """
+    Zone-based surge multipliers from recent demand and current supply.
+    
+    The map is cut into square zones of zone_size_deg degrees. Demand is
+    the number of bookings requested in a zone over the last
+    window_seconds, counted in slot_seconds buckets; supply is the number
+    of available cars currently in the zone. Both are updated in O(1) by
+    record_demand() (from BookingService.create_booking) and
+    update_supply() (from CarService whenever a car's availability or
+    location changes).
+    
+    Multipliers are not computed per request: refresh() recomputes every
+    zone's once per refresh_seconds in the background thread started by
+    start() (the Flask and ASGI apps start it), or, with no thread
+    running, inline in whichever call first finds the table stale, and
+    publishes them as a new dict. multiplier() is a
+    lock-free lookup in the latest table.
+    
+    A zone's multiplier is 1 + sensitivity * (demand / supply - threshold),
+    rounded to step and capped at max_multiplier. A zone with no tracked
+    supply is not surged: cars without a location are counted nowhere,
+    so an empty zone says nothing about how scarce cars really are.
+    
+    Args:
+        zone_size_deg (float): Side of a zone in degrees
+        window_seconds (float): How far back demand is counted
+        slot_seconds (float): Granularity of the demand window
+        refresh_seconds (float): Minimum time between recomputations
+        threshold (float): Bookings per available car per window above
+                           which prices surge
+        sensitivity (float): Multiplier increase per unit of excess ratio
+        max_multiplier (float): Highest multiplier applied
+        step (float): Multipliers are rounded to multiples of this
+    """
+    
+    def __init__(self, zone_size_deg=0.05, window_seconds=300, slot_seconds=30, refresh_seconds=10,
+                 threshold=1.0, sensitivity=0.5, max_multiplier=3.0, step=0.1):
+        self.zone_size_deg = zone_size_deg
+        self.window_seconds = window_seconds
+        self.slot_seconds = slot_seconds
+        self.refresh_seconds = refresh_seconds
+        self.threshold = threshold
+        self.sensitivity = sensitivity
+        self.max_multiplier = max_multiplier
+        self.step = step
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._demand = {}      # zone -> deque of [slot, count], oldest first
+        self._supply = collections.Counter()  # zone -> available cars
+        self._car_zones = {}   # car ID -> zone it is counted in
+        self._multipliers = {}  # zone -> multiplier, for zones above 1.0
+        self._next_refresh = time.monotonic() + refresh_seconds
+        self._stopped = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+    
+    def zone(self, location):
+        """Grid position of the zone containing a location, or None"""
+        coordinates = get_coordinates(location)
+        if coordinates is None:
+            return None
+        return self._zone_of(*coordinates)
+    
+    def _zone_of(self, lat, lon):
+        return (math.floor(lat / self.zone_size_deg), math.floor(lon / self.zone_size_deg))
+    
+    def record_demand(self, location, now=None):
+        """
+        Count a booking requested at a location
+        
+        Args:
+            location: The pickup location; ignored if it has no coordinates
+            now (float, optional): time.monotonic() of the request
+        """
+        zone = self.zone(location)
+        if zone is None:
+            return
+        slot = int((time.monotonic() if now is None else now) // self.slot_seconds)
+        with self._lock:
+            slots = self._demand.get(zone)
+            if slots is None:
+                slots = self._demand[zone] = collections.deque()
+            if slots and slots[-1][0] == slot:
+                slots[-1][1] += 1
+            else:
+                slots.append([slot, 1])
+    
+    def update_supply(self, car_id, coordinates):
+        """
+        Count a car as available in the zone of coordinates, or not at all
+        
+        Args:
+            car_id (str): The car ID
+            coordinates (tuple): (lat, lon) of an available car, or None
+                                 if the car is unavailable, unplaced or gone
+        """
+        zone = self._zone_of(*coordinates) if coordinates is not None else None
+        with self._lock:
+            previous = self._car_zones.get(car_id)
+            if previous == zone:
+                return
+            if previous is not None:
+                self._supply[previous] -= 1
+                if not self._supply[previous]:
+                    del self._supply[previous]
+            if zone is None:
+                del self._car_zones[car_id]
+            else:
+                self._car_zones[car_id] = zone
+                self._supply[zone] += 1
+    
+    def multiplier(self, location):
+        """
+        The current surge multiplier for a location
+        
+        Args:
+            location: Any location accepted by get_coordinates
+        
+        Returns:
+            float: The multiplier of the location's zone; 1.0 without coordinates
+        """
+        if self._thread is None and time.monotonic() >= self._next_refresh:
+            self.refresh(wait=False)
+        zone = self.zone(location)
+        if zone is None:
+            return 1.0
+        return self._multipliers.get(zone, 1.0)
+    
+    def refresh(self, wait=True, now=None):
+        """
+        Recompute every zone's multiplier from the current counts
+        
+        Args:
+            wait (bool): Wait for a refresh already running in another
+                         thread; with False, return at once instead
+            now (float, optional): time.monotonic() to expire demand against
+        
+        Returns:
+            dict: The new zone -> multiplier table (zones at 1.0 omitted)
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return self._multipliers
+        try:
+            now = time.monotonic() if now is None else now
+            oldest = int((now - self.window_seconds) // self.slot_seconds) + 1
+            with self._lock:
+                self._next_refresh = now + self.refresh_seconds
+                counts = {}
+                for zone in list(self._demand):
+                    slots = self._demand[zone]
+                    while slots and slots[0][0] < oldest:
+                        slots.popleft()
+                    if slots:
+                        counts[zone] = sum(count for _, count in slots)
+                    else:
+                        del self._demand[zone]
+                supply = dict(self._supply)
+            
+            multipliers = {}
+            for zone, demand in counts.items():
+                multiplier = self.price(demand, supply.get(zone, 0))
+                if multiplier > 1.0:
+                    multipliers[zone] = multiplier
+            self._multipliers = multipliers
+            self.refreshes += 1
+            return multipliers
+        finally:
+            self._refresh_lock.release()
+    
+    def price(self, demand, supply):
+        """The multiplier for a zone's demand and supply counts"""
+        if not supply:
+            return 1.0
+        raw = 1.0 + self.sensitivity * (demand / supply - self.threshold)
+        raw = min(max(raw, 1.0), self.max_multiplier)
+        return round(round(raw / self.step) * self.step, 2)
+    
+    def start(self):
+        """Start a daemon thread refreshing every refresh_seconds; a no-op if running"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='surge-pricing', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Stop the background thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+    
+    def _run(self):
+        while not self._stopped.wait(self.refresh_seconds):
+            self.refresh(wait=False)
+    
+    def stats(self):
+        """Zones tracked and surging, and recomputations so far"""
+        with self._lock:
+            return {
+                'demand_zones': len(self._demand),
+                'supply_zones': len(self._supply),
+                'available_cars': len(self._car_zones),
+                'surging_zones': len(self._multipliers),
+                'refreshes': self.refreshes,
+            }
@@ -0,0 +1,143 @@
+import threading
+import time
+
+
+class TelemetryCoalescer:
+    """
+    Absorbs high-frequency car location pings and applies them in ticks.
+    
+    submit() only records the ping in a dict keyed by car ID under one
+    short lock, so a car that reports several times within a tick costs
+    one dictionary write per ping and a single location update per tick.
+    Once a tick has passed, the submitting thread swaps the dict out and
+    hands the latest location of each car to CarService.apply_locations;
+    flushing on the ingest path rather than in a busy thread of its own
+    keeps the extra work from competing with booking requests for the
+    GIL. The optional background thread only catches pings left pending
+    when traffic stops. Pings carrying a timestamp older than one already
+    seen for the car are dropped, so out-of-order delivery never moves a
+    car backwards.
+    
+    Args:
+        car_service (CarService): The service whose cars are moved
+        tick_seconds (float): Minimum time between flushes
+    """
+    
+    def __init__(self, car_service, tick_seconds=1.0):
+        self.car_service = car_service
+        self.tick_seconds = tick_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._next_flush = time.monotonic() + tick_seconds
+        self._pending = {}    # car ID -> latest location since the last flush
+        self._latest = {}     # car ID -> newest timestamp seen
+        self._stopped = threading.Event()
+        self._thread = None
+        self.received = 0
+        self.superseded = 0
+        self.stale = 0
+        self.applied = 0
+        self.unknown = 0
+    
+    def submit(self, car_id, location, timestamp=None):
+        """
+        Record a location ping; it is applied at the next flush
+        
+        Args:
+            car_id (str): The car ID
+            location (dict): The location data (e.g., latitude, longitude)
+            timestamp (float, optional): When the ping was taken
+        """
+        self.submit_many(((car_id, location, timestamp),))
+    
+    def submit_many(self, pings):
+        """
+        Record several pings under a single lock acquisition
+        
+        Args:
+            pings: Iterable of (car_id, location, timestamp) tuples
+        
+        Returns:
+            int: Number of pings kept (not older than one already seen)
+        """
+        kept = 0
+        with self._lock:
+            pending = self._pending
+            latest = self._latest
+            for car_id, location, timestamp in pings:
+                self.received += 1
+                if timestamp is not None:
+                    newest = latest.get(car_id)
+                    if newest is not None and timestamp < newest:
+                        self.stale += 1
+                        continue
+                    latest[car_id] = timestamp
+                if car_id in pending:
+                    self.superseded += 1
+                pending[car_id] = location
+                kept += 1
+        if time.monotonic() >= self._next_flush:
+            self.flush(wait=False)
+        return kept
+    
+    def flush(self, wait=True):
+        """
+        Apply the latest pending location of every car now
+        
+        Args:
+            wait (bool): Wait for a flush already running in another
+                         thread; with False, return 0 at once instead
+        
+        Returns:
+            int: Number of cars moved
+        """
+        if not self._flush_lock.acquire(blocking=wait):
+            return 0
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._next_flush = time.monotonic() + self.tick_seconds
+            if not pending:
+                return 0
+            moved = self.car_service.apply_locations(pending)
+            with self._lock:
+                self.applied += moved
+                self.unknown += len(pending) - moved
+            return moved
+        finally:
+            self._flush_lock.release()
+    
+    def start(self):
+        """Start a daemon thread flushing pings no submit has flushed for a tick; a no-op if running"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='telemetry-coalescer', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Stop the background thread after a final flush"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+    
+    def _run(self):
+        while not self._stopped.wait(self.tick_seconds):
+            if time.monotonic() >= self._next_flush:
+                self.flush(wait=False)
+        self.flush()
+    
+    def stats(self):
+        """Counters since creation, plus the number of cars awaiting the next flush"""
+        with self._lock:
+            return {
+                'received': self.received,
+                'superseded': self.superseded,
+                'stale': self.stale,
+                'applied': self.applied,
+                'unknown': self.unknown,
+                'pending': len(self._pending),
+            }
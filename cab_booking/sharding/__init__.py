@@ -0,0 +1,14 @@
+"""
+Sharded deployment: the services' state split across processes.
+
+Each shard process runs a full set of services for its part of the
+data and answers calls over a Unix socket. API worker processes talk to
+the shards through connect_shards(), which returns drop-in replacements
+for the local services; set CAB_BOOKING_SHARDS to the cluster directory
+and the default services in cab_booking.services become sharded ones.
+"""
+
+from .partition import RegionPartitioner
+from .server import ShardServer, run_shard, shard_address
+from .client import ShardCluster, connect_shards
+from .launcher import start_shards, stop_shards
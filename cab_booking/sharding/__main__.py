@@ -0,0 +1,39 @@
+"""
+Run a sharded cluster in the foreground::
+    
+    python -m cab_booking.sharding ~/.cab-booking-shards --shards 4
+
+then point any number of API worker processes at it::
+    
+    CAB_BOOKING_SHARDS=~/.cab-booking-shards gunicorn -w 4 cab_booking.wsgi:app
+
+The directory must belong to the user running the cluster and have mode
+0700; it holds the secret every connection to a shard has to prove.
+"""
+
+import argparse
+import os
+
+from .launcher import start_shards, stop_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shard processes of a cab booking cluster")
+    parser.add_argument('directory', help="cluster directory for the config and shard sockets")
+    parser.add_argument('--shards', type=int, default=os.cpu_count())
+    parser.add_argument('--region-size-deg', type=float, default=0.25)
+    parser.add_argument('--log-directory', help="persist each shard in an event log under this directory")
+    args = parser.parse_args()
+    
+    processes = start_shards(args.directory, args.shards, args.region_size_deg, args.log_directory)
+    print(f"{args.shards} shards serving in {args.directory}; "
+          f"set CAB_BOOKING_SHARDS={args.directory} for the API workers")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_shards(processes)
+
+
+if __name__ == '__main__':
+    main()
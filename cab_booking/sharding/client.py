@@ -0,0 +1,439 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+from multiprocessing.connection import Client
+
+from cab_booking.services import Services, TripAnalytics
+from cab_booking.storage import to_record
+from cab_booking.utils import GridIndex, solve_assignment
+from .partition import RegionPartitioner
+from .server import read_authkey, shard_address
+from .transport import unpack
+
+
+class ShardCluster:
+    """
+    Client side of a set of shard processes
+    
+    Each thread gets its own connection to every shard. Entities are
+    looked for on the shard that created them (see
+    RegionPartitioner.shard_for_id); a booking that was handed over to
+    another shard is found by asking every shard once, after which its
+    new owner is remembered.
+    
+    Args:
+        directory (str): The cluster directory written by start_shards
+    
+    Raises:
+        PermissionError: If other users could reach the directory
+    """
+    
+    def __init__(self, directory):
+        self._authkey = read_authkey(directory)
+        with open(os.path.join(directory, 'cluster.json')) as f:
+            config = json.load(f)
+        self.directory = directory
+        self.partitioner = RegionPartitioner(config['shards'], config['region_size_deg'])
+        self.shards = config['shards']
+        self._local = threading.local()
+        self._owners = {}  # (kind, entity ID) -> shard, for entities that moved
+        self._round_robin = itertools.count()
+    
+    def _connections(self):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = [
+                Client(shard_address(self.directory, shard), family='AF_UNIX', authkey=self._authkey)
+                for shard in range(self.shards)
+            ]
+        return connections
+    
+    @staticmethod
+    def _result(reply):
+        if reply[0]:
+            return unpack(reply[1], reply[2])
+        _, error_type, message = reply
+        if error_type == 'ValueError':
+            raise ValueError(message)
+        raise RuntimeError(f"{error_type} on shard: {message}")
+    
+    def call(self, shard, target, method, *args):
+        """Call target.method(*args) on one shard and return its result"""
+        connection = self._connections()[shard]
+        connection.send((target, method, args))
+        return self._result(connection.recv())
+    
+    def broadcast(self, target, method, *args):
+        """Call target.method(*args) on every shard at once; returns the results in shard order"""
+        connections = self._connections()
+        for connection in connections:
+            connection.send((target, method, args))
+        replies = [connection.recv() for connection in connections]
+        return [self._result(reply) for reply in replies]
+    
+    def next_shard(self):
+        """A shard for an entity with no location to place it by"""
+        return next(self._round_robin) % self.shards
+    
+    def owner(self, kind, entity_id):
+        """The shard believed to hold an entity"""
+        shard = self._owners.get((kind, entity_id))
+        return shard if shard is not None else self.partitioner.shard_for_id(entity_id)
+    
+    def moved(self, kind, entity_id, shard):
+        """Record that an entity now lives on another shard"""
+        self._owners[(kind, entity_id)] = shard
+    
+    def locate(self, kind, entity_id):
+        """Ask every shard for an entity; returns its shard or None"""
+        for shard, owns in enumerate(self.broadcast('shard', 'owns', kind, entity_id)):
+            if owns:
+                self.moved(kind, entity_id, shard)
+                return shard
+        return None
+    
+    def call_owner(self, kind, entity_id, target, method, *args):
+        """
+        Call target.method(*args) on the shard holding an entity
+        
+        A None result or ValueError from the expected shard triggers one
+        locate() in case the entity moved, and a retry on its new shard.
+        """
+        shard = self.owner(kind, entity_id)
+        try:
+            result = self.call(shard, target, method, *args)
+        except ValueError:
+            actual = self.locate(kind, entity_id)
+            if actual is None or actual == shard:
+                raise
+            return self.call(actual, target, method, *args)
+        if result is None:
+            actual = self.locate(kind, entity_id)
+            if actual is not None and actual != shard:
+                return self.call(actual, target, method, *args)
+        return result
+
+
+def _routed(kind, target, method):
+    """A proxy method calling a service method on the shard owning its first argument"""
+    def call(self, entity_id, *args):
+        return self.cluster.call_owner(kind, entity_id, target, method, entity_id, *args)
+    call.__name__ = method
+    call.__doc__ = f"{method} on the shard holding the {kind}"
+    return call
+
+
+class ShardedPassengerService:
+    """PassengerService interface over a ShardCluster; passengers are spread round robin"""
+    
+    def __init__(self, cluster):
+        self.cluster = cluster
+    
+    def create_passenger(self, passenger_data):
+        return self.cluster.call(self.cluster.next_shard(), 'passenger_service', 'create_passenger',
+                                 passenger_data)
+    
+    get_passenger = _routed('passenger', 'passenger_service', 'get_passenger')
+    update_passenger = _routed('passenger', 'passenger_service', 'update_passenger')
+    delete_passenger = _routed('passenger', 'passenger_service', 'delete_passenger')
+
+
+class ShardedDriverService:
+    """DriverService interface over a ShardCluster; drivers live with their car"""
+    
+    def __init__(self, cluster):
+        self.cluster = cluster
+    
+    def create_driver(self, driver_data):
+        """
+        Create a driver, on the shard of their car if driver_data has a car_id
+        
+        Args:
+            driver_data (dict): As for DriverService.create_driver, plus an
+                                optional car_id to assign
+        
+        Returns:
+            Driver: The created driver instance
+        """
+        car_id = driver_data.get('car_id')
+        if car_id is None:
+            return self.cluster.call(self.cluster.next_shard(), 'driver_service', 'create_driver', driver_data)
+        shard = self.cluster.owner('car', car_id)
+        driver = self.cluster.call(shard, 'driver_service', 'create_driver', driver_data)
+        return self.cluster.call(shard, 'shard', 'assign_car', driver.driver_id, car_id)
+    
+    get_driver = _routed('driver', 'driver_service', 'get_driver')
+    update_driver = _routed('driver', 'driver_service', 'update_driver')
+    delete_driver = _routed('driver', 'driver_service', 'delete_driver')
+    update_availability = _routed('driver', 'driver_service', 'update_availability')
+    update_rating = _routed('driver', 'driver_service', 'update_rating')
+    
+    def assign_car(self, driver_id, car):
+        """
+        Assign a car to a driver; both must live on the same shard
+        
+        Args:
+            driver_id (str): The driver ID
+            car (Car or str): The car or its ID
+        
+        Returns:
+            Driver: The updated driver instance if found, None otherwise
+        """
+        car_id = car if isinstance(car, str) else car.car_id
+        shard = self.cluster.owner('driver', driver_id)
+        if self.cluster.owner('car', car_id) != shard:
+            raise ValueError(f"Driver {driver_id} and car {car_id} are on different shards")
+        return self.cluster.call(shard, 'shard', 'assign_car', driver_id, car_id)
+    
+    def top_rated_drivers(self, k=10, location=None, car_type=None, available_only=False):
+        """Best rated drivers across every shard; see DriverService.top_rated_drivers"""
+        results = self.cluster.broadcast('driver_service', 'top_rated_drivers', k, location, car_type,
+                                         available_only)
+        return heapq.nlargest(k, itertools.chain.from_iterable(results), key=lambda match: match[1])
+    
+    def lowest_rated_drivers(self, k=10, location=None, car_type=None, available_only=False):
+        """Worst rated drivers across every shard; see DriverService.lowest_rated_drivers"""
+        results = self.cluster.broadcast('driver_service', 'lowest_rated_drivers', k, location, car_type,
+                                         available_only)
+        return heapq.nsmallest(k, itertools.chain.from_iterable(results), key=lambda match: match[1])
+    
+    def drivers_rated_below(self, threshold, location=None, car_type=None):
+        """Drivers rated below a threshold across every shard; see DriverService.drivers_rated_below"""
+        results = self.cluster.broadcast('driver_service', 'drivers_rated_below', threshold, location, car_type)
+        return sorted(itertools.chain.from_iterable(results), key=lambda match: match[1])
+
+
+class ShardedCarService:
+    """CarService interface over a ShardCluster; cars are placed by location"""
+    
+    def __init__(self, cluster):
+        self.cluster = cluster
+    
+    def create_car(self, car_data):
+        """
+        Create a car on the shard owning its current_location, if given
+        
+        Args:
+            car_data (dict): As for CarService.create_car, plus an optional
+                             current_location
+        
+        Returns:
+            Car: The created car instance
+        """
+        location = car_data.get('current_location')
+        shard = self.cluster.partitioner.shard_for_location(location)
+        if shard is None:
+            return self.cluster.call(self.cluster.next_shard(), 'car_service', 'create_car', car_data)
+        car = self.cluster.call(shard, 'car_service', 'create_car', car_data)
+        return self.cluster.call(shard, 'car_service', 'update_location', car.car_id, location)
+    
+    get_car = _routed('car', 'car_service', 'get_car')
+    update_car = _routed('car', 'car_service', 'update_car')
+    delete_car = _routed('car', 'car_service', 'delete_car')
+    update_availability = _routed('car', 'car_service', 'update_availability')
+    update_location = _routed('car', 'car_service', 'update_location')
+    
+    def apply_locations(self, locations):
+        """Move many cars with one call per shard; see CarService.apply_locations"""
+        by_shard = {}
+        for car_id, location in locations.items():
+            by_shard.setdefault(self.cluster.owner('car', car_id), {})[car_id] = location
+        return sum(self.cluster.call(shard, 'car_service', 'apply_locations', batch)
+                   for shard, batch in by_shard.items())
+    
+    def get_available_cars(self, car_type=None):
+        return [car for cars in self.cluster.broadcast('car_service', 'get_available_cars', car_type)
+                for car in cars]
+    
+    def find_nearest_available(self, location, car_type=None, k=1, radius_km=None):
+        """Nearest available cars across every shard; see CarService.find_nearest_available"""
+        matches = self.cluster.broadcast('car_service', 'find_nearest_available', location,
+                                         car_type, k, radius_km)
+        return heapq.nsmallest(k, itertools.chain.from_iterable(matches), key=lambda match: match[1])
+
+
+class ShardedBookingService:
+    """
+    BookingService interface over a ShardCluster
+    
+    A booking is created on the shard owning its pickup location (or its
+    passenger's shard if it has none), with a copy of the passenger. When
+    it is assigned a driver on another shard, the booking is handed over
+    to the driver's shard first, so a booking always lives with its
+    driver and car.
+    """
+    
+    def __init__(self, cluster):
+        self.cluster = cluster
+    
+    def create_booking(self, booking_data):
+        passenger_id = booking_data.get('passenger_id')
+        passenger = None
+        if passenger_id is not None:
+            passenger = self.cluster.call_owner('passenger', passenger_id, 'passenger_service',
+                                                'get_passenger', passenger_id)
+        if not passenger:
+            raise ValueError(f"Passenger with ID {passenger_id} not found")
+        
+        shard = self.cluster.partitioner.shard_for_location(booking_data.get('from_location'))
+        if shard is None:
+            shard = self.cluster.owner('passenger', passenger_id)
+        return self.cluster.call(shard, 'shard', 'create_booking', booking_data, to_record(passenger))
+    
+    get_booking = _routed('booking', 'booking_service', 'get_booking')
+    start_trip = _routed('booking', 'booking_service', 'start_trip')
+    complete_trip = _routed('booking', 'booking_service', 'complete_trip')
+    cancel_trip = _routed('booking', 'booking_service', 'cancel_trip')
+    get_trip_details = _routed('booking', 'booking_service', 'get_trip_details')
+    get_driver_bookings = _routed('driver', 'booking_service', 'get_driver_bookings')
+    page_driver_bookings = _routed('driver', 'booking_service', 'page_driver_bookings')
+    
+    def get_passenger_bookings(self, passenger_id, status=None):
+        results = self.cluster.broadcast('booking_service', 'get_passenger_bookings', passenger_id, status)
+        return list(heapq.merge(*results, key=lambda booking: booking.booking_id))
+    
+    def page_passenger_bookings(self, passenger_id, status=None, after=None, limit=100,
+                                since=None, until=None, descending=False):
+        """One page of a passenger's bookings across every shard; see BookingService.page_passenger_bookings"""
+        results = self.cluster.broadcast('booking_service', 'page_passenger_bookings', passenger_id, status,
+                                         after, limit, since, until, descending)
+        merged = heapq.merge(*results, key=lambda booking: booking.booking_id, reverse=descending)
+        return list(itertools.islice(merged, limit))
+    
+    def get_recent_bookings(self, passenger_id, limit=5):
+        """A passenger's most recent bookings across every shard; see BookingService.get_recent_bookings"""
+        return self.page_passenger_bookings(passenger_id, limit=limit, descending=True)[::-1]
+    
+    def get_trip_stats(self, resolution='hour', since=None, until=None, car_type=None, location=None,
+                       group_by=('time',)):
+        """Trip statistics merged from every shard's rollups; see BookingService.get_trip_stats"""
+        results = self.cluster.broadcast('booking_service', 'get_trip_rollups', resolution, since, until,
+                                         car_type, location, tuple(group_by))
+        return TripAnalytics.report(TripAnalytics.merge(results), group_by)
+    
+    def get_route_stats(self):
+        """Route cache stats summed over the shards; latencies are the slowest shard's"""
+        results = [stats for stats in self.cluster.broadcast('booking_service', 'get_route_stats') if stats]
+        if not results:
+            return None
+        merged = {}
+        for name in results[0]:
+            values = [stats[name] for stats in results if stats[name] is not None]
+            if not values:
+                merged[name] = None
+            elif name.endswith('_ms_p50') or name.endswith('_ms_p99'):
+                merged[name] = max(values)
+            else:
+                merged[name] = sum(values)
+        lookups = merged['hits'] + merged['misses'] + merged['coalesced']
+        merged['hit_rate'] = merged['hits'] / lookups if lookups else None
+        return merged
+    
+    def assign_driver(self, booking_id, driver_id):
+        """
+        Assign a driver to a booking, handing the booking over to the
+        driver's shard if it lives elsewhere
+        
+        Args:
+            booking_id (str): The booking ID
+            driver_id (str): The driver ID
+        
+        Returns:
+            Booking: The updated booking instance
+        """
+        if not self.cluster.call_owner('driver', driver_id, 'driver_service', 'get_driver', driver_id):
+            raise ValueError(f"Driver with ID {driver_id} not found")
+        driver_shard = self.cluster.owner('driver', driver_id)
+        
+        origin = self.cluster.owner('booking', booking_id)
+        if origin != driver_shard:
+            records = self.cluster.call_owner('booking', booking_id, 'shard', 'detach_booking', booking_id)
+            origin = self.cluster.owner('booking', booking_id)  # call_owner may have located it elsewhere
+            try:
+                self.cluster.call(driver_shard, 'shard', 'attach_booking', records)
+            except Exception:
+                # Put the booking back where it came from rather than lose it
+                self.cluster.call(origin, 'shard', 'attach_booking', records)
+                raise
+            self.cluster.moved('booking', booking_id, driver_shard)
+        return self.cluster.call(driver_shard, 'booking_service', 'assign_driver', booking_id, driver_id)
+    
+    def dispatch_batch(self, radius_km=5.0, max_candidates=8, rating_weight_km=0.0):
+        """
+        Match every REQUESTED booking to an available driver
+        
+        Every shard first runs BookingService.dispatch_batch over its own
+        bookings and drivers. The bookings and drivers left over within
+        radius_km of a region border are then matched globally in a
+        second pass, and matched bookings move to their driver's shard.
+        Drivers whose car has driven into another shard's region join the
+        second pass too, with the requested bookings around them fetched
+        from the shards owning that ground. Ratings are weighed in the
+        first pass only.
+        
+        Args:
+            radius_km (float): Maximum pickup distance considered
+            max_candidates (int): Maximum candidate drivers per booking
+            rating_weight_km (float): See BookingService.dispatch_batch
+        
+        Returns:
+            dict: Maps each assigned booking ID to its driver ID
+        """
+        assigned = {}
+        for result in self.cluster.broadcast('booking_service', 'dispatch_batch', radius_km, max_candidates,
+                                             rating_weight_km):
+            assigned.update(result)
+        
+        bookings = {}  # booking ID -> (lat, lon)
+        grid = GridIndex()
+        strays = []  # locations of drivers outside their shard's regions
+        partitioner = self.cluster.partitioner
+        for shard, (booking_state, driver_state) in enumerate(
+                self.cluster.broadcast('shard', 'border_state', radius_km)):
+            for booking_id, lat, lon in booking_state:
+                bookings[booking_id] = (lat, lon)
+            for driver_id, lat, lon in driver_state:
+                grid.insert(driver_id, lat, lon)
+                if partitioner.shard_for_point(lat, lon) != shard:
+                    strays.append((lat, lon))
+        if strays:
+            shards = set().union(*(partitioner.shards_within(lat, lon, radius_km) for lat, lon in strays))
+            for shard in sorted(shards):
+                nearby = self.cluster.call(shard, 'shard', 'requested_near', strays, radius_km)
+                for booking_id, lat, lon in nearby:
+                    bookings[booking_id] = (lat, lon)
+        if not bookings or not len(grid):
+            return assigned
+        
+        candidates = [grid.nearest(lat, lon, k=max_candidates, radius_km=radius_km)
+                      for lat, lon in bookings.values()]
+        for booking_id, driver_id in zip(bookings, solve_assignment(candidates)):
+            if driver_id is None:
+                continue
+            try:
+                self.assign_driver(booking_id, driver_id)
+            except ValueError:
+                continue  # taken by a concurrent request since border_state
+            assigned[booking_id] = driver_id
+        return assigned
+
+
+def connect_shards(directory):
+    """
+    Services that forward every call to the shards of a cluster
+    
+    Args:
+        directory (str): The cluster directory written by start_shards
+    
+    Returns:
+        Services: Drop-in replacements for the four local services
+    """
+    cluster = ShardCluster(directory)
+    return Services(
+        ShardedPassengerService(cluster),
+        ShardedDriverService(cluster),
+        ShardedCarService(cluster),
+        ShardedBookingService(cluster),
+    )
@@ -0,0 +1,67 @@
+import json
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import Client
+
+from .server import check_cluster_directory, run_shard, shard_address, write_authkey
+
+
+def start_shards(directory, shards, region_size_deg=0.25, log_directory=None, timeout=30.0):
+    """
+    Start one process per shard and wait until they all accept connections
+    
+    Args:
+        directory (str): Cluster directory for the config, secret and shard
+                         sockets; created if missing, and refused unless
+                         owned by this user with mode 0700
+        shards (int): Number of shard processes
+        region_size_deg (float): Side of a partitioning region in degrees
+        log_directory (str, optional): Persist each shard in an event log here
+        timeout (float): Seconds to wait for the shards to come up
+    
+    Returns:
+        list: The multiprocessing.Process of each shard
+    
+    Raises:
+        PermissionError: If other users could reach the directory
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    check_cluster_directory(directory)
+    authkey = write_authkey(directory)
+    with open(os.path.join(directory, 'cluster.json'), 'w') as f:
+        json.dump({'shards': shards, 'region_size_deg': region_size_deg}, f)
+    
+    processes = []
+    for shard in range(shards):
+        process = multiprocessing.Process(
+            target=run_shard,
+            args=(directory, shard, shards, region_size_deg, log_directory, authkey),
+            name=f"cab-booking-shard-{shard}",
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+    
+    deadline = time.monotonic() + timeout
+    for shard, process in enumerate(processes):
+        while True:
+            try:
+                Client(shard_address(directory, shard), family='AF_UNIX', authkey=authkey).close()
+                break
+            except OSError:
+                if not process.is_alive():
+                    raise RuntimeError(f"Shard {shard} exited with code {process.exitcode}")
+                if time.monotonic() > deadline:
+                    stop_shards(processes)
+                    raise RuntimeError(f"Shard {shard} did not start within {timeout} seconds")
+                time.sleep(0.05)
+    return processes
+
+
+def stop_shards(processes):
+    """Terminate shard processes started by start_shards"""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
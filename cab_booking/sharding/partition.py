@@ -0,0 +1,83 @@
+import math
+import zlib
+
+from cab_booking.utils import get_coordinates
+from cab_booking.utils.geo import KM_PER_DEGREE
+
+
+class RegionPartitioner:
+    """
+    Maps locations and entity IDs to shards.
+    
+    The map is cut into square regions of region_size_deg degrees and
+    each region is owned by one shard, chosen by a stable hash of the
+    region's grid position (so every process computes the same owner).
+    Entities without a location are placed by the numeric part of their
+    ID, which is also the shard that created them.
+    
+    Args:
+        shards (int): Number of shards
+        region_size_deg (float): Side of a region in degrees
+    """
+    
+    def __init__(self, shards, region_size_deg=0.25):
+        self.shards = shards
+        self.region_size_deg = region_size_deg
+    
+    def region(self, lat, lon):
+        """Grid position of the region containing a point"""
+        return (math.floor(lat / self.region_size_deg), math.floor(lon / self.region_size_deg))
+    
+    def shard_for_region(self, region):
+        return zlib.crc32(f"{region[0]}:{region[1]}".encode('ascii')) % self.shards
+    
+    def shard_for_point(self, lat, lon):
+        return self.shard_for_region(self.region(lat, lon))
+    
+    def shard_for_location(self, location):
+        """
+        The shard owning a location
+        
+        Args:
+            location: A location accepted by get_coordinates
+        
+        Returns:
+            int: The shard, or None if the location has no coordinates
+        """
+        coordinates = get_coordinates(location)
+        if coordinates is None:
+            return None
+        return self.shard_for_point(*coordinates)
+    
+    def shard_for_id(self, entity_id):
+        """The shard that created an ID, e.g. "BOOK-00000042" """
+        try:
+            return int(entity_id.rsplit('-', 1)[-1]) % self.shards
+        except ValueError:
+            return zlib.crc32(entity_id.encode('utf-8')) % self.shards
+    
+    def shards_within(self, lat, lon, radius_km):
+        """
+        Every shard owning part of the box of radius_km around a point
+        
+        Args:
+            lat (float): Latitude of the point
+            lon (float): Longitude of the point
+            radius_km (float): Half the side of the box
+        
+        Returns:
+            set: Shard numbers, including the point's own
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        low_row, low_col = self.region(lat - dlat, lon - dlon)
+        high_row, high_col = self.region(lat + dlat, lon + dlon)
+        return {
+            self.shard_for_region((row, col))
+            for row in range(low_row, high_row + 1)
+            for col in range(low_col, high_col + 1)
+        }
+    
+    def near_border(self, lat, lon, radius_km):
+        """Whether another shard owns ground within radius_km of a point"""
+        return len(self.shards_within(lat, lon, radius_km)) > 1
@@ -0,0 +1,257 @@
+import os
+import stat
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, answer_challenge, deliver_challenge
+
+from cab_booking.models import Booking, Passenger
+from cab_booking.services import create_services
+from cab_booking.storage import from_record, open_logged_repositories
+from cab_booking.utils import get_coordinates, haversine_km
+from .partition import RegionPartitioner
+from .transport import pack
+
+_TARGETS = ('passenger_service', 'driver_service', 'car_service', 'booking_service')
+_SHARD_METHODS = ('owns', 'create_booking', 'detach_booking', 'attach_booking',
+                  'assign_car', 'border_state', 'requested_near')
+
+
+class ShardServer:
+    """
+    One shard: a full set of services answering calls over local IPC
+    
+    Requests are (target, method, args) tuples. target names one of the
+    four services, whose public methods can be called directly, or
+    'shard' for the cross-shard operations defined here. Replies are
+    (True, records, packed result) or (False, exception type name,
+    message), so a service's ValueError can be raised again client-side.
+    
+    Args:
+        services (Services): The services holding this shard's state
+        partitioner (RegionPartitioner): The cluster's partitioning
+        shard (int): This shard's number
+    """
+    
+    def __init__(self, services, partitioner, shard):
+        self.services = services
+        self.partitioner = partitioner
+        self.shard = shard
+    
+    def handle(self, target, method, args):
+        """Run one request and return its reply"""
+        if target == 'shard':
+            obj = self if method in _SHARD_METHODS else None
+        elif target in _TARGETS and not method.startswith('_'):
+            obj = getattr(self.services, target)
+        else:
+            obj = None
+        if not callable(getattr(obj, method, None)):
+            return False, 'LookupError', f"Unknown method {target}.{method}"
+        
+        try:
+            result = getattr(obj, method)(*args)
+        except Exception as exc:
+            return False, type(exc).__name__, str(exc)
+        return (True, *pack(result))
+    
+    def serve(self, address, authkey):
+        """
+        Accept connections on address (a Unix socket path) until the process exits
+        
+        Connections are pickled both ways, so only clients proving they
+        hold the cluster's authkey are served. The authkey handshake runs
+        on each connection's own thread, the same exchange Listener runs
+        in accept(), so a client that stalls part way through it can't
+        hold up everyone else's connections.
+        """
+        with Listener(address, family='AF_UNIX') as listener:
+            while True:
+                try:
+                    connection = listener.accept()
+                except OSError:
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection, authkey), daemon=True).start()
+    
+    def _serve_connection(self, connection, authkey):
+        with connection:
+            try:
+                deliver_challenge(connection, authkey)
+                answer_challenge(connection, authkey)
+            except (AuthenticationError, EOFError, OSError):
+                return
+            while True:
+                try:
+                    target, method, args = connection.recv()
+                except EOFError:
+                    return
+                connection.send(self.handle(target, method, args))
+    
+    # Cross-shard operations
+    
+    def owns(self, kind, entity_id):
+        """Whether this shard holds an entity (replicated passengers excluded)"""
+        if kind == 'passenger':
+            return (self.partitioner.shard_for_id(entity_id) == self.shard
+                    and self.services.passenger_service.get_passenger(entity_id) is not None)
+        if kind == 'driver':
+            return self.services.driver_service.get_driver(entity_id) is not None
+        if kind == 'car':
+            return self.services.car_service.get_car(entity_id) is not None
+        return self.services.booking_service.get_booking(entity_id) is not None
+    
+    def create_booking(self, booking_data, passenger_record):
+        """Create a booking here for a passenger that may live on another shard"""
+        self._replicate_passenger(passenger_record)
+        return self.services.booking_service.create_booking(booking_data)
+    
+    def detach_booking(self, booking_id):
+        """Give up a booking awaiting a driver; returns its record for attach_booking"""
+        booking = self.services.booking_service.detach_booking(booking_id)
+        return pack(booking)[0]
+    
+    def attach_booking(self, records):
+        """Take over a booking detached from another shard"""
+        record = next(record for (kind, _), record in records.items() if kind == 'booking')
+        passenger = self._replicate_passenger(records[('passenger', record['passenger_id'])])
+        booking = from_record(Booking, record, lambda kind, ref_id: passenger if kind == 'passenger' else None)
+        return self.services.booking_service.attach_booking(booking)
+    
+    def assign_car(self, driver_id, car_id):
+        """DriverService.assign_car with the car looked up here"""
+        car = self.services.car_service.get_car(car_id)
+        if not car:
+            raise ValueError(f"Car with ID {car_id} not found")
+        return self.services.driver_service.assign_car(driver_id, car)
+    
+    def border_state(self, radius_km):
+        """
+        Bookings and drivers left over near this shard's borders
+        
+        A car stays on the shard that created it wherever it drives, so
+        available drivers whose car is now in another shard's region are
+        returned too, for the client to match with requested_near().
+        
+        Returns:
+            tuple: ([(booking_id, lat, lon)], [(driver_id, lat, lon)]) for
+                   the requested bookings and available drivers that have
+                   another shard's ground within radius_km
+        """
+        booking_service = self.services.booking_service
+        bookings = []
+        for booking_id in list(booking_service.requested_bookings):
+            booking = booking_service.bookings.get(booking_id)
+            coordinates = get_coordinates(booking.from_location) if booking else None
+            if coordinates is not None and self.partitioner.near_border(*coordinates, radius_km):
+                bookings.append((booking_id, *coordinates))
+        
+        drivers = []
+        for driver in self.services.driver_service.drivers.values():
+            car = driver.assigned_car
+            if not (driver.is_available and car and car.is_available):
+                continue
+            coordinates = get_coordinates(car.current_location)
+            if coordinates is not None and (self.partitioner.near_border(*coordinates, radius_km)
+                                            or self.partitioner.shard_for_point(*coordinates) != self.shard):
+                drivers.append((driver.driver_id, *coordinates))
+        return bookings, drivers
+    
+    def requested_near(self, points, radius_km):
+        """
+        Requested bookings picked up within radius_km of any of points
+        
+        Args:
+            points (list): (lat, lon) tuples, e.g. of drivers on other shards
+            radius_km (float): Maximum pickup distance
+        
+        Returns:
+            list: (booking_id, lat, lon) tuples
+        """
+        booking_service = self.services.booking_service
+        bookings = []
+        for booking_id in list(booking_service.requested_bookings):
+            booking = booking_service.bookings.get(booking_id)
+            coordinates = get_coordinates(booking.from_location) if booking else None
+            if coordinates is not None and any(haversine_km(*coordinates, lat, lon) <= radius_km
+                                               for lat, lon in points):
+                bookings.append((booking_id, *coordinates))
+        return bookings
+    
+    def _replicate_passenger(self, record):
+        passenger_service = self.services.passenger_service
+        passenger = passenger_service.get_passenger(record['passenger_id'])
+        if passenger is None:
+            passenger = from_record(Passenger, record)
+            passenger_service.passengers[passenger.passenger_id] = passenger
+        return passenger
+
+
+def shard_address(directory, shard):
+    """The Unix socket path of a shard in a cluster directory"""
+    return os.path.join(directory, f"shard-{shard}.sock")
+
+
+def check_cluster_directory(directory):
+    """
+    Make sure no other local user can reach a cluster directory
+    
+    Raises:
+        PermissionError: If the directory is a symlink, is not owned by
+                         this user, or is not mode 0700
+    """
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Cluster directory {directory} is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"Cluster directory {directory} is not owned by the current user")
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        raise PermissionError(f"Cluster directory {directory} has mode {stat.S_IMODE(info.st_mode):04o}, "
+                              f"not 0700")
+
+
+def write_authkey(directory):
+    """Generate a new secret for the shard connections of a cluster; returns it"""
+    authkey = os.urandom(32)
+    path = os.path.join(directory, 'authkey')
+    if os.path.lexists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(authkey)
+    return authkey
+
+
+def read_authkey(directory):
+    """The secret of a cluster's shard connections, after checking the directory"""
+    check_cluster_directory(directory)
+    with open(os.path.join(directory, 'authkey'), 'rb') as f:
+        return f.read()
+
+
+def run_shard(directory, shard, shards, region_size_deg=0.25, log_directory=None, authkey=None):
+    """
+    Process entry point serving one shard
+    
+    Args:
+        directory (str): The cluster directory holding the shard sockets
+        shard (int): This shard's number
+        shards (int): Number of shards in the cluster
+        region_size_deg (float): Region size of the RegionPartitioner
+        log_directory (str, optional): Keep this shard's state in an event
+                                       log under log_directory/shard-<n>
+        authkey (bytes, optional): The cluster's secret; read from the
+                                   directory by default
+    """
+    if authkey is None:
+        authkey = read_authkey(directory)
+    else:
+        check_cluster_directory(directory)
+    repositories = None
+    if log_directory is not None:
+        repositories = open_logged_repositories(os.path.join(log_directory, f"shard-{shard}"))
+    services = create_services(repositories, shard=shard, shards=shards)
+    server = ShardServer(services, RegionPartitioner(shards, region_size_deg), shard)
+    
+    address = shard_address(directory, shard)
+    if os.path.exists(address):
+        os.unlink(address)
+    server.serve(address, authkey)
@@ -0,0 +1,85 @@
+"""
+Shipping service results between processes.
+
+Model objects refer to each other (a booking to its passenger, driver
+and car, a passenger to its whole booking history), so pickling one
+would drag a large object graph along. Instead every entity in a result
+is sent once as a record (see cab_booking.storage.records) and replaced
+by an EntityRef; the receiving side rebuilds the objects and their
+references from the records.
+"""
+
+import collections
+
+from cab_booking.storage import entity_id, from_record, to_record
+from cab_booking.storage.records import KINDS
+
+EntityRef = collections.namedtuple('EntityRef', ['kind', 'entity_id'])
+
+_KIND_OF = {cls: kind for kind, (cls, _) in KINDS.items()}
+
+# Referenced entities that travel along with an entity
+_REFERENCES = {
+    'booking': ('passenger', 'driver', 'car'),
+    'driver': ('assigned_car',),
+}
+
+
+def pack(value):
+    """
+    Replace the model objects in a result with references
+    
+    Args:
+        value: A service result; lists, tuples and dicts are walked
+    
+    Returns:
+        tuple: (records, packed value), where records maps (kind, ID) to
+               the record of every entity involved
+    """
+    records = {}
+    
+    def add(kind, entity):
+        key = (kind, entity_id(entity))
+        if key not in records:
+            records[key] = to_record(entity)
+            for attribute in _REFERENCES.get(kind, ()):
+                referenced = getattr(entity, attribute)
+                if referenced is not None:
+                    add(_KIND_OF[type(referenced)], referenced)
+        return key
+    
+    def walk(item):
+        kind = _KIND_OF.get(type(item))
+        if kind is not None:
+            return EntityRef(*add(kind, item))
+        if isinstance(item, (list, tuple)):
+            return type(item)(walk(element) for element in item)
+        if isinstance(item, dict):
+            return {key: walk(element) for key, element in item.items()}
+        return item
+    
+    return records, walk(value)
+
+
+def unpack(records, value):
+    """Rebuild the model objects of a value produced by pack"""
+    entities = {}
+    
+    def resolve(kind, ref_id):
+        key = (kind, ref_id)
+        if key not in entities:
+            record = records.get(key)
+            entities[key] = from_record(KINDS[kind][0], record, resolve) if record is not None else None
+        return entities[key]
+    
+    def walk(item):
+        if isinstance(item, EntityRef):
+            return resolve(item.kind, item.entity_id)
+        if isinstance(item, (list, tuple)):
+            return type(item)(walk(element) for element in item)
+        if isinstance(item, dict):
+            return {key: walk(element) for key, element in item.items()}
+        return item
+    
+    return walk(value)
+
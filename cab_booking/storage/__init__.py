@@ -0,0 +1,8 @@
+"""
+This module contains initialization for the storage package.
+"""
+
+from .repository import Repository, InMemoryRepository
+from .records import to_record, from_record, entity_id
+from .sqlite import ConnectionPool, SQLiteRepository, open_sqlite_repositories
+from .event_log import EventLog, LoggedRepository, open_logged_repositories
@@ -0,0 +1,362 @@
+import glob
+import json
+import os
+import threading
+
+from .records import KINDS, from_record, to_record
+from .repository import InMemoryRepository, Repository
+
+_SEGMENT_PATTERN = 'events-*.log'
+_SNAPSHOT_PATTERN = 'snapshot-*.jsonl'
+
+# Kinds in an order where references always point at kinds already loaded
+_LOAD_ORDER = ('car', 'driver', 'passenger', 'booking')
+
+
+def _sequence_of(path):
+    return int(os.path.basename(path).split('-', 1)[1].split('.', 1)[0])
+
+
+def _fsync_directory(directory):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _read_events(path):
+    """Yield the events in a segment, stopping at a torn final line"""
+    with open(path, 'r', encoding='utf-8') as segment:
+        for line in segment:
+            if not line.endswith('\n'):
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                break
+
+
+def _apply(state, event):
+    records = state.setdefault(event['kind'], {})
+    if event['op'] == 'delete':
+        records.pop(event['id'], None)
+    else:
+        records[event['id']] = event['record']
+
+
+class EventLog:
+    """
+    Append-only write-ahead log of entity changes, with snapshots.
+    
+    Each change is one JSON line carrying a sequence number and the full
+    record of the changed entity (or a delete marker). A background
+    writer thread drains everything appended since its last write and
+    commits it with a single fsync, so concurrent writers share fsyncs
+    (group commit). The log is split into segments of
+    ``segment_size`` events; each time a segment is closed a background
+    compaction folds it into a new snapshot and deletes it, so recovery
+    replays at most the snapshot plus a segment or two. If a write or
+    fsync fails, the writer stops and its OSError is raised to everyone
+    waiting for durability and to every later append.
+    
+    Args:
+        directory (str): Where segments and snapshots are kept
+        segment_size (int): Events per segment before it is compacted
+        sync (bool): If true, append() returns only once the event is on disk
+    """
+    
+    def __init__(self, directory, segment_size=10000, sync=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync = sync
+        
+        self._condition = threading.Condition()
+        self._buffer = []
+        self._closed = False
+        self._error = None  # OSError that stopped the writer thread
+        self._last_seq = self._find_last_sequence()
+        self._durable_seq = self._last_seq
+        self.fsync_count = 0
+        
+        self._compaction_lock = threading.Lock()
+        self._compactions = []
+        self._open_segment(self._last_seq + 1)
+        
+        self._writer = threading.Thread(target=self._write_loop, name='event-log-writer', daemon=True)
+        self._writer.start()
+    
+    # Appending
+    
+    def append(self, kind, op, entity_id, record=None):
+        """
+        Append a change and, in sync mode, wait until it is durable
+        
+        Returns:
+            int: The event's sequence number
+        """
+        seq = self.append_nowait(kind, op, entity_id, record)
+        if self.sync:
+            self.wait_durable(seq)
+        return seq
+    
+    def append_nowait(self, kind, op, entity_id, record=None):
+        """Queue a change for the writer thread without waiting for it"""
+        payload = json.dumps(record, separators=(',', ':')) if record is not None else 'null'
+        key = json.dumps(entity_id)
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise RuntimeError("Event log is closed")
+            self._last_seq += 1
+            seq = self._last_seq
+            self._buffer.append(
+                f'{{"seq":{seq},"kind":"{kind}","op":"{op}","id":{key},"record":{payload}}}\n'
+            )
+            self._condition.notify_all()
+        return seq
+    
+    def flush(self):
+        """Block until everything appended so far is durable"""
+        with self._condition:
+            seq = self._last_seq
+        self.wait_durable(seq)
+    
+    def wait_durable(self, seq):
+        """Block until every event up to seq has been fsynced"""
+        with self._condition:
+            while self._durable_seq < seq:
+                if self._error is not None:
+                    raise self._error
+                self._condition.wait()
+    
+    def _open_segment(self, first_seq):
+        self._segment_path = os.path.join(self.directory, f'events-{first_seq:012d}.log')
+        self._segment = open(self._segment_path, 'a', encoding='utf-8')
+        self._segment_events = 0
+    
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+                if not self._buffer:
+                    return
+                batch, self._buffer = self._buffer, []
+                last_seq = self._last_seq
+            
+            try:
+                self._segment.write(''.join(batch))
+                self._segment.flush()
+                os.fsync(self._segment.fileno())
+                self._segment_events += len(batch)
+                
+                with self._condition:
+                    self.fsync_count += 1
+                    self._durable_seq = last_seq
+                    self._condition.notify_all()
+                
+                if self._segment_events >= self.segment_size:
+                    self._segment.close()
+                    self._open_segment(last_seq + 1)
+                    self.compact_async()
+            except OSError as exc:
+                # Whether the batch reached the disk is unknown, so nothing
+                # more is written; waiters and later appends get the error
+                with self._condition:
+                    self._error = exc
+                    self._condition.notify_all()
+                return
+    
+    # Snapshots
+    
+    def compact_async(self):
+        """Fold closed segments into a new snapshot on a background thread"""
+        thread = threading.Thread(target=self.compact, name='event-log-compaction', daemon=True)
+        self._compactions = [t for t in self._compactions if t.is_alive()] + [thread]
+        thread.start()
+    
+    def compact(self):
+        """Fold every closed segment into a new snapshot and delete them"""
+        with self._compaction_lock:
+            # The newest segment may still be receiving writes
+            segments = self._segments()[:-1]
+            if not segments:
+                return
+            snapshot_seq, state = self._load_snapshot()
+            last_seq = snapshot_seq
+            for path in segments:
+                for event in _read_events(path):
+                    if event['seq'] > snapshot_seq:
+                        _apply(state, event)
+                        last_seq = event['seq']
+            
+            path = os.path.join(self.directory, f'snapshot-{last_seq:012d}.jsonl')
+            with open(path + '.tmp', 'w', encoding='utf-8') as snapshot:
+                snapshot.write(json.dumps({'seq': last_seq}) + '\n')
+                for kind, records in state.items():
+                    for record in records.values():
+                        snapshot.write(json.dumps({'kind': kind, 'record': record}, separators=(',', ':')) + '\n')
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(path + '.tmp', path)
+            _fsync_directory(self.directory)
+            
+            for old in self._snapshots():
+                if old != path:
+                    os.remove(old)
+            for segment in segments:
+                os.remove(segment)
+    
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, _SEGMENT_PATTERN)), key=_sequence_of)
+    
+    def _snapshots(self):
+        return sorted(glob.glob(os.path.join(self.directory, _SNAPSHOT_PATTERN)), key=_sequence_of)
+    
+    def _load_snapshot(self):
+        snapshots = self._snapshots()
+        if not snapshots:
+            return 0, {}
+        state = {}
+        with open(snapshots[-1], 'r', encoding='utf-8') as snapshot:
+            seq = json.loads(snapshot.readline())['seq']
+            for line in snapshot:
+                entry = json.loads(line)
+                records = state.setdefault(entry['kind'], {})
+                record = entry['record']
+                records[record[KINDS[entry['kind']][1]]] = record
+        return seq, state
+    
+    def _find_last_sequence(self):
+        snapshots = self._snapshots()
+        last_seq = _sequence_of(snapshots[-1]) if snapshots else 0
+        for path in self._segments():
+            for event in _read_events(path):
+                last_seq = max(last_seq, event['seq'])
+        return last_seq
+    
+    # Recovery
+    
+    def load_state(self):
+        """
+        Rebuild the latest state from the newest snapshot plus the log tail
+        
+        Returns:
+            dict: Maps each kind to {entity_id: record}
+        """
+        with self._compaction_lock:
+            snapshot_seq, state = self._load_snapshot()
+            for path in self._segments():
+                for event in _read_events(path):
+                    if event['seq'] > snapshot_seq:
+                        _apply(state, event)
+        return state
+    
+    def close(self):
+        """Write out everything appended so far and stop the writer"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join()
+        for thread in self._compactions:
+            thread.join()
+        try:
+            self._segment.close()
+        except OSError:
+            if self._error is None:
+                raise
+        if self._error is not None:
+            raise self._error
+
+
+class LoggedRepository(Repository):
+    """
+    In-memory repository that records every write in an EventLog
+    
+    Reads are plain dict lookups. Writes update memory, queue the
+    entity's record in the log under a lock (so the log order matches
+    the memory order), and then wait for durability outside the lock so
+    concurrent writers can share one group commit.
+    """
+    
+    def __init__(self, log, kind, entities=None):
+        self.log = log
+        self.kind = kind
+        self._entities = entities if entities is not None else InMemoryRepository()
+        self._lock = threading.Lock()
+    
+    def __getitem__(self, entity_id):
+        return self._entities[entity_id]
+    
+    def get(self, entity_id, default=None):
+        return self._entities.get(entity_id, default)
+    
+    def __contains__(self, entity_id):
+        return entity_id in self._entities
+    
+    def __iter__(self):
+        return iter(list(self._entities))
+    
+    def __len__(self):
+        return len(self._entities)
+    
+    def values(self):
+        return list(self._entities.values())
+    
+    def items(self):
+        return list(self._entities.items())
+    
+    def __setitem__(self, entity_id, entity):
+        record = to_record(entity)
+        with self._lock:
+            self._entities[entity_id] = entity
+            seq = self.log.append_nowait(self.kind, 'put', entity_id, record)
+        if self.log.sync:
+            self.log.wait_durable(seq)
+    
+    def __delitem__(self, entity_id):
+        with self._lock:
+            del self._entities[entity_id]
+            seq = self.log.append_nowait(self.kind, 'delete', entity_id)
+        if self.log.sync:
+            self.log.wait_durable(seq)
+    
+    def flush(self):
+        self.log.flush()
+    
+    def close(self):
+        self.flush()
+
+
+def open_logged_repositories(directory, segment_size=10000, sync=True):
+    """
+    Recover state from an event log directory and return logged repositories
+    
+    Loads the newest snapshot, replays the log tail on top of it and
+    rebuilds the model objects (with references between them), then
+    wraps each kind in a LoggedRepository appending to a shared EventLog.
+    
+    Args:
+        directory (str): The event log directory (created if missing)
+        
+    Returns:
+        dict: Maps 'passenger', 'driver', 'car' and 'booking' to repositories
+    """
+    log = EventLog(directory, segment_size=segment_size, sync=sync)
+    state = log.load_state()
+    
+    entities = {kind: InMemoryRepository() for kind in KINDS}
+    
+    def resolve(kind, entity_id):
+        return entities[kind].get(entity_id)
+    
+    for kind in _LOAD_ORDER:
+        model = KINDS[kind][0]
+        for entity_id, record in sorted(state.get(kind, {}).items()):
+            entities[kind][entity_id] = from_record(model, record, resolve)
+    
+    return {kind: LoggedRepository(log, kind, entities[kind]) for kind in KINDS}
@@ -0,0 +1,122 @@
+"""
+Conversion between model objects and plain, JSON-serializable records.
+
+A record holds every slot of a model. References to other entities are
+stored as IDs (``driver`` becomes ``driver_id``) and resolved again on
+load; datetimes are stored as ISO 8601 strings and a booking's fare is
+embedded as a nested record.
+"""
+
+import datetime
+
+from cab_booking.models import Booking, Car, Driver, Fare, Passenger
+
+# kind -> (model class, ID attribute)
+KINDS = {
+    'passenger': (Passenger, 'passenger_id'),
+    'driver': (Driver, 'driver_id'),
+    'car': (Car, 'car_id'),
+    'booking': (Booking, 'booking_id'),
+}
+
+# attribute -> kind of the entity it refers to
+_REFERENCES = {
+    Booking: {'passenger': 'passenger', 'driver': 'driver', 'car': 'car'},
+    Driver: {'assigned_car': 'car'},
+}
+_EMBEDDED = {
+    Booking: {'fare': Fare},
+}
+_DATETIMES = {
+    Booking: ('request_time', 'pickup_time', 'completion_time', 'cancellation_time'),
+    Fare: ('timestamp',),
+}
+# Rebuilt by BookingService from its indexes rather than stored per passenger
+_SKIPPED = {
+    Passenger: ('booking_history',),
+}
+_EMPTY_ON_LOAD = {
+    Passenger: {'booking_history': Passenger.new_booking_history},
+}
+# Values for slots absent from records written before the slot existed
+_MISSING = {
+    'version': 0,
+    'surge_multiplier': 1.0,
+}
+
+
+def entity_id(entity):
+    """The primary ID of a model instance"""
+    for cls, id_attribute in KINDS.values():
+        if isinstance(entity, cls):
+            return getattr(entity, id_attribute)
+    raise TypeError(f"Unsupported entity type {type(entity).__name__}")
+
+
+def to_record(entity):
+    """
+    Convert a model instance to a plain dict
+    
+    Args:
+        entity: A Passenger, Driver, Car, Booking or Fare
+        
+    Returns:
+        dict: The record
+    """
+    cls = type(entity)
+    references = _REFERENCES.get(cls, {})
+    embedded = _EMBEDDED.get(cls, {})
+    datetimes = _DATETIMES.get(cls, ())
+    skipped = _SKIPPED.get(cls, ())
+    
+    record = {}
+    for name in cls.__slots__:
+        if name in skipped:
+            continue
+        value = getattr(entity, name)
+        if name in references:
+            record[f"{name}_id"] = entity_id(value) if value is not None else None
+        elif name in datetimes:
+            record[name] = value.isoformat() if value is not None else None
+        elif name in embedded:
+            record[name] = to_record(value) if value is not None else None
+        else:
+            record[name] = value
+    return record
+
+
+def from_record(cls, record, resolve=None):
+    """
+    Rebuild a model instance from a record without running __init__
+    
+    Args:
+        cls (type): The model class
+        record (dict): A record produced by to_record
+        resolve (callable, optional): resolve(kind, entity_id) returning the
+                                      referenced entity, or None
+                                      
+    Returns:
+        The model instance
+    """
+    references = _REFERENCES.get(cls, {})
+    embedded = _EMBEDDED.get(cls, {})
+    datetimes = _DATETIMES.get(cls, ())
+    empty = _EMPTY_ON_LOAD.get(cls, {})
+    
+    entity = cls.__new__(cls)
+    for name in cls.__slots__:
+        if name in empty:
+            value = empty[name]()
+        elif name in references:
+            ref_id = record.get(f"{name}_id")
+            value = resolve(references[name], ref_id) if ref_id is not None and resolve else None
+        elif name in datetimes:
+            value = record.get(name)
+            value = datetime.datetime.fromisoformat(value) if value is not None else None
+        elif name in embedded:
+            value = record.get(name)
+            value = from_record(embedded[name], value) if value is not None else None
+        else:
+            value = record.get(name, _MISSING.get(name))
+        setattr(entity, name, value)
+    return entity
@@ -0,0 +1,33 @@
+from collections.abc import MutableMapping
+
+
+class Repository(MutableMapping):
+    """
+    Interface the services use to store entities.
+    
+    A repository is a mutable mapping from entity ID to model instance.
+    Services write an entity back (``repository[entity_id] = entity``)
+    after every change they make to it, so a backend can persist each
+    mutation. flush() forces buffered writes out; close() releases any
+    resources.
+    """
+    
+    def flush(self):
+        """Write out any buffered changes"""
+    
+    def close(self):
+        """Flush and release resources"""
+        self.flush()
+
+
+class InMemoryRepository(dict):
+    """The default backend: a plain process-local dict"""
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        pass
+
+
+Repository.register(InMemoryRepository)
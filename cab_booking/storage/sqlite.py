@@ -0,0 +1,277 @@
+import collections
+import contextlib
+import json
+import queue
+import sqlite3
+import threading
+
+from .records import KINDS, from_record, to_record
+from .repository import Repository
+
+# Record fields copied into real columns so they can be indexed and queried
+INDEXED_FIELDS = {
+    'passenger': (),
+    'driver': ('is_available',),
+    'car': ('car_type', 'is_available'),
+    'booking': ('passenger_id', 'driver_id', 'status'),
+}
+
+_DELETED = object()
+
+
+class ConnectionPool:
+    """A fixed-size pool of SQLite connections shared between threads"""
+    
+    def __init__(self, path, size=4):
+        self.path = path
+        self._connections = queue.LifoQueue()
+        self._all = []
+        for _ in range(size):
+            connection = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._all.append(connection)
+            self._connections.put(connection)
+    
+    @contextlib.contextmanager
+    def connection(self):
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+    
+    def close(self):
+        for connection in self._all:
+            connection.close()
+        self._all = []
+
+
+class SQLiteRepository(Repository):
+    """
+    SQLite-backed repository for one entity kind.
+    
+    Entities are stored as JSON records with their indexed fields
+    (see INDEXED_FIELDS) copied into columns. Reads go through an LRU
+    cache of live objects, so hot entities are served without touching
+    the database and keep their identity while cached. Writes are
+    buffered and flushed in batches of ``batch_size`` in a single
+    transaction; reads of IDs with pending writes are answered from the
+    buffer. SQL text is constant, so every statement is compiled once
+    per pooled connection and reused from sqlite3's statement cache.
+    
+    Args:
+        pool (ConnectionPool): Connections to the database
+        kind (str): 'passenger', 'driver', 'car' or 'booking'
+        resolve (callable, optional): resolve(kind, entity_id) used to
+                                      rebuild references on load
+        cache_size (int): Maximum number of cached entities
+        batch_size (int): Number of buffered writes that triggers a flush
+    """
+    
+    def __init__(self, pool, kind, resolve=None, cache_size=10000, batch_size=500):
+        self.pool = pool
+        self.kind = kind
+        self.model, _ = KINDS[kind]
+        self.resolve = resolve
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.table = f"{kind}s"
+        self.columns = INDEXED_FIELDS[kind]
+        
+        self._cache = collections.OrderedDict()
+        self._pending = {}
+        self._lock = threading.RLock()
+        
+        column_defs = ''.join(f", {column}" for column in self.columns)
+        placeholders = ', '.join('?' * (len(self.columns) + 2))
+        self._upsert_sql = (
+            f"INSERT OR REPLACE INTO {self.table} (id{column_defs}, data) VALUES ({placeholders})"
+        )
+        self._select_sql = f"SELECT data FROM {self.table} WHERE id = ?"
+        self._delete_sql = f"DELETE FROM {self.table} WHERE id = ?"
+        
+        with pool.connection() as connection, connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (id TEXT PRIMARY KEY{column_defs}, data TEXT NOT NULL)"
+            )
+            for column in self.columns:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_{column} ON {self.table} ({column})"
+                )
+    
+    # Cache
+    
+    def _remember(self, entity_id, entity):
+        self._cache[entity_id] = entity
+        self._cache.move_to_end(entity_id)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    def _load(self, data):
+        return from_record(self.model, json.loads(data), self.resolve)
+    
+    # Mapping interface
+    
+    def __getitem__(self, entity_id):
+        with self._lock:
+            entity = self._cache.get(entity_id)
+            if entity is not None:
+                self._cache.move_to_end(entity_id)
+                return entity
+            pending = self._pending.get(entity_id)
+            if pending is _DELETED:
+                raise KeyError(entity_id)
+            if pending is not None:
+                self._remember(entity_id, pending)
+                return pending
+        
+        with self.pool.connection() as connection:
+            row = connection.execute(self._select_sql, (entity_id,)).fetchone()
+        if row is None:
+            raise KeyError(entity_id)
+        
+        with self._lock:
+            # Another thread may have loaded or replaced it meanwhile
+            entity = self._cache.get(entity_id)
+            if entity is None:
+                entity = self._load(row[0])
+                self._remember(entity_id, entity)
+            return entity
+    
+    def get(self, entity_id, default=None):
+        try:
+            return self[entity_id]
+        except KeyError:
+            return default
+    
+    def __setitem__(self, entity_id, entity):
+        with self._lock:
+            self._remember(entity_id, entity)
+            self._pending[entity_id] = entity
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+    
+    def __delitem__(self, entity_id):
+        if entity_id not in self:
+            raise KeyError(entity_id)
+        with self._lock:
+            self._cache.pop(entity_id, None)
+            self._pending[entity_id] = _DELETED
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+    
+    def __contains__(self, entity_id):
+        with self._lock:
+            if entity_id in self._cache:
+                return True
+            pending = self._pending.get(entity_id)
+            if pending is not None:
+                return pending is not _DELETED
+        with self.pool.connection() as connection:
+            row = connection.execute(f"SELECT 1 FROM {self.table} WHERE id = ?", (entity_id,)).fetchone()
+        return row is not None
+    
+    def __len__(self):
+        self.flush()
+        with self.pool.connection() as connection:
+            return connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+    
+    def __iter__(self):
+        self.flush()
+        with self.pool.connection() as connection:
+            ids = [row[0] for row in connection.execute(f"SELECT id FROM {self.table} ORDER BY id")]
+        return iter(ids)
+    
+    def values(self):
+        """All entities, streamed from one query instead of one lookup per ID"""
+        return [entity for _, entity in self.items()]
+    
+    def items(self):
+        self.flush()
+        with self.pool.connection() as connection:
+            rows = connection.execute(f"SELECT id, data FROM {self.table} ORDER BY id").fetchall()
+        result = []
+        with self._lock:
+            for entity_id, data in rows:
+                entity = self._cache.get(entity_id)
+                if entity is None:
+                    # Cached like any other read, so a later lookup returns
+                    # this same object rather than a second copy
+                    entity = self._load(data)
+                    self._remember(entity_id, entity)
+                result.append((entity_id, entity))
+        return result
+    
+    def find_ids(self, **criteria):
+        """
+        IDs of entities whose indexed fields match the given values
+        
+        Args:
+            **criteria: Field/value pairs; fields must be in INDEXED_FIELDS
+            
+        Returns:
+            list: Matching entity IDs in ID order
+        """
+        unknown = set(criteria) - set(self.columns)
+        if unknown:
+            raise ValueError(f"{self.table} has no indexed field(s) {sorted(unknown)}")
+        self.flush()
+        where = ' AND '.join(f"{column} = ?" for column in criteria) or '1'
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                f"SELECT id FROM {self.table} WHERE {where} ORDER BY id", tuple(criteria.values())
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    # Persistence
+    
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            upserts = []
+            deletes = []
+            for entity_id, entity in pending.items():
+                if entity is _DELETED:
+                    deletes.append((entity_id,))
+                else:
+                    record = to_record(entity)
+                    upserts.append(
+                        (entity_id, *(record.get(column) for column in self.columns), json.dumps(record))
+                    )
+            with self.pool.connection() as connection, connection:
+                if upserts:
+                    connection.executemany(self._upsert_sql, upserts)
+                if deletes:
+                    connection.executemany(self._delete_sql, deletes)
+    
+    def close(self):
+        self.flush()
+
+
+def open_sqlite_repositories(path, pool_size=4, cache_size=10000, batch_size=500):
+    """
+    Open one SQLiteRepository per entity kind over a shared connection pool
+    
+    References between entities (a booking's passenger, a driver's car)
+    are resolved through the other repositories, so related objects come
+    from the same caches.
+    
+    Args:
+        path (str): Database file path
+        
+    Returns:
+        dict: Maps 'passenger', 'driver', 'car' and 'booking' to repositories
+    """
+    pool = ConnectionPool(path, size=pool_size)
+    repositories = {}
+    
+    def resolve(kind, entity_id):
+        return repositories[kind].get(entity_id)
+    
+    for kind in KINDS:
+        repositories[kind] = SQLiteRepository(pool, kind, resolve=resolve,
+                                              cache_size=cache_size, batch_size=batch_size)
+    return repositories
@@ -0,0 +1,10 @@
+"""
+This module contains initialization for the utils package.
+"""
+
+from .geo import get_coordinates, haversine_km
+from .spatial_index import GridIndex
+from .assignment import solve_assignment
+from .ids import id_sequence
+from .locks import StripedLock
+from .metrics import MetricsRegistry
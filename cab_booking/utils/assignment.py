@@ -0,0 +1,100 @@
+import heapq
+
+
+def solve_assignment(candidates, unassigned_cost=None):
+    """
+    Minimum-cost assignment over a sparse candidate graph.
+    
+    Uses successive shortest augmenting paths with dual potentials (the
+    Jonker-Volgenant / Hungarian scheme), running Dijkstra only over the
+    candidate edges. Every bidder also has a private "stay unassigned"
+    option costing ``unassigned_cost``, so the problem is always
+    feasible and each search stops at the first free object it reaches,
+    which keeps augmentations local on geographically pruned graphs.
+    
+    Args:
+        candidates (list): One list per bidder of (cost, object_key) pairs
+        unassigned_cost (float, optional): Cost of leaving a bidder
+                                           unassigned; defaults to four
+                                           times the largest candidate cost
+                                           
+    Returns:
+        list: The object key assigned to each bidder, or None
+    """
+    n = len(candidates)
+    max_cost = max((cost for options in candidates for cost, _ in options), default=0.0)
+    if unassigned_cost is None:
+        unassigned_cost = 4 * max_cost + 1.0
+    
+    # Number the objects; object m + i is bidder i's private "unassigned" slot
+    keys = []
+    key_index = {}
+    adjacency = []
+    for options in candidates:
+        edges = []
+        for cost, key in options:
+            j = key_index.get(key)
+            if j is None:
+                j = key_index[key] = len(keys)
+                keys.append(key)
+            edges.append((cost, j))
+        adjacency.append(edges)
+    m = len(keys)
+    for i, edges in enumerate(adjacency):
+        edges.append((unassigned_cost, m + i))
+    
+    u = [0.0] * n
+    v = [0.0] * (m + n)
+    row_for_col = [-1] * (m + n)
+    col_for_row = [-1] * n
+    
+    for current in range(n):
+        shortest = {}
+        path = {}
+        scanned_cols = []
+        scanned_rows = [current]
+        done = set()
+        heap = []
+        min_value = 0.0
+        i = current
+        
+        while True:
+            base = min_value - u[i]
+            for cost, j in adjacency[i]:
+                if j in done:
+                    continue
+                reduced = base + cost - v[j]
+                if reduced < shortest.get(j, float('inf')):
+                    shortest[j] = reduced
+                    path[j] = i
+                    heapq.heappush(heap, (reduced, j))
+            
+            while True:
+                min_value, sink = heapq.heappop(heap)
+                if sink not in done and shortest[sink] == min_value:
+                    break
+            done.add(sink)
+            scanned_cols.append(sink)
+            
+            if row_for_col[sink] == -1:
+                break
+            i = row_for_col[sink]
+            scanned_rows.append(i)
+        
+        # Update the dual potentials
+        u[current] += min_value
+        for i in scanned_rows[1:]:
+            u[i] += min_value - shortest[col_for_row[i]]
+        for j in scanned_cols:
+            v[j] -= min_value - shortest[j]
+        
+        # Augment along the alternating path back to the current bidder
+        j = sink
+        while True:
+            i = path[j]
+            row_for_col[j] = i
+            col_for_row[i], j = j, col_for_row[i]
+            if i == current:
+                break
+    
+    return [keys[j] if j < m else None for j in col_for_row]
@@ -0,0 +1,51 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def get_coordinates(location):
+    """
+    Extract a (latitude, longitude) pair from a location
+    
+    Args:
+        location: A dict with latitude/longitude (or lat/lng/lon) keys,
+                  or a (latitude, longitude) pair
+                  
+    Returns:
+        tuple: (latitude, longitude) as floats, or None if the location
+               has no usable coordinates (e.g. a plain street address)
+    """
+    if isinstance(location, dict):
+        lat = location.get('latitude', location.get('lat'))
+        lon = location.get('longitude', location.get('lng', location.get('lon')))
+    elif isinstance(location, (tuple, list)) and len(location) == 2:
+        lat, lon = location
+    else:
+        return None
+    
+    if lat is None or lon is None:
+        return None
+    try:
+        return float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two points
+    
+    Args:
+        lat1, lon1 (float): First point in degrees
+        lat2, lon2 (float): Second point in degrees
+        
+    Returns:
+        float: Distance in kilometres
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
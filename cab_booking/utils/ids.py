@@ -0,0 +1,28 @@
+import itertools
+
+
+def id_sequence(existing_ids, offset=0, stride=1):
+    """
+    Counter for the numeric part of new IDs
+    
+    With a stride above one, only numbers congruent to offset modulo
+    stride are produced, so several processes can hand out IDs of the
+    same kind without colliding.
+    
+    Args:
+        existing_ids (iterable): IDs already in use, e.g. "CAR-00000042"
+        offset (int): Residue of the numbers produced, 0 <= offset < stride
+        stride (int): Step between consecutive numbers
+        
+    Returns:
+        itertools.count: Starts after the highest number found
+    """
+    highest = 0
+    for entity_id in existing_ids:
+        try:
+            highest = max(highest, int(entity_id.rsplit('-', 1)[-1]))
+        except ValueError:
+            continue
+    start = highest + 1
+    start += (offset - start) % stride
+    return itertools.count(start, stride)
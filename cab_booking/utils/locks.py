@@ -0,0 +1,42 @@
+import contextlib
+import threading
+
+
+class StripedLock:
+    """
+    A fixed pool of re-entrant locks shared out by key.
+    
+    Each key (e.g. an entity ID) maps to one of ``stripes`` locks by
+    hash, so operations on different entities rarely contend while the
+    number of lock objects stays constant. Multiple keys are always
+    acquired in stripe order, which rules out lock-order deadlocks.
+    """
+    
+    def __init__(self, stripes=64):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+    
+    def _stripes(self, keys):
+        return sorted({hash(key) % len(self._locks) for key in keys})
+    
+    @contextlib.contextmanager
+    def __call__(self, *keys):
+        """Hold the locks for all the given keys"""
+        locks = [self._locks[i] for i in self._stripes(keys)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+    
+    @contextlib.contextmanager
+    def all(self):
+        """Hold every stripe, excluding all keyed operations"""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
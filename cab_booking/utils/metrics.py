@@ -0,0 +1,215 @@
+import math
+import threading
+
+# Linear sub-buckets per power of two; bucket bounds are within 12.5%
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+class _Metric:
+    kind = None
+    
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{_labels(self.label_names, label_values)} {_number(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """A count that only goes up"""
+    
+    kind = 'counter'
+    
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            try:
+                self._values[label_values] += amount
+            except KeyError:
+                self._values[label_values] = amount
+    
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as requests in flight"""
+    
+    kind = 'gauge'
+    
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._function = None
+    
+    def set_function(self, function):
+        """Read the (unlabelled) value from function() at each render instead"""
+        self._function = function
+    
+    def render(self):
+        if self._function is not None:
+            return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge',
+                    f'{self.name} {_number(self._function())}']
+        return super().render()
+    
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+    
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+    
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+    
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+
+def bucket_index(microseconds):
+    """The log-linear bucket of a non-negative whole number of microseconds"""
+    shift = max(microseconds.bit_length() - SUB_BUCKET_BITS - 1, 0)
+    return (shift << SUB_BUCKET_BITS) + (microseconds >> shift)
+
+
+def bucket_upper_bound(index):
+    """The smallest whole number of microseconds above bucket index"""
+    shift = max((index >> SUB_BUCKET_BITS) - 1, 0)
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return (mantissa + 1) << shift
+
+
+class _Series:
+    __slots__ = ('counts', 'count', 'total')
+    
+    def __init__(self):
+        self.counts = []  # bucket index -> observations
+        self.count = 0
+        self.total = 0.0
+
+
+class Histogram(_Metric):
+    """
+    Durations in seconds, in log-linear buckets
+    
+    As in HdrHistogram, every power of two of microseconds is split into
+    SUB_BUCKETS linear steps, so any duration from 1 us to hours lands in
+    a bucket at most 12.5% wider than its lower bound and no bucket
+    layout has to be chosen up front.
+    """
+    
+    kind = 'histogram'
+    
+    def observe(self, seconds, *label_values):
+        # bucket_index(), inlined as this runs for every request
+        microseconds = max(int(seconds * 1e6), 0)
+        shift = microseconds.bit_length() - SUB_BUCKET_BITS - 1
+        index = (shift << SUB_BUCKET_BITS) + (microseconds >> shift) if shift > 0 else microseconds
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = _Series()
+            counts = series.counts
+            if index >= len(counts):
+                counts.extend([0] * (index + 1 - len(counts)))
+            counts[index] += 1
+            series.count += 1
+            series.total += seconds
+    
+    def render(self):
+        """
+        Cumulative counts of the buckets that have observations
+        
+        Bucket bounds never change, so each le is the same in every
+        scrape; empty buckets are left out, which cumulative counts allow.
+        """
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((label_values, list(series.counts), series.count, series.total)
+                              for label_values, series in self._values.items())
+        for label_values, counts, count, total in snapshot:
+            infinity = 'le="+Inf"'
+            cumulative = 0
+            for index, bucket_count in enumerate(counts):
+                if bucket_count:
+                    cumulative += bucket_count
+                    le = f'le="{_number(bucket_upper_bound(index) / 1e6)}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, label_values, infinity)} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, label_values)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, label_values)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and latency histograms in Prometheus text format.
+    
+    Metrics are created here and updated with their label values passed
+    positionally, e.g. ``requests.inc('GET', '/api/cars/<car_id>')``.
+    Each update is one short lock and a dict lookup, cheap enough to
+    leave on for every request. Asking for a metric that already exists
+    returns it, so the services and the app sharing a registry can each
+    declare what they use.
+    """
+    
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _get(self, cls, name, help_text, label_names):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, label_names)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already a {metric.kind}")
+            return metric
+    
+    def counter(self, name, help_text, label_names=()):
+        return self._get(Counter, name, help_text, label_names)
+    
+    def gauge(self, name, help_text, label_names=()):
+        return self._get(Gauge, name, help_text, label_names)
+    
+    def histogram(self, name, help_text, label_names=()):
+        return self._get(Histogram, name, help_text, label_names)
+    
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return ('\n'.join(lines) + '\n').encode('utf-8')
@@ -0,0 +1,130 @@
+import heapq
+import math
+
+from .geo import KM_PER_DEGREE, haversine_km
+
+
+class GridIndex:
+    """
+    Uniform latitude/longitude grid for nearest-neighbour queries.
+    
+    Items are bucketed into square cells of ``cell_size_deg`` degrees.
+    A query walks rings of cells outward from the query point and stops
+    as soon as no unvisited cell can hold anything closer than the k-th
+    result found so far, so the cost depends on local density rather
+    than on the total number of items.
+    """
+    
+    def __init__(self, cell_size_deg=0.01):
+        self.cell_size_deg = cell_size_deg
+        self._cells = {}       # (row, col) -> {item_id: (lat, lon)}
+        self._positions = {}   # item_id -> (row, col)
+    
+    def __len__(self):
+        return len(self._positions)
+    
+    def __contains__(self, item_id):
+        return item_id in self._positions
+    
+    def _cell_for(self, lat, lon):
+        return (math.floor(lat / self.cell_size_deg), math.floor(lon / self.cell_size_deg))
+    
+    def insert(self, item_id, lat, lon):
+        """Insert an item, or move it if it is already indexed"""
+        cell = self._cell_for(lat, lon)
+        old_cell = self._positions.get(item_id)
+        if old_cell is not None and old_cell != cell:
+            self._discard(item_id, old_cell)
+        self._cells.setdefault(cell, {})[item_id] = (lat, lon)
+        self._positions[item_id] = cell
+    
+    def remove(self, item_id):
+        """Remove an item; returns False if it was not indexed"""
+        cell = self._positions.pop(item_id, None)
+        if cell is None:
+            return False
+        self._discard(item_id, cell)
+        return True
+    
+    def _discard(self, item_id, cell):
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(item_id, None)
+            if not bucket:
+                del self._cells[cell]
+    
+    def _ring(self, row, col, r):
+        if r == 0:
+            yield (row, col)
+            return
+        for c in range(col - r, col + r + 1):
+            yield (row - r, c)
+            yield (row + r, c)
+        for rr in range(row - r + 1, row + r):
+            yield (rr, col - r)
+            yield (rr, col + r)
+    
+    def _min_ring_distance_km(self, lat, r):
+        # Lower bound on the distance from a point in the centre cell to
+        # any cell in ring r + 1: r whole cells, measured along the
+        # narrowest (longitude) side of the band the ring spans.
+        edge_lat = min(89.9, abs(lat) + (r + 1) * self.cell_size_deg)
+        return r * self.cell_size_deg * KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+    
+    def nearest(self, lat, lon, k=1, radius_km=None, predicate=None):
+        """
+        Find the k nearest items to a point
+        
+        Args:
+            lat, lon (float): The query point in degrees
+            k (int): Maximum number of results
+            radius_km (float, optional): Ignore items further than this
+            predicate (callable, optional): Only return item ids for which
+                                            predicate(item_id) is true
+                                            
+        Returns:
+            list: (distance_km, item_id) tuples, nearest first
+        """
+        if k <= 0 or not self._cells:
+            return []
+        
+        row, col = self._cell_for(lat, lon)
+        best = []  # max-heap of (-distance, item_id), at most k entries
+        
+        def consider(bucket):
+            for item_id, (item_lat, item_lon) in bucket.items():
+                distance = haversine_km(lat, lon, item_lat, item_lon)
+                if radius_km is not None and distance > radius_km:
+                    continue
+                if len(best) == k and distance >= -best[0][0]:
+                    continue
+                if predicate is not None and not predicate(item_id):
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, item_id))
+                else:
+                    heapq.heapreplace(best, (-distance, item_id))
+        
+        r = 0
+        while True:
+            if 8 * r >= len(self._cells):
+                # The ring is now larger than the set of occupied cells,
+                # so finish with a single pass over what is left.
+                for (cell_row, cell_col), bucket in self._cells.items():
+                    if max(abs(cell_row - row), abs(cell_col - col)) >= r:
+                        consider(bucket)
+                break
+            
+            for cell in self._ring(row, col, r):
+                bucket = self._cells.get(cell)
+                if bucket:
+                    consider(bucket)
+            
+            bound = self._min_ring_distance_km(lat, r)
+            if radius_km is not None and bound > radius_km:
+                break
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            r += 1
+        
+        return sorted((-neg_distance, item_id) for neg_distance, item_id in best)
@@ -8,6 +8,13 @@ setup(
     install_requires=[
         "flask>=2.0.0",
     ],
+    extras_require={
+        # Vectorized Fare.calculate_fares and faster JSON responses; both
+        # fall back to plain Python without them
+        "fast": ["numpy", "orjson"],
+        # Server for the ASGI app in cab_booking.app.asgi
+        "asgi": ["uvicorn"],
+    },
     author="Cab Booking System",
     author_email="example@example.com",
     description="A cab booking system REST API",